@@ -1,14 +1,30 @@
 """
 API FastAPI - Consultório Dentista
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from backend.config import get_settings
-from backend.api.routes import pacientes, dentistas, agendamentos, procedimentos, financeiro_consultorio, financeiro_pessoal, faturamentos, clin_tratamentos, financeiro_settings, odontograma, anamneses, laboratorios, ordens_proteticas
+from backend.config.supabase_client import close_supabase_async
+from backend.services.cache import cache_referencia
+from backend.services.jobs import job_runner
+from backend.api.routes import pacientes, dentistas, agendamentos, procedimentos, financeiro_consultorio, financeiro_pessoal, faturamentos, clin_tratamentos, financeiro_settings, odontograma, anamneses, laboratorios, ordens_proteticas, jobs
 from backend.api.routes import auth
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Jobs que ficaram pendurados por um restart não bloqueiam novos jobs do mesmo tipo
+    await job_runner.recuperar_orfaos(settings.JOBS_STALE_AFTER_SECONDS)
+    yield
+    # Interrompe os jobs em segundo plano antes de fechar o cliente que eles usam
+    await job_runner.encerrar()
+    # Libera o pool de conexões HTTP com o PostgREST
+    await close_supabase_async()
+
+
 # Criar aplicação FastAPI
 app = FastAPI(
     title=settings.APP_NAME,
@@ -18,6 +34,7 @@ app = FastAPI(
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None,
     openapi_url="/openapi.json" if settings.DEBUG else None,
+    lifespan=lifespan,
 )
 
 # CORS - Permitir acesso do frontend
@@ -44,6 +61,7 @@ app.include_router(odontograma.router,           prefix="/api/odontograma",
 app.include_router(anamneses.router,             prefix="/api/anamneses",                   tags=["Anamneses"])
 app.include_router(laboratorios.router,          prefix="/api/protetico/laboratorios",       tags=["Laboratórios"])
 app.include_router(ordens_proteticas.router,     prefix="/api/protetico/ordens",             tags=["Controle Protético"])
+app.include_router(jobs.router,                  prefix="/api/jobs",                        tags=["Jobs"])
 
 
 @app.get("/")
@@ -63,6 +81,12 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/cache")
+async def cache_stats():
+    """Contadores do cache de dados de referência (hits, misses, invalidações)"""
+    return cache_referencia.stats()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,21 +1,37 @@
 """
 Rotas da API - Agendamentos
 """
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
-from backend.config.supabase_client import get_supabase
+from backend.config.supabase_client import get_supabase_async
+from backend.services.queries import fetch_all
+from backend.services.pagination import MAX_LIMIT, parse_sort, aplicar_ordem, paginar
+from backend.services.projection import montar_select
 
 router = APIRouter()
 
-def _verificar_conflito(dentista_id: str, new_start_dt: datetime, duracao: int, exclude_id: str | None = None) -> bool:
-    sb = get_supabase()
+# Colunas e recursos relacionados aceitos em `?fields=` / `?include=`
+CAMPOS_AGENDAMENTO = {
+    "id", "paciente_id", "dentista_id", "procedimento_id", "clin_tratamento_id", "data_hora",
+    "duracao_minutos", "status", "observacoes", "created_at", "updated_at",
+}
+EMBEDS_AGENDAMENTO = {
+    "pacientes": "pacientes(nome, telefone)",
+    "dentistas": "dentistas(nome)",
+    "fin_faturamentos": "fin_faturamentos(id)",
+    "clin_tratamentos": "clin_tratamentos(status, observacoes)",
+    "agendamento_procedimentos": "agendamento_procedimentos(status, procedimentos(id, nome, valor_padrao, duracao_minutos))",
+}
+
+async def _verificar_conflito(dentista_id: str, new_start_dt: datetime, duracao: int, exclude_id: str | None = None) -> bool:
+    sb = get_supabase_async()
     
     # Define os limites do dia para otimizar a busca
     st_day = new_start_dt.replace(hour=0, minute=0, second=0, microsecond=0)
     en_day = st_day + timedelta(days=1)
     
-    res = sb.table("agendamentos").select("id, data_hora, duracao_minutos, status").eq("dentista_id", dentista_id).gte("data_hora", st_day.isoformat()).lt("data_hora", en_day.isoformat()).execute()
+    res = await sb.table("agendamentos").select("id, data_hora, duracao_minutos, status").eq("dentista_id", dentista_id).gte("data_hora", st_day.isoformat()).lt("data_hora", en_day.isoformat()).execute()
     
     if not res.data:
         return False
@@ -77,37 +93,54 @@ class AgendamentoUpdate(BaseModel):
 
 
 @router.get("/")
-def listar_agendamentos(
+async def listar_agendamentos(
     dentista_id: str | None = None,
     paciente_id: str | None = None,
     clin_tratamento_id: str | None = None,
-    status_filtro: str | None = None
+    status_filtro: str | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: str | None = None,
+    sort: str | None = None,
+    fields: str | None = None,
+    include: str | None = None,
 ):
-    sb = get_supabase()
-    q = sb.table("agendamentos").select("*, pacientes(nome, telefone), dentistas(nome), fin_faturamentos(id), clin_tratamentos(status, observacoes), agendamento_procedimentos(status, procedimentos(id, nome, valor_padrao, duracao_minutos))").order("data_hora", desc=True)
-    if dentista_id:
-        q = q.eq("dentista_id", dentista_id)
-    if paciente_id:
-        q = q.eq("paciente_id", paciente_id)
-    if clin_tratamento_id:
-        q = q.eq("clin_tratamento_id", clin_tratamento_id)
-    if status_filtro:
-        q = q.eq("status", status_filtro)
-    return q.execute().data
+    sb = get_supabase_async()
+    ordem = parse_sort(sort, {"data_hora", "created_at"}, "-data_hora")
+    # Ex.: `?fields=data_hora,status&include=pacientes` traz só horário, status e nome do paciente
+    select = montar_select(fields, include, CAMPOS_AGENDAMENTO, EMBEDS_AGENDAMENTO, tuple(c for c, _ in ordem))
+
+    def consulta():
+        q = sb.table("agendamentos").select(select)
+        if dentista_id:
+            q = q.eq("dentista_id", dentista_id)
+        if paciente_id:
+            q = q.eq("paciente_id", paciente_id)
+        if clin_tratamento_id:
+            q = q.eq("clin_tratamento_id", clin_tratamento_id)
+        if status_filtro:
+            q = q.eq("status", status_filtro)
+        return q
+
+    # Com `limit`, devolve uma página `{items, next_cursor}`; sem ele, a lista completa
+    if limit:
+        return await paginar(consulta(), ordem, limit, cursor)
+    return await fetch_all(lambda: aplicar_ordem(consulta(), ordem))
 
 
 @router.get("/{agendamento_id}")
-def obter_agendamento(agendamento_id: str):
-    sb = get_supabase()
-    r = sb.table("agendamentos").select("*, pacientes(nome), dentistas(nome)").eq("id", agendamento_id).execute()
+async def obter_agendamento(agendamento_id: str, fields: str | None = None, include: str | None = None):
+    sb = get_supabase_async()
+    embeds = {"pacientes": "pacientes(nome)", "dentistas": "dentistas(nome)"}
+    select = montar_select(fields, include, CAMPOS_AGENDAMENTO, embeds)
+    r = await sb.table("agendamentos").select(select).eq("id", agendamento_id).execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agendamento nao encontrado")
     return r.data[0]
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def criar_agendamento(agendamento_data: AgendamentoCreate):
-    sb = get_supabase()
+async def criar_agendamento(agendamento_data: AgendamentoCreate):
+    sb = get_supabase_async()
     dados = agendamento_data.model_dump()
     procedimentos_ids = dados.pop("procedimentos_ids", [])
     
@@ -115,7 +148,7 @@ def criar_agendamento(agendamento_data: AgendamentoCreate):
     duracao = dados.get("duracao_minutos", 60)
     start_dt = agendamento_data.data_hora
     
-    if _verificar_conflito(dentista_id, start_dt, duracao):
+    if await _verificar_conflito(dentista_id, start_dt, duracao):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Já existe um agendamento neste horário para este profissional.")
 
     # Validar horário no passado (com tolerância de 1 slot de 15 minutos)
@@ -145,7 +178,7 @@ def criar_agendamento(agendamento_data: AgendamentoCreate):
     
     try:
         # Insere o agendamento
-        r = sb.table("agendamentos").insert(dados).execute()
+        r = await sb.table("agendamentos").insert(dados).execute()
         if not r.data:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Erro ao criar agendamento. Nenhuma linha retornada.")
         
@@ -155,7 +188,7 @@ def criar_agendamento(agendamento_data: AgendamentoCreate):
         if procedimentos_ids:
             rel_data = [{"agendamento_id": agendamento_criado["id"], "procedimento_id": pid} for pid in procedimentos_ids if pid]
             if rel_data:
-                sb.table("agendamento_procedimentos").insert(rel_data).execute()
+                await sb.table("agendamento_procedimentos").insert(rel_data).execute()
                 
         return agendamento_criado
     except Exception as e:
@@ -165,11 +198,11 @@ def criar_agendamento(agendamento_data: AgendamentoCreate):
 
 
 @router.put("/{agendamento_id}")
-def atualizar_agendamento(agendamento_id: str, agendamento_data: AgendamentoUpdate):
-    sb = get_supabase()
+async def atualizar_agendamento(agendamento_id: str, agendamento_data: AgendamentoUpdate):
+    sb = get_supabase_async()
     
     # Verifica estado atual para obter dados não modificados e também validar existência
-    curr_res = sb.table("agendamentos").select("*").eq("id", agendamento_id).execute()
+    curr_res = await sb.table("agendamentos").select("*").eq("id", agendamento_id).execute()
     if not curr_res.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agendamento nao encontrado")
     curr_ag = curr_res.data[0]
@@ -192,7 +225,7 @@ def atualizar_agendamento(agendamento_id: str, agendamento_data: AgendamentoUpda
         # Se não for cancelar, tem que testar
         novo_status = dados.get("status", curr_ag.get("status"))
         if novo_status not in ["cancelado", "falta"]:
-            if _verificar_conflito(dentista_id, start_dt, duracao, exclude_id=agendamento_id):
+            if await _verificar_conflito(dentista_id, start_dt, duracao, exclude_id=agendamento_id):
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="O novo horário entra em conflito com um agendamento existente para este profissional.")
     
     # Remove empty strings to prevent postgres malformed UUID errors
@@ -208,17 +241,17 @@ def atualizar_agendamento(agendamento_id: str, agendamento_data: AgendamentoUpda
     if "data_hora" in dados and dados["data_hora"]:
         dados["data_hora"] = dados["data_hora"].isoformat()
     try:
-        r = sb.table("agendamentos").update(dados).eq("id", agendamento_id).execute()
+        r = await sb.table("agendamentos").update(dados).eq("id", agendamento_id).execute()
         if not r.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agendamento nao encontrado")
             
         # Update M:N procedures
         if procedimentos_ids is not None:
-            sb.table("agendamento_procedimentos").delete().eq("agendamento_id", agendamento_id).execute()
+            await sb.table("agendamento_procedimentos").delete().eq("agendamento_id", agendamento_id).execute()
             if procedimentos_ids:
                 rel_data = [{"agendamento_id": agendamento_id, "procedimento_id": pid} for pid in procedimentos_ids if pid]
                 if rel_data:
-                    sb.table("agendamento_procedimentos").insert(rel_data).execute()
+                    await sb.table("agendamento_procedimentos").insert(rel_data).execute()
                     
         return r.data[0]
     except Exception as e:
@@ -226,11 +259,11 @@ def atualizar_agendamento(agendamento_id: str, agendamento_data: AgendamentoUpda
 
 
 @router.delete("/{agendamento_id}", status_code=status.HTTP_204_NO_CONTENT)
-def deletar_agendamento(agendamento_id: str):
-    sb = get_supabase()
+async def deletar_agendamento(agendamento_id: str):
+    sb = get_supabase_async()
     
     # Busca o agendamento atual com faturamentos
-    curr = sb.table("agendamentos").select("id, status, fin_faturamentos!left(id)").eq("id", agendamento_id).execute()
+    curr = await sb.table("agendamentos").select("id, status, fin_faturamentos!left(id)").eq("id", agendamento_id).execute()
     if not curr.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agendamento não encontrado")
     
@@ -253,7 +286,7 @@ def deletar_agendamento(agendamento_id: str):
         )
     
     # Soft-delete: marca como cancelado
-    r = sb.table("agendamentos").update({"status": "cancelado"}).eq("id", agendamento_id).execute()
+    r = await sb.table("agendamentos").update({"status": "cancelado"}).eq("id", agendamento_id).execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agendamento não encontrado")
     return None
@@ -262,9 +295,9 @@ class AgendamentoProcedimentoStatusUpdate(BaseModel):
     status: str
 
 @router.patch("/{agendamento_id}/procedimentos/{procedimento_id}/status")
-def atualizar_status_procedimento(agendamento_id: str, procedimento_id: str, req: AgendamentoProcedimentoStatusUpdate):
-    sb = get_supabase()
-    r = sb.table("agendamento_procedimentos")\
+async def atualizar_status_procedimento(agendamento_id: str, procedimento_id: str, req: AgendamentoProcedimentoStatusUpdate):
+    sb = get_supabase_async()
+    r = await sb.table("agendamento_procedimentos")\
         .update({"status": req.status})\
         .eq("agendamento_id", agendamento_id)\
         .eq("procedimento_id", procedimento_id)\
@@ -274,10 +307,10 @@ def atualizar_status_procedimento(agendamento_id: str, procedimento_id: str, req
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Relação Agendamento-Procedimento nao encontrada")
         
     # Sincroniza o array de conclusões no clin_tratamentos pai
-    agend_res = sb.table("agendamentos").select("clin_tratamento_id").eq("id", agendamento_id).execute()
+    agend_res = await sb.table("agendamentos").select("clin_tratamento_id").eq("id", agendamento_id).execute()
     if agend_res.data and agend_res.data[0].get("clin_tratamento_id"):
         trat_id = agend_res.data[0]["clin_tratamento_id"]
-        trat_res = sb.table("clin_tratamentos").select("procedimentos_concluidos_ids").eq("id", trat_id).execute()
+        trat_res = await sb.table("clin_tratamentos").select("procedimentos_concluidos_ids").eq("id", trat_id).execute()
         if trat_res.data:
             atual_arr = trat_res.data[0].get("procedimentos_concluidos_ids") or []
             if req.status == "CONCLUIDO":
@@ -286,6 +319,6 @@ def atualizar_status_procedimento(agendamento_id: str, procedimento_id: str, req
             else:
                 if procedimento_id in atual_arr:
                     atual_arr.remove(procedimento_id)
-            sb.table("clin_tratamentos").update({"procedimentos_concluidos_ids": atual_arr}).eq("id", trat_id).execute()
+            await sb.table("clin_tratamentos").update({"procedimentos_concluidos_ids": atual_arr}).eq("id", trat_id).execute()
     
     return r.data[0]
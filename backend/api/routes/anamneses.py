@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
-from backend.config.supabase_client import get_supabase
+from backend.config.supabase_client import get_supabase_async
 
 router = APIRouter()
 
@@ -10,18 +10,18 @@ class AnamneseSchema(BaseModel):
     dados: Dict[str, Any]
 
 @router.get("/{paciente_id}")
-def obter_anamnese(paciente_id: str):
-    sb = get_supabase()
-    res = sb.table("anamneses").select("*").eq("paciente_id", paciente_id).order("created_at", desc=True).execute()
+async def obter_anamnese(paciente_id: str):
+    sb = get_supabase_async()
+    res = await sb.table("anamneses").select("*").eq("paciente_id", paciente_id).order("created_at", desc=True).execute()
     
     return res.data
 
 @router.post("/")
-def salvar_anamnese(anamnese: AnamneseSchema):
-    sb = get_supabase()
+async def salvar_anamnese(anamnese: AnamneseSchema):
+    sb = get_supabase_async()
     
     # Criar sempre uma nova ficha (Histórico de Fichas)
-    res = sb.table("anamneses").insert({
+    res = await sb.table("anamneses").insert({
         "paciente_id": anamnese.paciente_id,
         "dados": anamnese.dados
     }).execute()
@@ -10,6 +10,7 @@ POST /auth/change-password → alterar própria senha
 """
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import datetime, timedelta, timezone
@@ -17,7 +18,7 @@ from datetime import datetime, timedelta, timezone
 import bcrypt as _bcrypt
 from jose import jwt, JWTError
 
-from backend.config.supabase_client import get_supabase
+from backend.config.supabase_client import get_supabase_async
 from backend.config.settings import get_settings
 
 router = APIRouter()
@@ -33,6 +34,8 @@ ALGORITHM         = get_settings().JWT_ALGORITHM
 TOKEN_EXPIRE_HOURS = get_settings().JWT_EXPIRE_HOURS
 
 # ── Hashing ──────────────────────────────────────────────────────────────────
+# bcrypt é CPU-bound (~250ms com custo 12): as rotas async chamam estes helpers
+# via run_in_threadpool para não travar o event loop.
 bearer  = HTTPBearer(auto_error=False)
 
 def _hash_password(plain: str) -> str:
@@ -113,9 +116,9 @@ def require_admin(user: dict = Depends(get_current_user)) -> dict:
 
 # ── Rotas ─────────────────────────────────────────────────────────────────────
 @router.post("/login", response_model=TokenResponse)
-def login(body: LoginRequest):
-    sb = get_supabase()
-    res = sb.table("usuarios").select("*").eq("username", body.username.lower().strip()).execute()
+async def login(body: LoginRequest):
+    sb = get_supabase_async()
+    res = await sb.table("usuarios").select("*").eq("username", body.username.lower().strip()).execute()
 
     if not res.data:
         raise HTTPException(status_code=401, detail="Usuário ou senha incorretos")
@@ -125,11 +128,11 @@ def login(body: LoginRequest):
     if not user.get("ativo", True):
         raise HTTPException(status_code=403, detail="Usuário inativo. Contate o administrador.")
 
-    if not _verify_password(body.senha, user["senha_hash"]):
+    if not await run_in_threadpool(_verify_password, body.senha, user["senha_hash"]):
         raise HTTPException(status_code=401, detail="Usuário ou senha incorretos")
 
     # Registra último acesso
-    sb.table("usuarios").update({"ultimo_acesso": datetime.now(timezone.utc).isoformat()}).eq("id", user["id"]).execute()
+    await sb.table("usuarios").update({"ultimo_acesso": datetime.now(timezone.utc).isoformat()}).eq("id", user["id"]).execute()
 
     token = create_token(user["id"], user["username"], user["nome"], user["role"])
 
@@ -146,21 +149,21 @@ def login(body: LoginRequest):
 
 
 @router.get("/me")
-def get_me(current: dict = Depends(get_current_user)):
+async def get_me(current: dict = Depends(get_current_user)):
     return current
 
 
 @router.get("/usuarios")
-def listar_usuarios(current: dict = Depends(require_admin)):
-    sb = get_supabase()
-    res = sb.table("usuarios").select(
+async def listar_usuarios(current: dict = Depends(require_admin)):
+    sb = get_supabase_async()
+    res = await sb.table("usuarios").select(
         "id,nome,username,role,ativo,ultimo_acesso,created_at"
     ).order("nome").execute()
     return res.data
 
 
 @router.post("/usuarios", status_code=201)
-def criar_usuario(body: UsuarioCreate, current: dict = Depends(require_admin)):
+async def criar_usuario(body: UsuarioCreate, current: dict = Depends(require_admin)):
     roles_validos = ("admin", "dentista", "recepcionista", "financeiro")
     if body.role not in roles_validos:
         raise HTTPException(status_code=400, detail=f"Role inválido. Use: {roles_validos}")
@@ -168,14 +171,14 @@ def criar_usuario(body: UsuarioCreate, current: dict = Depends(require_admin)):
     if len(body.senha) < 6:
         raise HTTPException(status_code=400, detail="Senha deve ter pelo menos 6 caracteres")
 
-    sb = get_supabase()
+    sb = get_supabase_async()
     # Verificar apelido duplicado
-    existing = sb.table("usuarios").select("id").eq("username", body.username.lower().strip()).execute()
+    existing = await sb.table("usuarios").select("id").eq("username", body.username.lower().strip()).execute()
     if existing.data:
         raise HTTPException(status_code=400, detail="Nome de usuário já cadastrado")
 
-    senha_hash = _hash_password(body.senha)
-    res = sb.table("usuarios").insert({
+    senha_hash = await run_in_threadpool(_hash_password, body.senha)
+    res = await sb.table("usuarios").insert({
         "nome":       body.nome.strip(),
         "username":   body.username.lower().strip(),
         "senha_hash": senha_hash,
@@ -191,35 +194,35 @@ def criar_usuario(body: UsuarioCreate, current: dict = Depends(require_admin)):
 
 
 @router.put("/usuarios/{usuario_id}")
-def atualizar_usuario(usuario_id: str, body: UsuarioUpdate, current: dict = Depends(require_admin)):
+async def atualizar_usuario(usuario_id: str, body: UsuarioUpdate, current: dict = Depends(require_admin)):
     dados = {k: v for k, v in body.model_dump().items() if v is not None}
     if not dados:
         raise HTTPException(status_code=400, detail="Nenhum dado para atualizar")
 
-    sb = get_supabase()
-    res = sb.table("usuarios").update(dados).eq("id", usuario_id).execute()
+    sb = get_supabase_async()
+    res = await sb.table("usuarios").update(dados).eq("id", usuario_id).execute()
     if not res.data:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     return res.data[0]
 
 
 @router.delete("/usuarios/{usuario_id}", status_code=204)
-def desativar_usuario(usuario_id: str, current: dict = Depends(require_admin)):
+async def desativar_usuario(usuario_id: str, current: dict = Depends(require_admin)):
     if usuario_id == current["sub"]:
         raise HTTPException(status_code=400, detail="Você não pode desativar a própria conta")
-    sb = get_supabase()
-    sb.table("usuarios").update({"ativo": False}).eq("id", usuario_id).execute()
+    sb = get_supabase_async()
+    await sb.table("usuarios").update({"ativo": False}).eq("id", usuario_id).execute()
     return None
 
 
 @router.post("/usuarios/{usuario_id}/reset-password")
-def admin_reset_password(usuario_id: str, body: AdminPasswordReset, current: dict = Depends(require_admin)):
+async def admin_reset_password(usuario_id: str, body: AdminPasswordReset, current: dict = Depends(require_admin)):
     if len(body.nova_senha) < 6:
         raise HTTPException(status_code=400, detail="Nova senha deve ter pelo menos 6 caracteres")
 
-    nova_hash = _hash_password(body.nova_senha)
-    sb = get_supabase()
-    res = sb.table("usuarios").update({"senha_hash": nova_hash}).eq("id", usuario_id).execute()
+    nova_hash = await run_in_threadpool(_hash_password, body.nova_senha)
+    sb = get_supabase_async()
+    res = await sb.table("usuarios").update({"senha_hash": nova_hash}).eq("id", usuario_id).execute()
     
     if not res.data:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
@@ -228,18 +231,18 @@ def admin_reset_password(usuario_id: str, body: AdminPasswordReset, current: dic
 
 
 @router.post("/change-password")
-def change_password(body: ChangePasswordRequest, current: dict = Depends(get_current_user)):
-    sb = get_supabase()
-    res = sb.table("usuarios").select("senha_hash").eq("id", current["sub"]).execute()
+async def change_password(body: ChangePasswordRequest, current: dict = Depends(get_current_user)):
+    sb = get_supabase_async()
+    res = await sb.table("usuarios").select("senha_hash").eq("id", current["sub"]).execute()
     if not res.data:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
-    if not _verify_password(body.senha_atual, res.data[0]["senha_hash"]):
+    if not await run_in_threadpool(_verify_password, body.senha_atual, res.data[0]["senha_hash"]):
         raise HTTPException(status_code=401, detail="Senha atual incorreta")
 
     if len(body.nova_senha) < 6:
         raise HTTPException(status_code=400, detail="Nova senha deve ter pelo menos 6 caracteres")
 
-    nova_hash = _hash_password(body.nova_senha)
-    sb.table("usuarios").update({"senha_hash": nova_hash}).eq("id", current["sub"]).execute()
+    nova_hash = await run_in_threadpool(_hash_password, body.nova_senha)
+    await sb.table("usuarios").update({"senha_hash": nova_hash}).eq("id", current["sub"]).execute()
     return {"message": "Senha alterada com sucesso"}
@@ -1,13 +1,27 @@
 """
 Rotas da API - Tratamentos Clínicos (Prontuário)
 """
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 from typing import Optional
 from pydantic import BaseModel
-from backend.config.supabase_client import get_supabase
+from backend.config.supabase_client import get_supabase_async
+from backend.services.queries import fetch_all
+from backend.services.pagination import MAX_LIMIT, parse_sort, aplicar_ordem, paginar
+from backend.services.projection import montar_select
 
 router = APIRouter()
 
+# Colunas e recursos relacionados aceitos em `?fields=` / `?include=`
+CAMPOS_TRATAMENTO = {
+    "id", "paciente_id", "procedimento_id", "dentista_id", "faturamento_id", "status", "observacoes",
+    "procedimentos_ids", "procedimentos_concluidos_ids", "created_at", "updated_at",
+}
+EMBEDS_TRATAMENTO = {
+    "pacientes": "pacientes(nome)",
+    "procedimentos": "procedimentos(nome, valor_padrao)",
+    "dentistas": "dentistas(nome)",
+}
+
 class ClinTratamentoBase(BaseModel):
     paciente_id: str
     procedimento_id: Optional[str] = None
@@ -27,29 +41,46 @@ class ClinTratamentoUpdate(BaseModel):
     procedimentos_concluidos_ids: Optional[list[str]] = None
 
 @router.get("/")
-def listar_tratamentos(paciente_id: Optional[str] = None, status_filtro: Optional[str] = None):
-    sb = get_supabase()
-    q = sb.table("clin_tratamentos").select("*, pacientes(nome), procedimentos(nome, valor_padrao), dentistas(nome)").order("created_at", desc=True)
-    if paciente_id:
-        q = q.eq("paciente_id", paciente_id)
-    if status_filtro:
-        q = q.eq("status", status_filtro)
-    return q.execute().data
+async def listar_tratamentos(
+    paciente_id: Optional[str] = None,
+    status_filtro: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+):
+    sb = get_supabase_async()
+    ordem = parse_sort(sort, {"created_at"}, "-created_at")
+    select = montar_select(fields, include, CAMPOS_TRATAMENTO, EMBEDS_TRATAMENTO, tuple(c for c, _ in ordem))
+
+    def consulta():
+        q = sb.table("clin_tratamentos").select(select)
+        if paciente_id:
+            q = q.eq("paciente_id", paciente_id)
+        if status_filtro:
+            q = q.eq("status", status_filtro)
+        return q
+
+    # Com `limit`, devolve uma página `{items, next_cursor}`; sem ele, a lista completa
+    if limit:
+        return await paginar(consulta(), ordem, limit, cursor)
+    return await fetch_all(lambda: aplicar_ordem(consulta(), ordem))
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def criar_tratamento(tratamento_data: ClinTratamentoCreate):
-    sb = get_supabase()
+async def criar_tratamento(tratamento_data: ClinTratamentoCreate):
+    sb = get_supabase_async()
     dados = tratamento_data.model_dump(exclude_none=True)
-    r = sb.table("clin_tratamentos").insert(dados).execute()
+    r = await sb.table("clin_tratamentos").insert(dados).execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Erro ao criar tratamento clínico")
     return r.data[0]
 
 @router.put("/{tratamento_id}")
-def atualizar_tratamento(tratamento_id: str, tratamento_data: ClinTratamentoUpdate):
-    sb = get_supabase()
+async def atualizar_tratamento(tratamento_id: str, tratamento_data: ClinTratamentoUpdate):
+    sb = get_supabase_async()
     dados = tratamento_data.model_dump(exclude_unset=True)
-    r = sb.table("clin_tratamentos").update(dados).eq("id", tratamento_id).execute()
+    r = await sb.table("clin_tratamentos").update(dados).eq("id", tratamento_id).execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tratamento nao encontrado")
     return r.data[0]
@@ -1,13 +1,23 @@
 ﻿"""
 Rotas da API - Dentistas
 """
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 from pydantic import BaseModel
 
-from backend.config.supabase_client import get_supabase
+from backend.config.supabase_client import get_supabase_async
+from backend.services.queries import fetch_all
+from backend.services.pagination import MAX_LIMIT, parse_sort, aplicar_ordem, paginar
+from backend.services.projection import montar_select
+from backend.services.cache import cache_referencia
+from backend.services.referencia import consulta_cacheada
 
 router = APIRouter()
 
+# Colunas aceitas em `?fields=`
+CAMPOS_DENTISTA = {
+    "id", "nome", "cro", "especialidade", "telefone", "email", "ativo", "created_at", "updated_at",
+}
+
 
 class DentistaBase(BaseModel):
     nome: str
@@ -32,55 +42,79 @@ class DentistaUpdate(BaseModel):
 
 
 @router.get("/")
-def listar_dentistas(ativo: bool | None = None):
-    """Lista todos os dentistas"""
-    sb = get_supabase()
-    query = sb.table('dentistas').select('*').order('nome')
-    if ativo is not None:
-        query = query.eq('ativo', ativo)
-    result = query.execute()
-    return result.data
+async def listar_dentistas(
+    ativo: bool | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: str | None = None,
+    sort: str | None = None,
+    fields: str | None = None,
+):
+    """
+    Lista os dentistas.
+    Com `limit`, devolve uma página `{items, next_cursor}`; sem ele, a lista completa.
+    `fields` restringe as colunas retornadas (ex.: `?fields=nome,cro`).
+    """
+    sb = get_supabase_async()
+    ordem = parse_sort(sort, {"nome", "created_at"}, "nome")
+    select = montar_select(fields, None, CAMPOS_DENTISTA, {}, tuple(c for c, _ in ordem))
+
+    def consulta():
+        query = sb.table('dentistas').select(select)
+        if ativo is not None:
+            query = query.eq('ativo', ativo)
+        return query
+
+    if limit:
+        return await paginar(consulta(), ordem, limit, cursor)
+    # A lista completa é dado de referência (selects de agenda, filtros): vem do cache
+    return await cache_referencia.obter(
+        ('dentistas', 'lista', ativo, select, tuple(ordem)),
+        lambda: fetch_all(lambda: aplicar_ordem(consulta(), ordem)),
+    )
 
 
 @router.get("/{dentista_id}")
-def obter_dentista(dentista_id: str):
+async def obter_dentista(dentista_id: str, fields: str | None = None):
     """Obtém um dentista específico"""
-    sb = get_supabase()
-    result = sb.table('dentistas').select('*').eq('id', dentista_id).execute()
-    if not result.data:
+    sb = get_supabase_async()
+    select = montar_select(fields, None, CAMPOS_DENTISTA, {})
+    dados = await consulta_cacheada(('dentistas', dentista_id, select), sb.table('dentistas').select(select).eq('id', dentista_id))
+    if not dados:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dentista não encontrado")
-    return result.data[0]
+    return dados[0]
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def criar_dentista(dentista_data: DentistaCreate):
+async def criar_dentista(dentista_data: DentistaCreate):
     """Cria um novo dentista"""
-    sb = get_supabase()
+    sb = get_supabase_async()
     dados = dentista_data.model_dump(exclude_none=True)
-    result = sb.table('dentistas').insert(dados).execute()
+    result = await sb.table('dentistas').insert(dados).execute()
+    cache_referencia.invalidar('dentistas')
     if not result.data:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Erro ao criar dentista")
     return result.data[0]
 
 
 @router.put("/{dentista_id}")
-def atualizar_dentista(dentista_id: str, dentista_data: DentistaUpdate):
+async def atualizar_dentista(dentista_id: str, dentista_data: DentistaUpdate):
     """Atualiza um dentista"""
-    sb = get_supabase()
+    sb = get_supabase_async()
     dados = dentista_data.model_dump(exclude_unset=True)
-    result = sb.table('dentistas').update(dados).eq('id', dentista_id).execute()
+    result = await sb.table('dentistas').update(dados).eq('id', dentista_id).execute()
+    cache_referencia.invalidar('dentistas')
     if not result.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dentista não encontrado")
     return result.data[0]
 
 
 @router.delete("/{dentista_id}", status_code=status.HTTP_204_NO_CONTENT)
-def deletar_dentista(dentista_id: str):
+async def deletar_dentista(dentista_id: str):
     """Hard delete com verificação de histórico (bloqueio de integridade)"""
-    sb = get_supabase()
+    sb = get_supabase_async()
     
     # 1. Checa se o dentista tem histórico de agendamentos
-    agendamentos = sb.table('agendamentos').select('id', count='exact').eq('dentista_id', dentista_id).execute()
+    agendamentos = await sb.table('agendamentos').select('id', count='exact').eq('dentista_id', dentista_id).execute()
     if agendamentos.count and agendamentos.count > 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
@@ -88,7 +122,8 @@ def deletar_dentista(dentista_id: str):
         )
 
     # 2. Hard Delete
-    result = sb.table('dentistas').delete().eq('id', dentista_id).execute()
+    result = await sb.table('dentistas').delete().eq('id', dentista_id).execute()
+    cache_referencia.invalidar('dentistas')
     if not result.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dentista não encontrado")
     return None
@@ -1,14 +1,41 @@
 """
 Rotas da API - Faturamentos (Contas a Receber)
 """
-from fastapi import APIRouter, HTTPException, status
-from pydantic import BaseModel
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, status
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import date
-from backend.config.supabase_client import get_supabase
+from postgrest.exceptions import APIError
+from backend.config.supabase_client import get_supabase_async
+from backend.services.queries import chamar_rpc, gather_queries, iter_rows, fetch_all, objeto_inexistente
+from backend.services.pagination import MAX_LIMIT, chave_ordem, parse_sort, aplicar_ordem, paginar
+from backend.services.projection import montar_select
+from backend.services.cache import cache_referencia
+from backend.services.dinheiro import centavos, reais
+from backend.services.parcelamento import (
+    CAMPOS_CRONOGRAMA, ConflitoPagamento, diferenca_cronograma, gerar_cronograma, simular_planos,
+    taxas_por_metodo,
+)
+from backend.services.resumo_mensal import descartar_meses
+from backend.services.referencia import categoria_id, consulta_cacheada
+from backend.services.resumo_clientes import (
+    STATUS_AGENDAMENTO_A_FATURAR, compactar_agendamento, compactar_faturamento, resumir_clientes, soma_transacoes,
+)
 
 router = APIRouter()
 
+# Colunas e recursos relacionados aceitos em `?fields=` / `?include=`
+CAMPOS_FATURAMENTO = {
+    "id", "paciente_id", "procedimento_id", "agendamento_id", "descricao", "valor_original",
+    "valor_desconto", "valor_final", "metodo_pagamento", "numero_parcelas", "status",
+    "created_at", "updated_at",
+}
+EMBEDS_FATURAMENTO = {
+    "pacientes": "pacientes(nome)",
+    "procedimentos": "procedimentos(nome)",
+}
+
 
 class FaturamentoCreate(BaseModel):
     paciente_id: str
@@ -27,100 +54,160 @@ class FaturamentoCreate(BaseModel):
     numero_parcelas: int = 1
 
 
+# Limites do simulador: cenários por chamada e parcelas por cenário
+MAX_CENARIOS = 30
+MAX_PARCELAS = 60
+
+
+class CenarioParcelamento(BaseModel):
+    numero_parcelas: int = Field(1, ge=1, le=MAX_PARCELAS)
+    valor_entrada: float = Field(0.0, ge=0)
+    # Nome ou tipo de fin_formas_pagamento; a taxa informada prevalece sobre a da forma
+    forma_pagamento: Optional[str] = None
+    forma_entrada: Optional[str] = None
+    taxa_porcentagem: Optional[float] = Field(None, ge=0, le=100)
+    taxa_porcentagem_entrada: Optional[float] = Field(None, ge=0, le=100)
+    data_vencimento_primeira: Optional[date] = None
+
+
+class TaxaFormaPagamento(BaseModel):
+    nome: str
+    tipo: str
+    taxa_padrao_porcentagem: float = 0.0
+
+
+class SimulacaoParcelamento(BaseModel):
+    valor_final: float = Field(gt=0)
+    cenarios: list[CenarioParcelamento] = Field(min_length=1, max_length=MAX_CENARIOS)
+    # Sem a lista, usa as formas de pagamento ativas cadastradas
+    formas_pagamento: Optional[list[TaxaFormaPagamento]] = None
+
+
 @router.get("/")
-def listar_faturamentos(status_filtro: Optional[str] = None):
-    sb = get_supabase()
-    q = sb.table("fin_faturamentos").select("*, pacientes(nome), procedimentos(nome)").order("created_at", desc=True)
-    if status_filtro:
-        q = q.eq("status", status_filtro)
-    return q.execute().data
+async def listar_faturamentos(
+    status_filtro: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+):
+    sb = get_supabase_async()
+    ordem = parse_sort(sort, {"created_at", "valor_final"}, "-created_at")
+    select = montar_select(fields, include, CAMPOS_FATURAMENTO, EMBEDS_FATURAMENTO, tuple(c for c, _ in ordem))
+
+    def consulta():
+        q = sb.table("fin_faturamentos").select(select)
+        if status_filtro:
+            q = q.eq("status", status_filtro)
+        return q
+
+    # Com `limit`, devolve uma página `{items, next_cursor}`; sem ele, a lista completa
+    if limit:
+        return await paginar(consulta(), ordem, limit, cursor)
+    return await fetch_all(lambda: aplicar_ordem(consulta(), ordem))
+
+# Views versionadas do resumo por paciente, da mais nova para a mais antiga:
+# v2 lê o livro de saldos (database/resumo_clientes_v2.sql), v1 soma as transações
+RESUMO_CLIENTES_VIEWS = ("resumo_clientes_v2", "resumo_clientes_v1")
+STATUS_FINANCEIRO = {"PENDENTE", "A_FATURAR", "EM_DIA"}
+ORDENS_RESUMO = {"nome", "status_financeiro", "total_faturado", "total_pendente", "total_a_faturar", "qtd_faturamentos"}
+
+
+async def _calcular_resumo_clientes(sb) -> list[dict]:
+    """Resumo calculado na API a partir das linhas brutas (usado enquanto a view não existe no banco)"""
+
+    # Faturamentos e agendamentos são lidos em blocos (sem o corte de max-rows do
+    # PostgREST). De cada linha guardamos só o que o resumo usa; as transações
+    # aninhadas são somadas e descartadas bloco a bloco.
+    async def carregar_faturamentos():
+        consulta = lambda: sb.table("fin_faturamentos").select("id, paciente_id, valor_final, status, agendamento_id, fin_transacoes(valor, status, descricao)")
+        return [compactar_faturamento(f) async for f in iter_rows(consulta, key="id")]
+
+    async def carregar_agendamentos():
+        consulta = lambda: sb.table("agendamentos").select("id, paciente_id, status, agendamento_procedimentos(procedimentos(valor_padrao))").in_("status", STATUS_AGENDAMENTO_A_FATURAR)
+        return [compactar_agendamento(ag) async for ag in iter_rows(consulta, key="id")]
+
+    # As três leituras são independentes e correm em paralelo
+    pacientes, faturamentos, agendamentos = await asyncio.gather(
+        fetch_all(lambda: sb.table("pacientes").select("id, nome, cpf, telefone").order("nome").order("id")),
+        carregar_faturamentos(),
+        carregar_agendamentos(),
+    )
+    return resumir_clientes(pacientes, faturamentos, agendamentos)
+
 
 @router.get("/resumo-clientes")
-def listar_resumo_clientes():
-    sb = get_supabase()
-    # Pega pacientes list
-    pacientes_res = sb.table("pacientes").select("id, nome, cpf, telefone").order("nome").execute()
-    pacientes = pacientes_res.data
-
-    # Pega faturamentos globais com transações
-    fat_res = sb.table("fin_faturamentos").select("paciente_id, valor_final, status, agendamento_id, fin_transacoes(valor, status, descricao)").execute()
-    faturamentos = fat_res.data
-    
-    # Pega todos os agendamentos com procedimentos para calcular o que falta faturar
-    agends_query = sb.table("agendamentos").select("id, paciente_id, status, agendamento_procedimentos(procedimentos(valor_padrao))").in_("status", ["agendado", "confirmado", "em_atendimento", "concluido"]).execute()
-    agendamentos = agends_query.data
-    agendamentos_faturados_ids = [f["agendamento_id"] for f in faturamentos if f.get("agendamento_id")]
-    
-    resumo = []
-    for p in pacientes:
-        fat_paciente = [f for f in faturamentos if f["paciente_id"] == p["id"] and f["status"] != "CANCELADO"]
-        total_pendente = 0
-        total_faturado = 0
-        for f in fat_paciente:
-            txs = f.get("fin_transacoes", []) or []
-            
-            pago = sum(t["valor"] for t in txs if t["status"] == "PAGO" and "Taxa de Operadora" not in (t.get("descricao") or ""))
-            pend = sum(t["valor"] for t in txs if t["status"] == "PENDENTE" and "Taxa de Operadora" not in (t.get("descricao") or ""))
-            
-            if txs:
-                f["valor_final"] = pago + pend
-                
-            total_pendente += pend
-            total_faturado += f["valor_final"]
-        
-        # Calcula total a faturar baseado em agendamentos não faturados
-        a_faturar_pac = [a for a in agendamentos if a["paciente_id"] == p["id"] and a["id"] not in agendamentos_faturados_ids]
-        total_a_faturar = 0
-        for ag in a_faturar_pac:
-            for ap in ag.get("agendamento_procedimentos", []) or []:
-                if ap and ap.get("procedimentos") and ap["procedimentos"].get("valor_padrao"):
-                    total_a_faturar += ap["procedimentos"]["valor_padrao"]
-
-        status_financeiro = "EM_DIA"
-        if total_pendente > 0:
-            status_financeiro = "PENDENTE"
-        elif total_a_faturar > 0:
-            status_financeiro = "A_FATURAR"
-            
-        resumo.append({
-            "paciente_id": p["id"],
-            "nome": p["nome"],
-            "cpf": p["cpf"],
-            "telefone": p["telefone"],
-            "total_faturado": total_faturado,
-            "total_pendente": total_pendente,
-            "total_a_faturar": total_a_faturar,
-            "qtd_faturamentos": len(fat_paciente),
-            "status_financeiro": status_financeiro
-        })
-        
+async def listar_resumo_clientes(status_financeiro: Optional[str] = None, sort: Optional[str] = None):
+    """
+    Resumo financeiro por paciente: uma linha compacta por paciente, vinda da
+    view de resumo mais nova aplicada no banco. O filtro por `status_financeiro`
+    e a ordenação (`?sort=-total_pendente`, por exemplo) são feitos no banco.
+    """
+    if status_financeiro and status_financeiro not in STATUS_FINANCEIRO:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"status_financeiro inválido. Use: {sorted(STATUS_FINANCEIRO)}")
+    ordem = parse_sort(sort, ORDENS_RESUMO, "nome", desempate="paciente_id")
+    sb = get_supabase_async()
+
+    def consulta(view):
+        q = sb.table(view).select("*")
+        if status_financeiro:
+            q = q.eq("status_financeiro", status_financeiro)
+        return aplicar_ordem(q, ordem)
+
+    for view in RESUMO_CLIENTES_VIEWS:
+        try:
+            return await fetch_all(lambda: consulta(view))
+        except APIError as e:
+            if not objeto_inexistente(e):
+                raise
+
+    # Nenhuma view aplicada neste banco: mesmo resultado, calculado na API
+    resumo = await _calcular_resumo_clientes(sb)
+    if status_financeiro:
+        resumo = [r for r in resumo if r["status_financeiro"] == status_financeiro]
+    for coluna, desc in reversed(ordem):
+        resumo.sort(key=lambda r: chave_ordem(r[coluna]), reverse=desc)
     return resumo
 
+
 @router.get("/cliente/{paciente_id}")
-def detalhes_financeiros_cliente(paciente_id: str):
-    sb = get_supabase()
-    
-    # 1. Busca Faturamentos Existentes do Paciente
-    fats_res = sb.table("fin_faturamentos").select("*, procedimentos(nome), fin_transacoes(valor, status, descricao)").eq("paciente_id", paciente_id).order("created_at", desc=True).execute()
-    faturamentos = fats_res.data
-    
-    for fat in faturamentos:
-        txs = fat.get("fin_transacoes", []) or []
-        valor_pago = sum(t["valor"] for t in txs if t["status"] == "PAGO" and "Taxa de Operadora" not in (t.get("descricao") or ""))
-        valor_pendente = sum(t["valor"] for t in txs if t["status"] == "PENDENTE" and "Taxa de Operadora" not in (t.get("descricao") or ""))
-        fat["valor_pago"] = valor_pago
-        fat["saldo_devedor"] = valor_pendente
-        
-        if txs:
-            fat["valor_final"] = valor_pago + valor_pendente
-            
-        fat.pop("fin_transacoes", None)
+async def detalhes_financeiros_cliente(paciente_id: str):
+    sb = get_supabase_async()
+    agendamentos_query = sb.table("agendamentos").select("id, data_hora, duracao_minutos, observacoes, dentistas(nome), agendamento_procedimentos(procedimentos(id, nome, valor_padrao))").eq("paciente_id", paciente_id).in_("status", STATUS_AGENDAMENTO_A_FATURAR)
+
+    # 1. Busca Faturamentos Existentes do Paciente e, em paralelo, os agendamentos
+    # que podem estar a faturar (o cruzamento entre os dois é feito em memória).
+    # Os saldos vêm prontos do livro fin_saldos_faturamento; sem ele, são
+    # somados a partir das transações.
+    try:
+        faturamentos, agendamentos_concluidos = await gather_queries(
+            sb.table("fin_faturamentos").select("*, procedimentos(nome), fin_saldos_faturamento(qtd_transacoes, valor_pago, valor_pendente)").eq("paciente_id", paciente_id).order("created_at", desc=True),
+            agendamentos_query,
+        )
+        for fat in faturamentos:
+            saldo = fat.pop("fin_saldos_faturamento", None) or {}
+            fat["valor_pago"] = saldo.get("valor_pago", 0)
+            fat["saldo_devedor"] = saldo.get("valor_pendente", 0)
+            if saldo.get("qtd_transacoes"):
+                fat["valor_final"] = reais(centavos(fat["valor_pago"]) + centavos(fat["saldo_devedor"]))
+    except APIError as e:
+        if not objeto_inexistente(e):
+            raise
+        faturamentos, agendamentos_concluidos = await gather_queries(
+            sb.table("fin_faturamentos").select("*, procedimentos(nome), fin_transacoes(valor, status, descricao)").eq("paciente_id", paciente_id).order("created_at", desc=True),
+            agendamentos_query,
+        )
+        for fat in faturamentos:
+            txs = fat.pop("fin_transacoes", None) or []
+            pago, pendente = soma_transacoes(txs, "PAGO"), soma_transacoes(txs, "PENDENTE")
+            fat["valor_pago"] = reais(pago)
+            fat["saldo_devedor"] = reais(pendente)
+            if txs:
+                fat["valor_final"] = reais(pago + pendente)
     
     # 2. Busca Procedimentos a Faturar (Agendamentos concluidos sem Faturamento)
-    agendamentos_faturados_ids = [f["agendamento_id"] for f in faturamentos if f.get("agendamento_id")]
-    
-    agends_query = sb.table("agendamentos").select("id, data_hora, duracao_minutos, observacoes, dentistas(nome), agendamento_procedimentos(procedimentos(id, nome, valor_padrao))").eq("paciente_id", paciente_id).in_("status", ["agendado", "confirmado", "em_atendimento", "concluido"]).execute()
-    agendamentos_concluidos = agends_query.data
+    agendamentos_faturados_ids = {f["agendamento_id"] for f in faturamentos if f.get("agendamento_id")}
     
     a_faturar = [a for a in agendamentos_concluidos if a["id"] not in agendamentos_faturados_ids]
     
@@ -130,224 +217,191 @@ def detalhes_financeiros_cliente(paciente_id: str):
     }
 
 
+async def _criar_faturamento_sequencial(sb, faturamento: dict, tratamento: dict, cronograma: dict) -> dict:
+    """Alternativa a criar_faturamento_v1 (ver `chamar_rpc`)"""
+    fat_res = await sb.table("fin_faturamentos").insert(faturamento).execute()
+    if not fat_res.data:
+        raise HTTPException(status_code=400, detail="Erro ao criar faturamento")
+    faturamento_criado = fat_res.data[0]
+    fat_id = faturamento_criado["id"]
+
+    await sb.table("clin_tratamentos").insert({**tratamento, "faturamento_id": fat_id}).execute()
+
+    categoria_receita_id = await categoria_id("Atendimento Clínico") or 1
+    transacoes = [{**t, "categoria_id": categoria_receita_id, "faturamento_id": fat_id} for t in cronograma["transacoes"]]
+
+    taxa = cronograma["taxa_entrada"]
+    if taxa:
+        cat_taxa_id = await categoria_id("Taxa de Operadora", criar={"tipo": "DESPESA", "escopo": "CLINICA"})
+        if cat_taxa_id:
+            await sb.table("fin_transacoes").insert({
+                **taxa, "categoria_id": cat_taxa_id, "faturamento_id": fat_id,
+                "conta_origem": "CLINICA", "status": "PAGO",
+            }).execute()
+
+    t_res = await sb.table("fin_transacoes").insert(transacoes).execute()
+    if not t_res.data:
+        raise HTTPException(status_code=500, detail="Faturamento gerado, mas erro ao criar parcelas")
+
+    if faturamento.get("agendamento_id"):
+        await sb.table("agendamentos").update({"status": "concluido"}).eq("id", faturamento["agendamento_id"]).execute()
+
+    return {"faturamento": faturamento_criado, "parcelas_geradas": len(transacoes)}
+
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def criar_faturamento(dados: FaturamentoCreate):
+async def criar_faturamento(dados: FaturamentoCreate):
     try:
-        sb = get_supabase()
-        payload = dados.model_dump(exclude_none=True)
-        
-        # Helper fields to pop
-        payload.pop("procedimento_id", None)
-        payload.pop("procedimentos_ids", None)
-        payload.pop("valor_entrada", None)
-        payload.pop("taxa_porcentagem_entrada", None)
-        payload.pop("taxa_valor_entrada", None)
-        payload.pop("data_vencimento_primeira", None)
-        payload.pop("numero_parcelas", None)
-        
-        # 1. Cria o Faturamento (Contrato Macro)
-        fat_res = sb.table("fin_faturamentos").insert(payload).execute()
-        if not fat_res.data:
-            raise HTTPException(status_code=400, detail="Erro ao criar faturamento")
-        
-        faturamento_criado = fat_res.data[0]
-        fat_id = faturamento_criado["id"]
-        
-        # 1.1 Cria o vínculo com Tratamento Clínico
-        tratamento_payload = {
+        sb = get_supabase_async()
+        cronograma = gerar_cronograma(
+            descricao=dados.descricao,
+            valor_final=dados.valor_final,
+            metodo_pagamento=dados.metodo_pagamento,
+            valor_entrada=dados.valor_entrada,
+            numero_parcelas=dados.numero_parcelas,
+            data_vencimento_primeira=dados.data_vencimento_primeira,
+            taxa_porcentagem_entrada=dados.taxa_porcentagem_entrada,
+            taxa_valor_entrada=dados.taxa_valor_entrada,
+        )
+
+        # Contrato macro, sem os campos auxiliares do cronograma
+        faturamento = dados.model_dump(exclude_none=True, exclude={
+            "procedimento_id", "procedimentos_ids", "valor_entrada", "taxa_porcentagem_entrada",
+            "taxa_valor_entrada", "data_vencimento_primeira", "numero_parcelas",
+        })
+        faturamento["status"] = cronograma["status"]
+        tratamento = {
             "paciente_id": dados.paciente_id,
             "procedimento_id": dados.procedimento_id,
             "procedimentos_ids": dados.procedimentos_ids,
-            "faturamento_id": fat_id,
             "status": "EM_ANDAMENTO",
             "observacoes": f"Tratamento gerado a partir do Orçamento: {dados.descricao}"
         }
-        sb.table("clin_tratamentos").insert(tratamento_payload).execute()
-        
-        # 1.1 Cálculos da Entrada
-        valor_entrada = dados.valor_entrada if dados.valor_entrada else 0.0
-        valor_parcelar = dados.valor_final - valor_entrada
-        numero_parcelas = dados.numero_parcelas if dados.numero_parcelas > 0 else 1
-        valor_parcela = round(valor_parcelar / numero_parcelas, 2)
-        
-        # Pegar Categoria ID Receita Clínica Omissa
-        cat_res = sb.table("fin_categorias").select("id").eq("nome", "Atendimento Clínico").execute()
-        categoria_receita_id = cat_res.data[0]["id"] if cat_res.data else 1
-    
-        # 2. Cria as Parcelas
-        transacoes = []
-        from datetime import datetime
-        from dateutil.relativedelta import relativedelta
-        hoje = datetime.now()
-        
-        if valor_entrada > 0:
-            transacoes.append({
-                "categoria_id": categoria_receita_id,
-                "faturamento_id": fat_id,
-                "descricao": f"Entrada (À Vista) - {dados.descricao}",
-                "valor": valor_entrada,
-                "taxa_porcentagem": dados.taxa_porcentagem_entrada,
-                "taxa_valor": dados.taxa_valor_entrada,
-                "data_vencimento": hoje.date().isoformat(),
-                "data_pagamento": hoje.date().isoformat(),
-                "conta_destino": "CLINICA",
-                "status": "PAGO",
-                "metodo_pagamento": dados.metodo_pagamento
-            })
-            
-            # Se teve taxa na operadora, gerar a despesa correspondente (igual ao 'Dar Baixa')
-            if dados.taxa_valor_entrada and dados.taxa_valor_entrada > 0:
-                cat_taxa_res = sb.table("fin_categorias").select("id").eq("nome", "Taxa de Operadora").execute()
-                if cat_taxa_res.data:
-                    cat_taxa_id = cat_taxa_res.data[0]["id"]
-                else:
-                    nova_cat = sb.table("fin_categorias").insert({"nome": "Taxa de Operadora", "tipo": "DESPESA", "escopo": "CLINICA", "ativo": True}).execute()
-                    cat_taxa_id = nova_cat.data[0]["id"] if nova_cat.data else None
-                    
-                if cat_taxa_id:
-                    sb.table("fin_transacoes").insert({
-                        "categoria_id": cat_taxa_id,
-                        "faturamento_id": fat_id,
-                        "descricao": f"Taxa de Operadora ({dados.metodo_pagamento}) — Entrada",
-                        "valor": round(dados.taxa_valor_entrada, 2),
-                        "data_vencimento": hoje.date().isoformat(),
-                        "data_pagamento": hoje.date().isoformat(),
-                        "conta_origem": "CLINICA",
-                        "status": "PAGO",
-                        "metodo_pagamento": dados.metodo_pagamento,
-                    }).execute()
-            
-        if dados.data_vencimento_primeira:
-            data_base = datetime.fromisoformat(str(dados.data_vencimento_primeira))
-        else:
-            data_base = hoje if numero_parcelas == 1 else (hoje + relativedelta(months=1))
-            
-        if valor_parcelar > 0:
-            for i in range(numero_parcelas):
-                vencimento = (data_base + relativedelta(months=i)).date().isoformat()
-                estado_pagamento = "PENDENTE"
-                data_pag = None
-    
-                transacoes.append({
-                    "categoria_id": categoria_receita_id,
-                    "faturamento_id": fat_id,
-                    "descricao": f"Parcela {i+1}/{numero_parcelas} - {dados.descricao}",
-                    "valor": valor_parcela,
-                    "data_vencimento": vencimento,
-                    "data_pagamento": data_pag,
-                    "conta_destino": "CLINICA" if estado_pagamento == "PAGO" else None,
-                    "status": estado_pagamento
-                })
-    
-        t_res = sb.table("fin_transacoes").insert(transacoes).execute()
-        if not t_res.data:
-             raise HTTPException(status_code=500, detail="Faturamento gerado, mas erro ao criar parcelas")
-        
-        if valor_parcelar == 0 and valor_entrada > 0:
-            status_global = "QUITADO"
-        elif valor_entrada > 0:
-            status_global = "PAGO_PARCIAL"
-        else:
-            status_global = "ABERTO"  # Aceitando faturamento zerado/100% aberto
-            
-        sb.table("fin_faturamentos").update({"status": status_global}).eq("id", fat_id).execute()
-        faturamento_criado["status"] = status_global
-            
-        if dados.agendamento_id:
-            sb.table("agendamentos").update({"status": "concluido"}).eq("id", dados.agendamento_id).execute()
-    
-        return {"message": "Faturamento processado com sucesso", "faturamento": faturamento_criado, "parcelas_geradas": len(transacoes)}
+
+        # Faturamento, tratamento, parcelas, taxa e agendamento numa transação só (um round-trip)
+        res = await chamar_rpc(sb, "criar_faturamento_v1", {
+            "p_faturamento": faturamento,
+            "p_tratamento": tratamento,
+            "p_transacoes": cronograma["transacoes"],
+            "p_taxa": cronograma["taxa_entrada"],
+        }, lambda: _criar_faturamento_sequencial(sb, faturamento, tratamento, cronograma))
+        if res.get("categoria_criada"):
+            cache_referencia.invalidar("fin_categorias")
+
+        taxa = cronograma["taxa_entrada"]
+        descartar_meses(*(t["data_vencimento"] for t in cronograma["transacoes"]), taxa and taxa["data_vencimento"])
+        return {"message": "Faturamento processado com sucesso", "faturamento": res["faturamento"], "parcelas_geradas": res["parcelas_geradas"]}
+    except HTTPException:
+        raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.put("/{faturamento_id}")
-def setup_faturamento(faturamento_id: str, dados: FaturamentoCreate):
-    sb = get_supabase()
-    
-    # 1. Update the existing Draft Macro Contract
-    payload = dados.model_dump(exclude_none=True)
-    fat_res = sb.table("fin_faturamentos").update(payload).eq("id", faturamento_id).execute()
+@router.post("/simular")
+async def simular_parcelamento(dados: SimulacaoParcelamento):
+    """
+    Simula várias opções de pagamento de um orçamento numa chamada só (nada é
+    gravado): para cada cenário, as parcelas com vencimento, taxa da operadora
+    e líquido, e os totais. Mesmo motor do cronograma gravado ao criar o faturamento.
+    """
+    if dados.formas_pagamento is not None:
+        formas = [f.model_dump() for f in dados.formas_pagamento]
+    else:
+        sb = get_supabase_async()
+        formas = await consulta_cacheada(
+            ("fin_formas_pagamento", "lista", True),
+            sb.table("fin_formas_pagamento").select("*").order("nome").eq("ativo", True),
+        )
+    try:
+        planos = simular_planos(dados.valor_final, [c.model_dump() for c in dados.cenarios], taxas_por_metodo(formas))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"valor_final": dados.valor_final, "planos": planos}
+
+
+async def _setup_faturamento_sequencial(sb, faturamento_id: str, payload: dict, diferenca: dict) -> dict:
+    """Alternativa a setup_faturamento_v1 (ver `chamar_rpc`): uma escrita por vez, na ordem"""
+    fat_res = await sb.table("fin_faturamentos").update(payload).eq("id", faturamento_id).execute()
     if not fat_res.data:
         raise HTTPException(status_code=404, detail="Faturamento rascunho não encontrado")
-    
-    faturamento_atualizado = fat_res.data[0]
-    fat_id = faturamento_atualizado["id"]
-    
-    # 1.1 Cálculos da Entrada
-    valor_entrada = dados.valor_entrada if dados.valor_entrada else 0.0
-    valor_parcelar = dados.valor_final - valor_entrada
-    numero_parcelas = dados.numero_parcelas if dados.numero_parcelas > 0 else 1
-    valor_parcela = round(valor_parcelar / numero_parcelas, 2)
-    
-    # Clear any existing transactions just in case (safe-guard)
-    sb.table("fin_transacoes").delete().eq("faturamento_id", fat_id).execute()
-    
-    cat_res = sb.table("fin_categorias").select("id").eq("nome", "Atendimento Clínico").execute()
-    categoria_receita_id = cat_res.data[0]["id"] if cat_res.data else 1
-
-    # 2. Re-create the Installments
-    transacoes = []
-    from datetime import datetime
-    from dateutil.relativedelta import relativedelta
-    hoje = datetime.now()
-    
-    # Se tem entrada, cria a transação de entrada como Parcela 0 (À Vista)
-    if valor_entrada > 0:
-        transacoes.append({
-            "categoria_id": categoria_receita_id,
-            "faturamento_id": fat_id,
-            "descricao": f"Entrada (À Vista) - {dados.descricao}",
-            "valor": valor_entrada,
-            "data_vencimento": hoje.date().isoformat(),
-            "data_pagamento": hoje.date().isoformat(),
-            "conta_destino": "CLINICA",
-            "status": "PAGO"
+    if diferenca["gravar"]:
+        await sb.table("fin_transacoes").upsert(diferenca["gravar"], on_conflict="id").execute()
+    if diferenca["remover"]:
+        await sb.table("fin_transacoes").delete().eq("faturamento_id", faturamento_id).in_("id", diferenca["remover"]).execute()
+    if payload.get("agendamento_id"):
+        await sb.table("agendamentos").update({"status": "concluido"}).eq("id", payload["agendamento_id"]).execute()
+    return {"faturamento": fat_res.data[0]}
+
+
+@router.put("/{faturamento_id}")
+async def setup_faturamento(faturamento_id: str, dados: FaturamentoCreate):
+    """
+    Configura o faturamento rascunho e o seu cronograma. As transações já gravadas
+    são comparadas com o cronograma desejado e só o que mudou é escrito, numa
+    transação só (setup_faturamento_v1): salvar de novo o mesmo plano só lê.
+    Um plano que deixaria de fora uma entrada ou parcela já paga, ou que não fecha
+    com o que já foi pago, é recusado (409).
+    """
+    sb = get_supabase_async()
+
+    # 1. Entrada e parcelas pelo mesmo motor de criar_faturamento
+    cronograma = gerar_cronograma(
+        descricao=dados.descricao,
+        valor_final=dados.valor_final,
+        metodo_pagamento=dados.metodo_pagamento,
+        valor_entrada=dados.valor_entrada,
+        numero_parcelas=dados.numero_parcelas,
+        data_vencimento_primeira=dados.data_vencimento_primeira,
+        taxa_porcentagem_entrada=dados.taxa_porcentagem_entrada,
+        taxa_valor_entrada=dados.taxa_valor_entrada,
+    )
+
+    # 2. Faturamento e transações atuais, em paralelo
+    faturamentos, existentes = await gather_queries(
+        sb.table("fin_faturamentos").select("id").eq("id", faturamento_id),
+        sb.table("fin_transacoes").select(", ".join(["id", *CAMPOS_CRONOGRAMA])).eq("faturamento_id", faturamento_id),
+    )
+    if not faturamentos:
+        raise HTTPException(status_code=404, detail="Faturamento rascunho não encontrado")
+
+    categoria_receita_id = await categoria_id("Atendimento Clínico") or 1
+    desejadas = [
+        {**t, "categoria_id": categoria_receita_id, "faturamento_id": faturamento_id}
+        for t in cronograma["transacoes"]
+    ]
+    taxa = cronograma["taxa_entrada"]
+    cat_taxa_id = taxa and await categoria_id("Taxa de Operadora", criar={"tipo": "DESPESA", "escopo": "CLINICA"})
+    if cat_taxa_id:
+        desejadas.append({
+            **taxa, "categoria_id": cat_taxa_id, "faturamento_id": faturamento_id,
+            "conta_origem": "CLINICA", "status": "PAGO",
         })
-    
-    # Define a data base para os vencimentos do restante
-    if dados.data_vencimento_primeira:
-        data_base = datetime.fromisoformat(str(dados.data_vencimento_primeira))
-    else:
-        # Se não especificou, o primeiro vencimento cai pro mês que vem (ou hoje se for só 1 parcela)
-        data_base = hoje if numero_parcelas == 1 else (hoje + relativedelta(months=1))
-    
-    # Se não houver saldo a parcelar (pagou tudo na entrada), a gente não gera parcelas extras.
-    if valor_parcelar > 0:
-        for i in range(numero_parcelas):
-            vencimento = (data_base + relativedelta(months=i)).date().isoformat()
-            
-            estado_pagamento = "PENDENTE"
-            data_pag = None
-
-            transacoes.append({
-                "categoria_id": categoria_receita_id,
-                "faturamento_id": fat_id,
-                "descricao": f"Parcela {i+1}/{numero_parcelas} - {dados.descricao}",
-                "valor": valor_parcela,
-                "data_vencimento": vencimento,
-                "data_pagamento": data_pag,
-                "conta_destino": "CLINICA" if estado_pagamento == "PAGO" else None,
-                "status": estado_pagamento
-            })
-
-    sb.table("fin_transacoes").insert(transacoes).execute()
-    
-    # Verifica o "overall status"
-    if valor_parcelar == 0 and valor_entrada > 0:
-        # Pagou 100% de entrada
-        status_global = "QUITADO"
-    elif valor_entrada > 0:
-        # Deu entrada, mas parcelou o resto
-        status_global = "PAGO_PARCIAL"
-    else:
-        status_global = "PENDENTE"
 
-    sb.table("fin_faturamentos").update({"status": status_global}).eq("id", fat_id).execute()
-    faturamento_atualizado["status"] = status_global
-        
-    if dados.agendamento_id:
-        sb.table("agendamentos").update({"status": "concluido"}).eq("id", dados.agendamento_id).execute()
+    # 3. Só o que difere do que já está gravado; nada é escrito se o plano apagaria um pagamento
+    try:
+        diferenca = diferenca_cronograma(existentes, desejadas)
+    except ConflitoPagamento as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-    return {"message": "Setup de faturamento concluído", "faturamento": faturamento_atualizado}
+    # 4. Contrato macro (já com o status do cronograma), transações e agendamento numa transação só
+    payload = {**dados.model_dump(exclude_none=True), "status": cronograma["status"]}
+    try:
+        res = await chamar_rpc(sb, "setup_faturamento_v1", {
+            "p_faturamento_id": faturamento_id,
+            "p_faturamento": payload,
+            "p_gravar": diferenca["gravar"],
+            "p_remover": diferenca["remover"],
+        }, lambda: _setup_faturamento_sequencial(sb, faturamento_id, payload, diferenca))
+    except APIError as e:
+        if e.code == "P0002":
+            raise HTTPException(status_code=404, detail="Faturamento rascunho não encontrado")
+        if e.code == "40001":
+            raise HTTPException(status_code=409, detail="Uma parcela foi paga durante o setup; tente novamente")
+        raise
+    descartar_meses(*diferenca["datas"])
+
+    return {
+        "message": "Setup de faturamento concluído",
+        "faturamento": res["faturamento"],
+        "transacoes_gravadas": len(diferenca["gravar"]),
+        "transacoes_removidas": len(diferenca["remover"]),
+    }
@@ -1,15 +1,42 @@
 """
 Rotas da API - Financeiro Global (Transações Core)
 """
-from fastapi import APIRouter, HTTPException, status
-from pydantic import BaseModel
-from datetime import date
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile, status
+from pydantic import BaseModel, Field
+from datetime import date, timedelta
 from typing import Optional
-
-from backend.config.supabase_client import get_supabase
+from uuid import UUID
+from dateutil.relativedelta import relativedelta
+from postgrest.exceptions import APIError
+from starlette.concurrency import run_in_threadpool
+
+from backend.config.supabase_client import get_supabase_async
+from backend.services.cache import cache_dashboard, cache_referencia
+from backend.services.jobs import job_runner
+from backend.services.aging import FAIXAS, a_receber, agrupar_vencidas
+from backend.services.conciliacao import FORMATOS, IndiceCandidatos, detectar_encoding, detectar_formato, ler_extrato
+from backend.services.fluxo_caixa import GRANULARIDADES, projetar, repasse_por_metodo
+from backend.services.kpis import agregador_dashboard
+from backend.services.migracao_taxas import LOTE_PADRAO, migrar_taxas
+from backend.services.queries import PAGE_SIZE, chamar_rpc, coluna_inexistente, fetch_all, gather_queries, iter_rows, objeto_inexistente
+from backend.services.resumo_mensal import descartar_dashboard, descartar_meses, linhas_por_mes, meses_entre, somar_meses
+from backend.services.pagination import MAX_LIMIT, parse_sort, aplicar_ordem, encode_cursor, paginar, paginar_lista
+from backend.services.dinheiro import centavos, reais
+from backend.services.parcelamento import redistribuir_residual
+from backend.services.projection import montar_select
+from backend.services.referencia import categoria_id, consulta_cacheada
 
 router = APIRouter()
 
+# Colunas e recursos relacionados aceitos em `?fields=` / `?include=`
+CAMPOS_TRANSACAO = {
+    "id", "categoria_id", "faturamento_id", "descricao", "valor", "data_vencimento", "data_pagamento",
+    "conta_origem", "conta_destino", "status", "taxa_porcentagem", "taxa_valor", "created_at", "updated_at",
+}
+EMBEDS_TRANSACAO = {
+    "fin_categorias": "fin_categorias(nome, tipo, escopo)",
+}
+
 
 class TransacaoCreate(BaseModel):
     categoria_id: int
@@ -51,113 +78,304 @@ def _proximo_mes(mes: int, ano: int):
 
 
 @router.get("/categorias")
-def listar_categorias_ativas():
-    sb = get_supabase()
-    return sb.table("fin_categorias").select("*").eq("ativo", True).execute().data
+async def listar_categorias_ativas():
+    sb = get_supabase_async()
+    return await consulta_cacheada(("fin_categorias", "ativas"), sb.table("fin_categorias").select("*").eq("ativo", True))
+
+
+KPIS_RESPOSTA = (
+    "faturamento_bruto", "lucro_operacional", "a_receber", "aportes_pessoais",
+    "retiradas_pro_labore", "despesas_pessoais", "caixa_pessoal_livre",
+)
+SERIE_MAX_MESES = 36
+FLUXO_MAX_MESES = 24
+ORDENS_AGING = {"total", "qtd", "vencimento_mais_antigo", "nome"}
+# Ids por baixa em lote (o caminho sem RPC os envia num filtro in.(...) na URL)
+MAX_ITENS_LOTE = 200
+# Dias de diferença aceitos entre o crédito do extrato e o vencimento da parcela
+CONCILIACAO_JANELA_DIAS = 5
+CONCILIACAO_MAX_JANELA = 30
+
+
+def _kpis_em_reais(linhas: list[dict]) -> dict:
+    kpis = agregador_dashboard.agregar(linhas)
+    return {nome: reais(kpis[nome]) for nome in KPIS_RESPOSTA}
+
+
+def _parse_mes(valor: str, campo: str) -> tuple[int, int]:
+    try:
+        ano, mes = (int(p) for p in valor.split("-"))
+        if not 1 <= mes <= 12:
+            raise ValueError
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"`{campo}` deve estar no formato AAAA-MM")
+    return ano, mes
 
 
 @router.get("/dashboard")
-def resumo_dashboard_global(mes: Optional[int] = None, ano: Optional[int] = None):
+async def resumo_dashboard_global(mes: Optional[int] = None, ano: Optional[int] = None):
     # Calcula todos os 7 KPIs do novo motor global.
-    sb = get_supabase()
+    sb = get_supabase_async()
     ano = ano or date.today().year
     mes = mes or date.today().month
-    prox_mes, prox_ano = _proximo_mes(mes, ano)
-
-    # Pegamos TODAS as transações do mês para processar em memória rapidamente
-    res = sb.table("fin_transacoes").select("*, fin_categorias(nome, tipo, escopo)").gte("data_vencimento", f"{ano}-{mes:02d}-01").lt("data_vencimento", f"{prox_ano}-{prox_mes:02d}-01").execute()
-    txs = res.data
 
-    # Helper seguro para checar tipo e escopo da categoria, já que fin_categorias pode ser None em faturamentos avulsos
-    def get_cat_tipo(t):
-        return t.get("fin_categorias", {}).get("tipo") if t.get("fin_categorias") else None
-        
-    def get_cat_escopo(t):
-        return t.get("fin_categorias", {}).get("escopo") if t.get("fin_categorias") else None
+    async def calcular():
+        # Linhas do resumo mensal (ou as transações do mês, se o rollup não existir), numa passada
+        linhas = (await linhas_por_mes(sb, (ano, mes), (ano, mes)))[(ano, mes)]
+        return {
+            "periodo": f"{mes:02d}/{ano}",
+            "kpis": _kpis_em_reais(linhas),
+            "txs_count": sum(l["qtd"] for l in linhas)
+        }
 
-    # KPI 1: Faturamento Bruto (Entrou na conta clínica - apenas PAGO)
-    faturamento_bruto = sum(t["valor"] for t in txs if get_cat_tipo(t) == "RECEITA" and t.get("conta_destino") == "CLINICA" and t.get("status") == "PAGO")
-    
-    # KPI 2: Despesas da Clínica pagas (inclui taxas de operadora registradas como despesa real)
-    despesas_clinica = sum(t["valor"] for t in txs if get_cat_tipo(t) == "DESPESA" and get_cat_escopo(t) == "CLINICA" and t.get("status") == "PAGO")
-    lucro_operacional = faturamento_bruto - despesas_clinica
+    # Um cálculo por mês enquanto nenhuma escrita tocar o mês (requisições simultâneas compartilham a carga)
+    return await cache_dashboard.obter(("dashboard", ano, mes), calcular)
 
-    # KPI 3: A Receber no Mês (Inadimplência ou a Vencer)
-    a_receber = sum(t["valor"] for t in txs if get_cat_tipo(t) == "RECEITA" and t.get("status") == "PENDENTE")
 
-    # KPI 4: Aportes (O que o dentista injetou do próprio bolso na clínica)
-    aportes = sum(t["valor"] for t in txs if t.get("conta_origem") == "PESSOAL" and t.get("conta_destino") == "CLINICA" and t.get("status") == "PAGO")
+@router.get("/dashboard/serie")
+async def serie_dashboard(de: Optional[str] = None, ate: Optional[str] = None):
+    """
+    KPIs mês a mês entre `de` e `ate` (AAAA-MM, até 36 meses; padrão: os últimos 12),
+    cada mês com os KPIs do mesmo mês no ano anterior e a variação anual.
+    """
+    hoje = date.today()
+    fim = _parse_mes(ate, "ate") if ate else (hoje.year, hoje.month)
+    inicio = _parse_mes(de, "de") if de else somar_meses(fim, -11)
+    meses = meses_entre(inicio, fim) if inicio <= fim else []
+    if not meses:
+        raise HTTPException(status_code=400, detail="`de` deve ser anterior ou igual a `ate`")
+    if len(meses) > SERIE_MAX_MESES:
+        raise HTTPException(status_code=400, detail=f"Período máximo de {SERIE_MAX_MESES} meses")
+
+    # Um ano antes do início, para a comparação anual
+    linhas = await linhas_por_mes(get_supabase_async(), somar_meses(inicio, -12), fim)
+    kpis = {m: _kpis_em_reais(l) for m, l in linhas.items()}
+
+    serie = []
+    for ano, mes in meses:
+        atual, anterior = kpis[(ano, mes)], kpis[(ano - 1, mes)]
+        serie.append({
+            "periodo": f"{mes:02d}/{ano}",
+            "ano": ano,
+            "mes": mes,
+            "kpis": atual,
+            "txs_count": sum(l["qtd"] for l in linhas[(ano, mes)]),
+            "ano_anterior": anterior,
+            "variacao_anual": {
+                nome: round((atual[nome] - anterior[nome]) / abs(anterior[nome]), 4) if anterior[nome] else None
+                for nome in KPIS_RESPOSTA
+            },
+        })
+    return {"de": f"{inicio[0]}-{inicio[1]:02d}", "ate": f"{fim[0]}-{fim[1]:02d}", "serie": serie}
+
+
+@router.post("/dashboard/serie/reconstruir", status_code=status.HTTP_202_ACCEPTED)
+async def reconstruir_resumo_mensal():
+    """Refaz `fin_resumo_mensal` a partir das transações, em segundo plano (GET /api/jobs/{id})"""
+    sb = get_supabase_async()
+
+    async def reconstruir(ao_progredir):
+        resultado = (await sb.rpc("fin_resumo_mensal_reconstruir", {}).execute()).data
+        descartar_dashboard()
+        return resultado
+
+    return await job_runner.submeter("reconstruir_resumo_mensal", reconstruir, unico=True)
+
+
+@router.get("/fluxo-caixa")
+async def fluxo_caixa(meses: int = Query(3, ge=1, le=FLUXO_MAX_MESES), granularidade: str = "semana"):
+    """
+    Previsão de entradas e saídas do caixa da clínica nos próximos `meses`, por dia ou
+    por semana (a partir de hoje), a partir das transações PENDENTES. Recebimentos caem
+    no vencimento + `dias_repasse` da forma de pagamento; vencidos ficam de fora (ver /aging).
+    """
+    if granularidade not in GRANULARIDADES:
+        raise HTTPException(status_code=400, detail=f"`granularidade` deve ser uma de: {', '.join(GRANULARIDADES)}")
+    sb = get_supabase_async()
+    hoje = date.today()
+    fim = hoje + relativedelta(months=meses)
+
+    # Mesma consulta (e entrada de cache) de GET /financeiro/settings/formas-pagamento
+    formas = await consulta_cacheada(("fin_formas_pagamento", "lista", None), sb.table("fin_formas_pagamento").select("*").order("nome"))
+    repasse = repasse_por_metodo(formas)
+    # Parcelas vencidas há menos de `folga` dias ainda podem cair no caixa a partir de hoje
+    folga = max(repasse.values(), default=0)
+
+    consulta = lambda: (
+        sb.table("fin_transacoes")
+        .select("id, valor, data_vencimento, conta_origem, conta_destino, metodo_pagamento, fin_categorias(tipo, escopo), fin_faturamentos(metodo_pagamento)")
+        .eq("status", "PENDENTE")
+        .gte("data_vencimento", (hoje - timedelta(days=folga)).isoformat())
+        .lt("data_vencimento", fim.isoformat())
+    )
+    previsao = await projetar(iter_rows(consulta, key="id"), repasse, hoje, fim, GRANULARIDADES[granularidade])
+
+    valores = ("entradas", "saidas", "saldo", "acumulado")
+    return {
+        "de": hoje.isoformat(),
+        "ate": (fim - timedelta(days=1)).isoformat(),
+        "granularidade": granularidade,
+        "entradas": reais(previsao["entradas"]),
+        "saidas": reais(previsao["saidas"]),
+        "saldo": reais(previsao["entradas"] - previsao["saidas"]),
+        "lancamentos": previsao["lancamentos"],
+        "periodos": [{**p, **{c: reais(p[c]) for c in valores}} for p in previsao["periodos"]],
+    }
 
-    # KPI 5: Retiradas / Pró-Labore (O que tirou da clínica pro bolso)
-    retiradas = sum(t["valor"] for t in txs if t.get("conta_origem") == "CLINICA" and t.get("conta_destino") == "PESSOAL" and t.get("status") == "PAGO")
 
-    # KPI 6: Despesas Pessoais
-    despesas_pessoais = sum(t["valor"] for t in txs if get_cat_tipo(t) == "DESPESA" and get_cat_escopo(t) == "PESSOAL" and t.get("status") == "PAGO")
+async def _aging_sem_views(sb) -> tuple[list[dict], list[dict]]:
+    """Aging calculado na API (views de database/aging_v1.sql ainda não aplicadas)"""
+    hoje = date.today()
+    vencidas = await fetch_all(
+        lambda: sb.table("fin_transacoes")
+        .select("id, valor, data_vencimento, faturamento_id, fin_categorias(tipo), fin_faturamentos(paciente_id, pacientes(nome, telefone))")
+        .eq("status", "PENDENTE").lt("data_vencimento", hoje.isoformat()),
+        key="id",
+    )
+    return agrupar_vencidas(vencidas, hoje)
 
-    # KPI 7: Caixa Pessoal Disponível Mensal (O que sobrou da retirada após as contas dele)
-    caixa_pessoal = retiradas - despesas_pessoais
 
+@router.get("/aging")
+async def aging_recebiveis():
+    """
+    Parcelas a receber PENDENTES e vencidas por faixa de atraso (0-30, 31-60, 61-90, 90+ dias):
+    total, quantidade de parcelas e de pacientes em cada faixa. Pacientes de uma faixa: /aging/{faixa}.
+    """
+    sb = get_supabase_async()
+    try:
+        faixas = (await sb.table("fin_aging_faixas_v1").select("*").execute()).data
+    except APIError as e:
+        if not objeto_inexistente(e):
+            raise
+        faixas, _ = await _aging_sem_views(sb)
+
+    por_faixa = {f["faixa"]: f for f in faixas}
+    faixas = [
+        {"faixa": faixa, "total": 0.0, "qtd": 0, "pacientes": 0, **por_faixa.get(faixa, {})}
+        for faixa in FAIXAS
+    ]
     return {
-        "periodo": f"{mes:02d}/{ano}",
-        "kpis": {
-            "faturamento_bruto": faturamento_bruto,
-            "lucro_operacional": lucro_operacional,
-            "a_receber": a_receber,
-            "aportes_pessoais": aportes,
-            "retiradas_pro_labore": retiradas,
-            "despesas_pessoais": despesas_pessoais,
-            "caixa_pessoal_livre": caixa_pessoal
-        },
-        "txs_count": len(txs)
+        "data_base": date.today().isoformat(),
+        "total": reais(sum(centavos(f["total"]) for f in faixas)),
+        "qtd": sum(f["qtd"] for f in faixas),
+        "faixas": faixas,
     }
 
 
+@router.get("/aging/{faixa}")
+async def aging_pacientes_da_faixa(
+    faixa: str,
+    limit: int = Query(50, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+):
+    """Pacientes com parcelas vencidas na `faixa`, paginados (`{items, next_cursor}`; padrão: maior total primeiro)"""
+    if faixa not in FAIXAS:
+        raise HTTPException(status_code=400, detail=f"Faixa inválida. Use: {', '.join(FAIXAS)}")
+    ordem = parse_sort(sort, ORDENS_AGING, "-total", desempate="paciente_id")
+    sb = get_supabase_async()
+    try:
+        return await paginar(sb.table("fin_aging_pacientes_v1").select("*").eq("faixa", faixa), ordem, limit, cursor)
+    except APIError as e:
+        if not objeto_inexistente(e):
+            raise
+
+    _, linhas = await _aging_sem_views(sb)
+    return paginar_lista([l for l in linhas if l["faixa"] == faixa], ordem, limit, cursor)
+
+
 @router.get("/")
-def listar_transacoes(
+async def listar_transacoes(
     escopo: Optional[str] = None, # CLINICA, PESSOAL, GLOBAL
     mes: Optional[int] = None,
     ano: Optional[int] = None,
-    faturamento_id: Optional[str] = None
+    faturamento_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
 ):
-    sb = get_supabase()
-    q = sb.table("fin_transacoes").select("*, fin_categorias(nome, tipo, escopo)").order("data_vencimento", desc=True)
-    
-    if faturamento_id:
-        q = q.eq("faturamento_id", faturamento_id)
-    
-    if mes:
-        _ano = ano or date.today().year
-        prox_mes, prox_ano = _proximo_mes(mes, _ano)
-        q = q.gte("data_vencimento", f"{_ano}-{mes:02d}-01").lt("data_vencimento", f"{prox_ano}-{prox_mes:02d}-01")
+    sb = get_supabase_async()
+    ordem = parse_sort(sort, {"data_vencimento", "data_pagamento", "valor", "created_at"}, "-data_vencimento")
+    obrigatorias = tuple(c for c, _ in ordem)
+    por_escopo = escopo in ("CLINICA", "PESSOAL")
+
+    def consulta(select: str, escopo_no_banco: bool):
+        q = sb.table("fin_transacoes").select(select)
         
-    dados = q.execute().data
-    
-    # Filtragem por escopo no Python para tratar Transferências de Pessoal para Clínica (Dono investiu)
-    if escopo == "CLINICA":
-        return [d for d in dados if d["conta_origem"] == "CLINICA" or d["conta_destino"] == "CLINICA" or d["fin_categorias"]["escopo"] == "CLINICA"]
-    if escopo == "PESSOAL":
-         return [d for d in dados if d["conta_origem"] == "PESSOAL" or d["conta_destino"] == "PESSOAL" or d["fin_categorias"]["escopo"] == "PESSOAL"]
+        if faturamento_id:
+            q = q.eq("faturamento_id", faturamento_id)
+        
+        if mes:
+            _ano = ano or date.today().year
+            prox_mes, prox_ano = _proximo_mes(mes, _ano)
+            q = q.gte("data_vencimento", f"{_ano}-{mes:02d}-01").lt("data_vencimento", f"{prox_ano}-{prox_mes:02d}-01")
+
+        if por_escopo and escopo_no_banco:
+            # Inclui as Transferências de Pessoal para Clínica (Dono investiu) e vice-versa;
+            # categoria_escopo é o escopo da categoria copiado por trigger (database/escopo_transacoes_v1.sql)
+            q = q.or_(f"conta_origem.eq.{escopo},conta_destino.eq.{escopo},categoria_escopo.eq.{escopo}")
+        return q
+
+    async def listar(select: str, escopo_no_banco: bool):
+        # Com `limit`, devolve uma página `{items, next_cursor}`
+        if limit:
+            return await paginar(consulta(select, escopo_no_banco), ordem, limit, cursor)
+        # Lido em blocos para não ser cortado pelo max-rows do PostgREST
+        return await fetch_all(lambda: aplicar_ordem(consulta(select, escopo_no_banco), ordem))
 
-    return dados
+    try:
+        return await listar(montar_select(fields, include, CAMPOS_TRANSACAO, EMBEDS_TRANSACAO, obrigatorias), True)
+    except APIError as e:
+        if not (por_escopo and coluna_inexistente(e, "categoria_escopo")):
+            raise
+
+    # Sem a coluna categoria_escopo no banco: filtra o escopo em Python, o que
+    # precisa das contas e do escopo da categoria na resposta
+    if fields is not None:
+        obrigatorias += ("conta_origem", "conta_destino")
+        include = ",".join(filter(None, [include, "fin_categorias"]))
+    select = montar_select(fields, include, CAMPOS_TRANSACAO, EMBEDS_TRANSACAO, obrigatorias)
+
+    def do_escopo(d: dict) -> bool:
+        # fin_categorias vem None em transações sem categoria
+        return escopo in (d["conta_origem"], d["conta_destino"], (d.get("fin_categorias") or {}).get("escopo"))
+
+    if not limit:
+        return [d for d in await listar(select, False) if do_escopo(d)]
+
+    # Com `limit`: lê blocos até juntar `limit` + 1 linhas do escopo (ou acabar a
+    # tabela), para a página vir cheia e o cursor só existir se houver mais
+    itens, posicao = [], cursor
+    while len(itens) <= limit:
+        bloco = await paginar(consulta(select, False), ordem, PAGE_SIZE - 1, posicao)
+        itens += [d for d in bloco["items"] if do_escopo(d)]
+        posicao = bloco["next_cursor"]
+        if posicao is None:
+            break
+    next_cursor = encode_cursor(ordem, itens[limit - 1]) if len(itens) > limit else None
+    return {"items": itens[:limit], "next_cursor": next_cursor}
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def criar_transacao(dados: TransacaoCreate):
-    sb = get_supabase()
+async def criar_transacao(dados: TransacaoCreate):
+    sb = get_supabase_async()
     payload = dados.model_dump(exclude_none=True)
     payload["data_vencimento"] = str(payload["data_vencimento"])
     if payload.get("data_pagamento"):
         payload["data_pagamento"] = str(payload["data_pagamento"])
         
-    r = sb.table("fin_transacoes").insert(payload).execute()
+    r = await sb.table("fin_transacoes").insert(payload).execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Erro ao criar transação manual")
+    descartar_meses(payload["data_vencimento"])
     return r.data[0]
 
 
 @router.post("/transacao-avulsa", status_code=status.HTTP_201_CREATED)
-def criar_transacao_avulsa(dados: TransacaoAvulsaCreate):
-    sb = get_supabase()
+async def criar_transacao_avulsa(dados: TransacaoAvulsaCreate):
+    sb = get_supabase_async()
     
     # Validação de Bloqueio (Regras de Negócio)
     if dados.escopo == "CLINICA" and dados.tipo == "RECEITA":
@@ -165,7 +383,7 @@ def criar_transacao_avulsa(dados: TransacaoAvulsaCreate):
         
     payload = {
         "descricao": dados.descricao,
-        "valor": round(dados.valor, 2),
+        "valor": reais(centavos(dados.valor)),
         "data_vencimento": str(dados.data_vencimento),
         "status": dados.status,
         "metodo_pagamento": dados.metodo_pagamento
@@ -195,34 +413,43 @@ def criar_transacao_avulsa(dados: TransacaoAvulsaCreate):
     elif dados.tipo == "RECEITA":
         payload["conta_destino"] = dados.escopo # O dinheiro ENTROU nessa conta
         
-    r = sb.table("fin_transacoes").insert(payload).execute()
+    r = await sb.table("fin_transacoes").insert(payload).execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Erro ao processar lançamento financeiro.")
+    descartar_meses(payload["data_vencimento"])
     return r.data[0]
 
 
 @router.put("/{tx_id}")
-def atualizar_transacao(tx_id: str, dados: TransacaoUpdate):
-    sb = get_supabase()
+async def atualizar_transacao(tx_id: str, dados: TransacaoUpdate):
+    sb = get_supabase_async()
     payload = dados.model_dump(exclude_unset=True)
     
     if "data_vencimento" in payload and payload["data_vencimento"]:
         payload["data_vencimento"] = str(payload["data_vencimento"])
     if "data_pagamento" in payload and payload["data_pagamento"]:
         payload["data_pagamento"] = str(payload["data_pagamento"])
-        
-    r = sb.table("fin_transacoes").update(payload).eq("id", tx_id).execute()
+
+    # Mudando o vencimento, o mês antigo também muda no dashboard
+    venc_anterior = None
+    if payload.get("data_vencimento"):
+        atual = await sb.table("fin_transacoes").select("data_vencimento").eq("id", tx_id).execute()
+        venc_anterior = atual.data[0]["data_vencimento"] if atual.data else None
+
+    r = await sb.table("fin_transacoes").update(payload).eq("id", tx_id).execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transação não encontrada")
+    descartar_meses(venc_anterior, r.data[0].get("data_vencimento"))
     return r.data[0]
 
 
 @router.delete("/{tx_id}", status_code=status.HTTP_204_NO_CONTENT)
-def deletar_transacao(tx_id: str):
-    sb = get_supabase()
-    r = sb.table("fin_transacoes").delete().eq("id", tx_id).execute()
+async def deletar_transacao(tx_id: str):
+    sb = get_supabase_async()
+    r = await sb.table("fin_transacoes").delete().eq("id", tx_id).execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transação não encontrada")
+    descartar_meses(*(t.get("data_vencimento") for t in r.data))
     return None
 
 
@@ -235,194 +462,413 @@ class PagamentoTx(BaseModel):
     acao_residual: Optional[str] = "somar_proxima"
     valor_desconto: Optional[float] = 0.0
 
+
+def _status_faturamento(todas_txs: list[dict]) -> dict:
+    """Status e valor_final do faturamento mãe a partir de todas as suas transações"""
+    todas_pagas = all(t["status"] == "PAGO" for t in todas_txs)
+    alguma_paga = any(t["status"] == "PAGO" for t in todas_txs)
+    novo_status = "QUITADO" if todas_pagas else ("PAGO_PARCIAL" if alguma_paga else "ABERTO")
+
+    # Recalcula o valor financeiro do faturamento mãe garantindo refletir descontos na hora da baixa permanentemente
+    # (PAGO + PENDENTE, somados em centavos)
+    total = sum(
+        centavos(t.get("valor", 0)) for t in todas_txs
+        if t.get("status") in ("PAGO", "PENDENTE") and "Taxa de Operadora" not in (t.get("descricao") or "")
+    )
+    return {"status": novo_status, "valor_final": reais(total)}
+
+
+async def _pagar_parcela_sequencial(sb, tx_id: str, dados: Optional[PagamentoTx]) -> dict:
+    """Alternativa a pagar_parcela_v1 (ver `chamar_rpc`)"""
+    from datetime import datetime
+    from dateutil.relativedelta import relativedelta
+
+    # Busca a transação original
+    r_tx = await sb.table("fin_transacoes").select("*").eq("id", tx_id).execute()
+    if not r_tx.data:
+        raise HTTPException(status_code=404, detail="Transação não encontrada")
+    tx_original = r_tx.data[0]
+    fat_id = tx_original.get("faturamento_id")
+
+    valor_original = tx_original["valor"]
+    valor_pago = dados.valor_pago if dados and dados.valor_pago is not None else valor_original
+    valor_desconto = dados.valor_desconto if dados and dados.valor_desconto is not None else 0.0
+    # Saldo que sobra de um pagamento parcial, em centavos
+    residual = max(0, centavos(valor_original) - centavos(valor_pago) - centavos(valor_desconto))
+
+    hoje = datetime.now().date().isoformat()
+    if dados and dados.data_pagamento:
+        hoje = dados.data_pagamento
+
+    update_payload = {
+        "status": "PAGO",
+        "data_pagamento": hoje,
+        "conta_destino": "CLINICA",
+        "valor": reais(centavos(valor_pago))
+    }
+
+    if dados:
+        if dados.taxa_porcentagem is not None:
+            update_payload["taxa_porcentagem"] = dados.taxa_porcentagem
+        if dados.taxa_valor is not None:
+            update_payload["taxa_valor"] = dados.taxa_valor
+        if dados.metodo_pagamento is not None:
+            update_payload["metodo_pagamento"] = dados.metodo_pagamento
+
+    r = await sb.table("fin_transacoes").update(update_payload).eq("id", tx_id).execute()
+    
+    # Tratamento do Saldo Residual (Pagamento Parcial)
+    if fat_id and residual > 0:
+        # Busca transações pendentes para jogar a dívida
+        r_pendentes = await sb.table("fin_transacoes").select("*").eq("faturamento_id", fat_id).eq("status", "PENDENTE").order("data_vencimento").order("id").execute()
+        pendentes = r_pendentes.data
+
+        if not pendentes:
+            # Se não há mais parcelas pra frente, cria uma nova
+            proximo_venc = (datetime.fromisoformat(tx_original["data_vencimento"]) + relativedelta(months=1)).date().isoformat()
+            nova_tx = {
+                "faturamento_id": fat_id,
+                "categoria_id": tx_original["categoria_id"],
+                "descricao": f"Residual Parcial - {tx_original['descricao']}",
+                "valor": reais(residual),
+                "data_vencimento": proximo_venc,
+                "status": "PENDENTE"
+            }
+            await sb.table("fin_transacoes").insert(nova_tx).execute()
+        else:
+            if dados and dados.acao_residual == "recalcular_todas":
+                # Novos valores calculados de uma vez (em centavos) e gravados num único upsert
+                await sb.table("fin_transacoes").upsert(redistribuir_residual(pendentes, residual), on_conflict="id").execute()
+            else:
+                # somar_proxima
+                prox = pendentes[0] # Amais próxima (ordenada por vencimento)
+                novo_valor = reais(centavos(prox["valor"]) + residual)
+                await sb.table("fin_transacoes").update({"valor": novo_valor}).eq("id", prox["id"]).execute()
+
+    # Re-avalia o Status do Faturamento Global e garante a integridade do valor no Banco
+    if fat_id:
+        todas_txs = (await sb.table("fin_transacoes").select("status, valor, descricao").eq("faturamento_id", fat_id).execute()).data
+        await sb.table("fin_faturamentos").update(_status_faturamento(todas_txs)).eq("id", fat_id).execute()
+
+    # ─── Despesa Automática de Taxa ────────────────────────────────────────
+    # Se a parcela foi liquidada com taxa (maquininha, cartão, etc.),
+    # registramos automaticamente a taxa como despesa operacional da clínica.
+    taxa_val = centavos(dados.taxa_valor or 0.0) if dados else 0
+    if taxa_val > 0:
+        # Busca (ou cria) a categoria "Taxa de Operadora"
+        cat_taxa_id = await categoria_id("Taxa de Operadora", criar={"tipo": "DESPESA", "escopo": "CLINICA"})
+
+        if cat_taxa_id:
+            metodo = (dados.metodo_pagamento or "Não informado") if dados else "Não informado"
+            descricao_taxa = f"Taxa de Operadora ({metodo}) — {tx_original.get('descricao', 'Parcela')}"
+            await sb.table("fin_transacoes").insert({
+                "categoria_id": cat_taxa_id,
+                "faturamento_id": fat_id,
+                "descricao": descricao_taxa,
+                "valor": reais(taxa_val),
+                "data_vencimento": hoje,
+                "data_pagamento": hoje,
+                "conta_origem": "CLINICA",
+                "status": "PAGO",
+                "metodo_pagamento": metodo,
+            }).execute()
+    # ──────────────────────────────────────────────────────────────────────
+
+    return r.data[0]
+
+
 @router.post("/{tx_id}/pagar")
-def pagar_parcela(tx_id: str, dados: Optional[PagamentoTx] = None):
-    import traceback
+async def pagar_parcela(tx_id: str, dados: Optional[PagamentoTx] = None):
     try:
-        sb = get_supabase()
-        from datetime import datetime
-        from dateutil.relativedelta import relativedelta
-        
-        # Busca a transação original
-        r_tx = sb.table("fin_transacoes").select("*").eq("id", tx_id).execute()
-        if not r_tx.data:
-            raise HTTPException(status_code=404, detail="Transação não encontrada")
-        tx_original = r_tx.data[0]
-        fat_id = tx_original.get("faturamento_id")
-
-        valor_original = tx_original["valor"]
-        valor_pago = dados.valor_pago if dados and dados.valor_pago is not None else valor_original
-        valor_desconto = dados.valor_desconto if dados and dados.valor_desconto is not None else 0.0
-        residual = max(0, valor_original - valor_pago - valor_desconto)
-
-        hoje = datetime.now().date().isoformat()
-        if dados and dados.data_pagamento:
-            hoje = dados.data_pagamento
-
-        update_payload = {
+        sb = get_supabase_async()
+        dados_rpc = dados or PagamentoTx(taxa_porcentagem=None, taxa_valor=None)
+
+        async def sequencial():
+            tx = await _pagar_parcela_sequencial(sb, tx_id, dados)
+            # O fluxo antigo não informa quais parcelas/residual/taxa mexeu
+            descartar_dashboard()
+            return {"transacao": tx}
+
+        # Baixa, residual, status do faturamento e despesa da taxa numa transação só (um round-trip)
+        try:
+            res = await chamar_rpc(sb, "pagar_parcela_v1", {
+                "p_tx_id": tx_id,
+                "p_valor_pago": dados_rpc.valor_pago,
+                "p_valor_desconto": dados_rpc.valor_desconto or 0.0,
+                "p_data_pagamento": dados_rpc.data_pagamento,
+                "p_taxa_porcentagem": dados_rpc.taxa_porcentagem,
+                "p_taxa_valor": dados_rpc.taxa_valor,
+                "p_metodo_pagamento": dados_rpc.metodo_pagamento,
+                "p_acao_residual": dados_rpc.acao_residual or "somar_proxima",
+            }, sequencial)
+        except APIError as e:
+            if e.code == "P0002":
+                raise HTTPException(status_code=404, detail="Transação não encontrada")
+            raise
+
+        if res.get("categoria_criada"):
+            cache_referencia.invalidar("fin_categorias")
+        # Meses (AAAA-MM) das parcelas do faturamento, do residual e da taxa
+        descartar_meses(*(res.get("meses") or []))
+        return res["transacao"]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao processar pagamento: {str(e)}")
+
+
+class ItemPagamentoLote(BaseModel):
+    id: UUID
+    data_pagamento: Optional[date] = None
+    taxa_porcentagem: Optional[float] = None
+    taxa_valor: Optional[float] = None
+    metodo_pagamento: Optional[str] = None
+
+
+class PagamentoLote(BaseModel):
+    itens: list[ItemPagamentoLote] = Field(min_length=1, max_length=MAX_ITENS_LOTE)
+    # Valem para os itens que não informarem os seus
+    data_pagamento: Optional[date] = None
+    metodo_pagamento: Optional[str] = None
+
+
+async def _pagar_lote_sequencial(sb, itens: list[dict]) -> dict:
+    """
+    Alternativa a pagar_lote_v1 (ver `chamar_rpc`), ainda em poucas chamadas: um update
+    por grupo de itens com a mesma baixa (em paralelo), leitura dos faturamentos,
+    atualizações em paralelo, insert das taxas.
+    """
+    por_id = {i["id"]: i for i in itens}
+    hoje = date.today().isoformat()
+
+    # Só as colunas da baixa, e só onde a parcela ainda está PENDENTE: o resto da linha
+    # fica como está e uma parcela paga por outra requisição não é baixada de novo
+    grupos: dict[tuple, list[str]] = {}
+    for item in itens:
+        baixa = {
             "status": "PAGO",
-            "data_pagamento": hoje,
+            "data_pagamento": item["data_pagamento"] or hoje,
             "conta_destino": "CLINICA",
-            "valor": round(valor_pago, 2)
+            **{c: item[c] for c in ("taxa_porcentagem", "taxa_valor", "metodo_pagamento") if item[c] is not None},
         }
-
-        if dados:
-            if dados.taxa_porcentagem is not None:
-                update_payload["taxa_porcentagem"] = dados.taxa_porcentagem
-            if dados.taxa_valor is not None:
-                update_payload["taxa_valor"] = dados.taxa_valor
-            if dados.metodo_pagamento is not None:
-                update_payload["metodo_pagamento"] = dados.metodo_pagamento
-
-        r = sb.table("fin_transacoes").update(update_payload).eq("id", tx_id).execute()
-        
-        # Tratamento do Saldo Residual (Pagamento Parcial)
-        if fat_id and residual > 0.001:
-            # Busca transações pendentes para jogar a dívida
-            r_pendentes = sb.table("fin_transacoes").select("*").eq("faturamento_id", fat_id).eq("status", "PENDENTE").order("data_vencimento").execute()
-            pendentes = r_pendentes.data
-
-            if not pendentes:
-                # Se não há mais parcelas pra frente, cria uma nova
-                proximo_venc = (datetime.fromisoformat(tx_original["data_vencimento"]) + relativedelta(months=1)).date().isoformat()
-                nova_tx = {
-                    "faturamento_id": fat_id,
-                    "categoria_id": tx_original["categoria_id"],
-                    "descricao": f"Residual Parcial - {tx_original['descricao']}",
-                    "valor": round(residual, 2),
-                    "data_vencimento": proximo_venc,
-                    "status": "PENDENTE"
-                }
-                sb.table("fin_transacoes").insert(nova_tx).execute()
-            else:
-                if dados and dados.acao_residual == "recalcular_todas":
-                    qtd = len(pendentes)
-                    add_per_parcela = residual / qtd
-                    for p in pendentes:
-                        novo_valor = round(p["valor"] + add_per_parcela, 2)
-                        sb.table("fin_transacoes").update({"valor": novo_valor}).eq("id", p["id"]).execute()
-                else:
-                    # somar_proxima
-                    prox = pendentes[0] # Amais próxima (ordenada por vencimento)
-                    novo_valor = round(prox["valor"] + residual, 2)
-                    sb.table("fin_transacoes").update({"valor": novo_valor}).eq("id", prox["id"]).execute()
-
-        # Re-avalia o Status do Faturamento Global e garante a integridade do valor no Banco
-        if fat_id:
-            todas_txs = sb.table("fin_transacoes").select("status, valor, descricao").eq("faturamento_id", fat_id).execute().data
-            todas_pagas = all(t["status"] == "PAGO" for t in todas_txs)
-            alguma_paga = any(t["status"] == "PAGO" for t in todas_txs)
-            
-            novo_status = "QUITADO" if todas_pagas else ("PAGO_PARCIAL" if alguma_paga else "ABERTO")
-            
-            # Recalcula o valor financeiro do faturamento mãe garantindo refletir descontos na hora da baixa permanentemente
-            pago = sum(t.get("valor", 0) for t in todas_txs if t.get("status") == "PAGO" and "Taxa de Operadora" not in (t.get("descricao") or ""))
-            pend = sum(t.get("valor", 0) for t in todas_txs if t.get("status") == "PENDENTE" and "Taxa de Operadora" not in (t.get("descricao") or ""))
-            novo_valor_final = pago + pend
-            
-            sb.table("fin_faturamentos").update({"status": novo_status, "valor_final": round(novo_valor_final, 2)}).eq("id", fat_id).execute()
-
-        # ─── Despesa Automática de Taxa ────────────────────────────────────────
-        # Se a parcela foi liquidada com taxa (maquininha, cartão, etc.),
-        # registramos automaticamente a taxa como despesa operacional da clínica.
-        taxa_val = round(dados.taxa_valor or 0.0, 2) if dados else 0.0
-        if taxa_val > 0:
-            # Busca (ou cria) a categoria "Taxa de Operadora"
-            cat_taxa_res = sb.table("fin_categorias").select("id").eq("nome", "Taxa de Operadora").execute()
-            if cat_taxa_res.data:
-                cat_taxa_id = cat_taxa_res.data[0]["id"]
-            else:
-                # Cria a categoria caso não exista
-                nova_cat = sb.table("fin_categorias").insert({
-                    "nome": "Taxa de Operadora",
-                    "tipo": "DESPESA",
-                    "escopo": "CLINICA",
-                    "ativo": True
-                }).execute()
-                cat_taxa_id = nova_cat.data[0]["id"] if nova_cat.data else None
-
-            if cat_taxa_id:
-                metodo = (dados.metodo_pagamento or "Não informado") if dados else "Não informado"
-                descricao_taxa = f"Taxa de Operadora ({metodo}) — {tx_original.get('descricao', 'Parcela')}"
-                sb.table("fin_transacoes").insert({
+        grupos.setdefault(tuple(baixa.items()), []).append(item["id"])
+    resultados = await gather_queries(*(
+        sb.table("fin_transacoes").update(dict(baixa)).in_("id", ids).eq("status", "PENDENTE")
+        for baixa, ids in grupos.items()
+    ))
+    pagas = [t for linhas in resultados for t in linhas]
+
+    # Status de cada faturamento mãe uma vez, com todas as suas transações lidas numa consulta só
+    fat_ids = sorted({t["faturamento_id"] for t in pagas if t.get("faturamento_id")})
+    if fat_ids:
+        txs = await fetch_all(
+            lambda: sb.table("fin_transacoes").select("id, faturamento_id, status, valor, descricao").in_("faturamento_id", fat_ids),
+            key="id",
+        )
+        por_fat: dict[str, list[dict]] = {}
+        for t in txs:
+            por_fat.setdefault(t["faturamento_id"], []).append(t)
+        await gather_queries(*(
+            sb.table("fin_faturamentos").update(_status_faturamento(txs_fat)).eq("id", fat)
+            for fat, txs_fat in por_fat.items()
+        ))
+
+    # Despesas de taxa num insert só
+    com_taxa = [t for t in pagas if centavos(por_id[t["id"]]["taxa_valor"] or 0) > 0]
+    if com_taxa:
+        cat_taxa_id = await categoria_id("Taxa de Operadora", criar={"tipo": "DESPESA", "escopo": "CLINICA"})
+        if cat_taxa_id:
+            despesas = []
+            for t in com_taxa:
+                metodo = t.get("metodo_pagamento") or "Não informado"
+                despesas.append({
                     "categoria_id": cat_taxa_id,
-                    "faturamento_id": fat_id,
-                    "descricao": descricao_taxa,
-                    "valor": taxa_val,
-                    "data_vencimento": hoje,
-                    "data_pagamento": hoje,
+                    "faturamento_id": t.get("faturamento_id"),
+                    "descricao": f"Taxa de Operadora ({metodo}) — {t.get('descricao') or 'Parcela'}",
+                    "valor": reais(centavos(por_id[t["id"]]["taxa_valor"])),
+                    "data_vencimento": t["data_pagamento"],
+                    "data_pagamento": t["data_pagamento"],
                     "conta_origem": "CLINICA",
                     "status": "PAGO",
                     "metodo_pagamento": metodo,
-                }).execute()
-        # ──────────────────────────────────────────────────────────────────────
+                })
+            await sb.table("fin_transacoes").insert(despesas).execute()
+
+    pagas_ids = {t["id"] for t in pagas}
+    return {
+        "pagas": pagas,
+        "ignoradas": [i for i in por_id if i not in pagas_ids],
+        "faturamentos_atualizados": len(fat_ids),
+        # categoria_id() já invalida o cache se criou a categoria
+        "categoria_criada": False,
+        "meses": [t["data_vencimento"] for t in pagas] + [t["data_pagamento"] for t in com_taxa],
+    }
+
 
-        return r.data[0]
+async def _baixar_lote(sb, itens: list[dict]) -> dict:
+    """Baixa os itens (já sem ids repetidos) por pagar_lote_v1 ou, sem ela, pelo caminho sequencial"""
+    # Uma transação no banco para o lote inteiro (um round-trip)
+    res = await chamar_rpc(sb, "pagar_lote_v1", {"p_itens": itens}, lambda: _pagar_lote_sequencial(sb, itens))
+
+    if res.get("categoria_criada"):
+        cache_referencia.invalidar("fin_categorias")
+    descartar_meses(*res["meses"])
+    return res
+
+
+@router.post("/pagar-lote")
+async def pagar_lote(dados: PagamentoLote):
+    """
+    Baixa em lote (conciliação de fim de mês): quita pelo valor integral as parcelas
+    PENDENTES informadas, com data, taxa e método opcionais por item. Recalcula cada
+    faturamento envolvido uma vez e lança as despesas de taxa. Ids que não estão
+    pendentes voltam em `ignoradas`.
+    """
+    try:
+        sb = get_supabase_async()
+        # Id repetido no lote: vale o último item
+        por_id = {}
+        for item in dados.itens:
+            linha = item.model_dump(mode="json")
+            if linha["data_pagamento"] is None and dados.data_pagamento:
+                linha["data_pagamento"] = dados.data_pagamento.isoformat()
+            linha["metodo_pagamento"] = linha["metodo_pagamento"] or dados.metodo_pagamento
+            por_id[linha["id"]] = linha
+        res = await _baixar_lote(sb, list(por_id.values()))
+        return {
+            "pagas": len(res["pagas"]),
+            "faturamentos_atualizados": res["faturamentos_atualizados"],
+            "ignoradas": res["ignoradas"],
+            "transacoes": res["pagas"],
+        }
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao processar pagamento: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao processar baixa em lote: {str(e)}")
 
 
-@router.post("/migrar-taxas", status_code=status.HTTP_200_OK)
-def migrar_taxas_como_despesas():
+@router.post("/conciliacao")
+async def conciliar_extrato(
+    arquivo: UploadFile = File(...),
+    formato: Optional[str] = Query(None, description="ofx ou csv; sem ele, pela extensão ou pelo conteúdo"),
+    janela_dias: int = Query(CONCILIACAO_JANELA_DIAS, ge=0, le=CONCILIACAO_MAX_JANELA),
+    simular: bool = False,
+):
+    """
+    Importa um extrato bancário/de cartão (OFX ou CSV) e concilia cada crédito com
+    uma parcela PENDENTE a receber: mesmo valor, vencimento a até `janela_dias` da
+    data do crédito e, havendo empate, a descrição que aponta para uma só. As
+    conciliadas são baixadas como na baixa em lote, na data do crédito; com
+    `simular=true` só o relatório é montado. Se a baixa de um bloco falhar, as
+    conciliadas dele trazem `erro` e o relatório volta assim mesmo.
+
+    O arquivo é lido em fluxo e só os créditos ficam em memória; as parcelas do
+    período entram num índice por valor.
+    """
+    if formato and formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"`formato` deve ser um de: {', '.join(FORMATOS)}")
+    inicio = await arquivo.read(4096)
+    await arquivo.seek(0)
+    formato = formato or detectar_formato(arquivo.filename, inicio)
+    try:
+        creditos, contagem = await run_in_threadpool(ler_extrato, arquivo.file, formato, detectar_encoding(inicio))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Extrato inválido: {e}")
+
+    def linha(lanc) -> dict:
+        return {"linha": lanc.linha, "data": lanc.data.isoformat(), "valor": reais(lanc.valor),
+                "descricao": lanc.descricao, "id_extrato": lanc.id}
+
+    try:
+        conciliadas, ambiguas, nao_conciliadas = [], [], []
+        if creditos:
+            sb = get_supabase_async()
+            folga = timedelta(days=janela_dias)
+            de = min(c.data for c in creditos) - folga
+            ate = max(c.data for c in creditos) + folga
+
+            # Índice valor → parcelas pendentes a receber do período, montado em blocos
+            indice = IndiceCandidatos(janela_dias)
+            consulta = lambda: (
+                sb.table("fin_transacoes")
+                .select("id, valor, data_vencimento, descricao, faturamento_id, fin_categorias(tipo), fin_faturamentos(pacientes(nome))")
+                .eq("status", "PENDENTE").gte("data_vencimento", de.isoformat()).lte("data_vencimento", ate.isoformat())
+            )
+            async for t in iter_rows(consulta, key="id"):
+                if a_receber(t):
+                    indice.adicionar(t)
+
+            for lanc in creditos:
+                parcela, candidatas = indice.casar(lanc)
+                if parcela:
+                    conciliadas.append({**linha(lanc), "transacao_id": parcela["id"], "descricao_transacao": parcela.get("descricao"),
+                                        "data_vencimento": parcela["data_vencimento"], "baixada": False})
+                elif candidatas:
+                    ambiguas.append({**linha(lanc), "candidatas": [
+                        {"id": c["id"], "descricao": c.get("descricao"), "data_vencimento": c["data_vencimento"],
+                         "paciente": ((c.get("fin_faturamentos") or {}).get("pacientes") or {}).get("nome")}
+                        for c in candidatas
+                    ]})
+                else:
+                    nao_conciliadas.append(linha(lanc))
+
+            if conciliadas and not simular:
+                for i in range(0, len(conciliadas), MAX_ITENS_LOTE):
+                    bloco = conciliadas[i:i + MAX_ITENS_LOTE]
+                    itens = [
+                        {"id": c["transacao_id"], "data_pagamento": c["data"], "taxa_porcentagem": None,
+                         "taxa_valor": None, "metodo_pagamento": None}
+                        for c in bloco
+                    ]
+                    try:
+                        res = await _baixar_lote(sb, itens)
+                        pagas = {t["id"] for t in res["pagas"]}
+                    except Exception as e:
+                        # Um bloco com erro não perde o relatório dos outros. Sem pagar_lote_v1 o
+                        # bloco pode ter ficado pela metade: o status gravado diz o que foi baixado.
+                        for c in bloco:
+                            c["erro"] = str(e)
+                        try:
+                            gravadas = (await sb.table("fin_transacoes").select("id").eq("status", "PAGO")
+                                        .in_("id", [c["transacao_id"] for c in bloco]).execute()).data
+                            pagas = {t["id"] for t in gravadas}
+                        except Exception:
+                            pagas = set()
+                    for c in bloco:
+                        # Fora de `pagas`: a parcela deixou de estar pendente durante a importação
+                        c["baixada"] = c["transacao_id"] in pagas
+
+        return {
+            "formato": formato,
+            "simulacao": simular,
+            **contagem,
+            "creditos": len(creditos),
+            "conciliadas": conciliadas,
+            "ambiguas": ambiguas,
+            "nao_conciliadas": nao_conciliadas,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao conciliar extrato: {str(e)}")
+
+
+@router.post("/migrar-taxas", status_code=status.HTTP_202_ACCEPTED)
+async def migrar_taxas_como_despesas(lote: int = Query(LOTE_PADRAO, ge=1, le=PAGE_SIZE)):
     """
     Varredura retroativa: para cada fin_transacao com taxa_valor > 0 e status PAGO,
     cria automaticamente uma fin_transacao de DESPESA (Taxa de Operadora) se ainda não existir.
     Idempotente: usa marcador [taxa-tx:{id}] na descrição para não duplicar.
+    Processa em lotes de `lote` transações e retoma do último lote gravado se for interrompida.
+
+    Roda em segundo plano: responde com o job, acompanhado em GET /api/jobs/{id}.
+    Se já houver uma migração em andamento, devolve o job dela.
     """
-    from datetime import datetime
-    sb = get_supabase()
-
-    # Busca ou cria a categoria "Taxa de Operadora"
-    cat_res = sb.table("fin_categorias").select("id").eq("nome", "Taxa de Operadora").execute()
-    if cat_res.data:
-        cat_taxa_id = cat_res.data[0]["id"]
-    else:
-        nova_cat = sb.table("fin_categorias").insert({
-            "nome": "Taxa de Operadora",
-            "tipo": "DESPESA",
-            "escopo": "CLINICA",
-            "ativo": True
-        }).execute()
-        cat_taxa_id = nova_cat.data[0]["id"]
-
-    # Busca todas as transações pagas com taxa
-    txs_res = sb.table("fin_transacoes").select("*").eq("status", "PAGO").gt("taxa_valor", 0).execute()
-    txs = txs_res.data or []
-
-    criadas = 0
-    ignoradas = 0
-
-    for tx in txs:
-        taxa_val = round(float(tx.get("taxa_valor") or 0), 2)
-        if taxa_val <= 0:
-            continue
-
-        # Idempotência: procura se já existe despesa criada para esta transação
-        marcador = f"[taxa-tx:{tx['id']}]"
-        existente = sb.table("fin_transacoes").select("id").eq("categoria_id", cat_taxa_id).ilike("descricao", f"%{marcador}%").execute()
-        if existente.data:
-            ignoradas += 1
-            continue
-
-        data_pag = tx.get("data_pagamento") or tx.get("data_vencimento") or datetime.now().date().isoformat()
-        metodo = tx.get("metodo_pagamento") or "Não informado"
-
-        sb.table("fin_transacoes").insert({
-            "categoria_id": cat_taxa_id,
-            "faturamento_id": tx.get("faturamento_id"),
-            "descricao": f"Taxa de Operadora ({metodo}) {marcador}",
-            "valor": taxa_val,
-            "data_vencimento": str(data_pag),
-            "data_pagamento": str(data_pag),
-            "conta_origem": "CLINICA",
-            "status": "PAGO",
-            "metodo_pagamento": metodo,
-        }).execute()
-        criadas += 1
+    sb = get_supabase_async()
 
-    return {
-        "message": f"Migração concluída: {criadas} despesas de taxa criadas, {ignoradas} já existiam.",
-        "criadas": criadas,
-        "ignoradas": ignoradas
-    }
+    async def migrar(ao_progredir):
+        resultado = await migrar_taxas(sb, lote=lote, ao_progredir=ao_progredir)
+        descartar_dashboard()
+        return resultado
 
+    return await job_runner.submeter("migrar_taxas", migrar, unico=True)
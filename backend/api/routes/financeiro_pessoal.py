@@ -6,7 +6,8 @@ from pydantic import BaseModel
 from datetime import date
 from typing import Optional
 
-from backend.config.supabase_client import get_supabase
+from backend.config.supabase_client import get_supabase_async
+from backend.services.queries import gather_queries
 
 router = APIRouter()
 
@@ -55,24 +56,22 @@ class MetaBase(BaseModel):
 
 
 @router.get("/categorias")
-def listar_categorias():
+async def listar_categorias():
     return {"receita": CATEGORIAS_RECEITA, "despesa": CATEGORIAS_DESPESA}
 
 
 @router.get("/resumo")
-def resumo_financeiro(mes: Optional[int] = None, ano: Optional[int] = None):
-    sb = get_supabase()
+async def resumo_financeiro(mes: Optional[int] = None, ano: Optional[int] = None):
+    sb = get_supabase_async()
     ano = ano or date.today().year
     mes = mes or date.today().month
     prox_mes, prox_ano = _proximo_mes(mes, ano)
-    lanc = (
+    lanc, metas = await gather_queries(
         sb.table("lancamentos_pessoal").select("tipo, valor, categoria")
         .gte("data", f"{ano}-{mes:02d}-01")
-        .lt("data", f"{prox_ano}-{prox_mes:02d}-01")
-        .execute().data
+        .lt("data", f"{prox_ano}-{prox_mes:02d}-01"),
+        sb.table("metas_pessoal").select("*").eq("mes", mes).eq("ano", ano),
     )
-    metas = sb.table("metas_pessoal").select("*") \
-        .eq("mes", mes).eq("ano", ano).execute().data
     receitas = sum(r["valor"] for r in lanc if r["tipo"] == "receita")
     despesas = sum(r["valor"] for r in lanc if r["tipo"] == "despesa")
     por_categoria = {}
@@ -98,75 +97,75 @@ def resumo_financeiro(mes: Optional[int] = None, ano: Optional[int] = None):
 
 
 @router.get("/metas")
-def listar_metas(mes: Optional[int] = None, ano: Optional[int] = None):
-    sb = get_supabase()
+async def listar_metas(mes: Optional[int] = None, ano: Optional[int] = None):
+    sb = get_supabase_async()
     q = sb.table("metas_pessoal").select("*")
     if mes: q = q.eq("mes", mes)
     if ano: q = q.eq("ano", ano)
-    return q.execute().data
+    return (await q.execute()).data
 
 
 @router.post("/metas", status_code=status.HTTP_201_CREATED)
-def criar_meta(meta: MetaBase):
-    sb = get_supabase()
-    r = sb.table("metas_pessoal").upsert(meta.model_dump(), on_conflict="categoria,mes,ano").execute()
+async def criar_meta(meta: MetaBase):
+    sb = get_supabase_async()
+    r = await sb.table("metas_pessoal").upsert(meta.model_dump(), on_conflict="categoria,mes,ano").execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Erro ao salvar meta")
     return r.data[0]
 
 
 @router.get("/")
-def listar_lancamentos(
+async def listar_lancamentos(
     tipo: Optional[str] = None,
     mes: Optional[int] = None,
     ano: Optional[int] = None
 ):
-    sb = get_supabase()
+    sb = get_supabase_async()
     q = sb.table("lancamentos_pessoal").select("*").order("data", desc=True)
     if tipo: q = q.eq("tipo", tipo)
     if mes:
         _ano = ano or date.today().year
         prox_mes, prox_ano = _proximo_mes(mes, _ano)
         q = q.gte("data", f"{_ano}-{mes:02d}-01").lt("data", f"{prox_ano}-{prox_mes:02d}-01")
-    return q.execute().data
+    return (await q.execute()).data
 
 
 @router.get("/{lancamento_id}")
-def obter_lancamento(lancamento_id: str):
-    sb = get_supabase()
-    r = sb.table("lancamentos_pessoal").select("*").eq("id", lancamento_id).execute()
+async def obter_lancamento(lancamento_id: str):
+    sb = get_supabase_async()
+    r = await sb.table("lancamentos_pessoal").select("*").eq("id", lancamento_id).execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lancamento nao encontrado")
     return r.data[0]
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def criar_lancamento(dados: LancamentoCreate):
-    sb = get_supabase()
+async def criar_lancamento(dados: LancamentoCreate):
+    sb = get_supabase_async()
     payload = dados.model_dump(exclude_none=True)
     payload["data"] = str(payload["data"])
-    r = sb.table("lancamentos_pessoal").insert(payload).execute()
+    r = await sb.table("lancamentos_pessoal").insert(payload).execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Erro ao criar lancamento")
     return r.data[0]
 
 
 @router.put("/{lancamento_id}")
-def atualizar_lancamento(lancamento_id: str, dados: LancamentoUpdate):
-    sb = get_supabase()
+async def atualizar_lancamento(lancamento_id: str, dados: LancamentoUpdate):
+    sb = get_supabase_async()
     payload = dados.model_dump(exclude_unset=True)
     if "data" in payload and payload["data"]:
         payload["data"] = str(payload["data"])
-    r = sb.table("lancamentos_pessoal").update(payload).eq("id", lancamento_id).execute()
+    r = await sb.table("lancamentos_pessoal").update(payload).eq("id", lancamento_id).execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lancamento nao encontrado")
     return r.data[0]
 
 
 @router.delete("/{lancamento_id}", status_code=status.HTTP_204_NO_CONTENT)
-def deletar_lancamento(lancamento_id: str):
-    sb = get_supabase()
-    r = sb.table("lancamentos_pessoal").delete().eq("id", lancamento_id).execute()
+async def deletar_lancamento(lancamento_id: str):
+    sb = get_supabase_async()
+    r = await sb.table("lancamentos_pessoal").delete().eq("id", lancamento_id).execute()
     if not r.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lancamento nao encontrado")
     return None
@@ -5,7 +5,10 @@ from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
 from typing import Optional
 
-from backend.config.supabase_client import get_supabase
+from backend.config.supabase_client import get_supabase_async
+from backend.services.cache import cache_referencia
+from backend.services.referencia import consulta_cacheada
+from backend.services.resumo_mensal import descartar_dashboard
 
 router = APIRouter()
 
@@ -31,36 +34,39 @@ class FormaPagamentoUpdate(BaseModel):
 
 
 @router.get("/formas-pagamento")
-def listar_formas_pagamento(ativo: Optional[bool] = None):
-    sb = get_supabase()
+async def listar_formas_pagamento(ativo: Optional[bool] = None):
+    sb = get_supabase_async()
     q = sb.table("fin_formas_pagamento").select("*").order("nome")
     if ativo is not None:
         q = q.eq("ativo", ativo)
-    return q.execute().data
+    return await consulta_cacheada(("fin_formas_pagamento", "lista", ativo), q)
 
 
 @router.post("/formas-pagamento", status_code=status.HTTP_201_CREATED)
-def criar_forma_pagamento(dados: FormaPagamentoCreate):
-    sb = get_supabase()
-    r = sb.table("fin_formas_pagamento").insert(dados.model_dump()).execute()
+async def criar_forma_pagamento(dados: FormaPagamentoCreate):
+    sb = get_supabase_async()
+    r = await sb.table("fin_formas_pagamento").insert(dados.model_dump()).execute()
+    cache_referencia.invalidar("fin_formas_pagamento")
     if not r.data:
         raise HTTPException(status_code=400, detail="Erro ao criar forma de pagamento")
     return r.data[0]
 
 
 @router.put("/formas-pagamento/{id}")
-def atualizar_forma_pagamento(id: str, dados: FormaPagamentoUpdate):
-    sb = get_supabase()
-    r = sb.table("fin_formas_pagamento").update(dados.model_dump(exclude_unset=True)).eq("id", id).execute()
+async def atualizar_forma_pagamento(id: str, dados: FormaPagamentoUpdate):
+    sb = get_supabase_async()
+    r = await sb.table("fin_formas_pagamento").update(dados.model_dump(exclude_unset=True)).eq("id", id).execute()
+    cache_referencia.invalidar("fin_formas_pagamento")
     if not r.data:
         raise HTTPException(status_code=404, detail="Forma de pagamento não encontrada")
     return r.data[0]
 
 
 @router.delete("/formas-pagamento/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def inativar_forma_pagamento(id: str):
-    sb = get_supabase()
-    r = sb.table("fin_formas_pagamento").update({"ativo": False}).eq("id", id).execute()
+async def inativar_forma_pagamento(id: str):
+    sb = get_supabase_async()
+    r = await sb.table("fin_formas_pagamento").update({"ativo": False}).eq("id", id).execute()
+    cache_referencia.invalidar("fin_formas_pagamento")
     if not r.data:
          raise HTTPException(status_code=404, detail="Forma de pagamento não encontrada")
     return None
@@ -82,8 +88,8 @@ class CategoriaUpdate(BaseModel):
     ativo: Optional[bool] = None
 
 @router.get("/categorias")
-def listar_categorias_settings(ativo: Optional[bool] = None, tipo: Optional[str] = None, escopo: Optional[str] = None):
-    sb = get_supabase()
+async def listar_categorias_settings(ativo: Optional[bool] = None, tipo: Optional[str] = None, escopo: Optional[str] = None):
+    sb = get_supabase_async()
     q = sb.table("fin_categorias").select("*").order("nome")
     if ativo is not None:
         q = q.eq("ativo", ativo)
@@ -91,28 +97,34 @@ def listar_categorias_settings(ativo: Optional[bool] = None, tipo: Optional[str]
         q = q.eq("tipo", tipo)
     if escopo:
         q = q.eq("escopo", escopo)
-    return q.execute().data
+    return await consulta_cacheada(("fin_categorias", "lista", ativo, tipo, escopo), q)
 
 @router.post("/categorias", status_code=status.HTTP_201_CREATED)
-def criar_categoria(dados: CategoriaCreate):
-    sb = get_supabase()
-    r = sb.table("fin_categorias").insert(dados.model_dump()).execute()
+async def criar_categoria(dados: CategoriaCreate):
+    sb = get_supabase_async()
+    r = await sb.table("fin_categorias").insert(dados.model_dump()).execute()
+    cache_referencia.invalidar("fin_categorias")
     if not r.data:
         raise HTTPException(status_code=400, detail="Erro ao criar categoria")
     return r.data[0]
 
 @router.put("/categorias/{id}")
-def atualizar_categoria(id: int, dados: CategoriaUpdate):
-    sb = get_supabase()
-    r = sb.table("fin_categorias").update(dados.model_dump(exclude_unset=True)).eq("id", id).execute()
+async def atualizar_categoria(id: int, dados: CategoriaUpdate):
+    sb = get_supabase_async()
+    r = await sb.table("fin_categorias").update(dados.model_dump(exclude_unset=True)).eq("id", id).execute()
+    cache_referencia.invalidar("fin_categorias")
+    # Tipo/escopo da categoria mudam os totais do dashboard em todos os meses
+    descartar_dashboard()
     if not r.data:
         raise HTTPException(status_code=404, detail="Categoria não encontrada")
     return r.data[0]
 
 @router.delete("/categorias/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def deletar_categoria(id: int):
-    sb = get_supabase()
-    r = sb.table("fin_categorias").delete().eq("id", id).execute()
+async def deletar_categoria(id: int):
+    sb = get_supabase_async()
+    r = await sb.table("fin_categorias").delete().eq("id", id).execute()
+    cache_referencia.invalidar("fin_categorias")
+    descartar_dashboard()
     if not r.data:
          raise HTTPException(status_code=404, detail="Categoria não encontrada ou com lançamentos vinculados")
     return None
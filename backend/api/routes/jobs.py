@@ -0,0 +1,24 @@
+"""
+Rotas da API - Jobs em segundo plano
+"""
+import uuid
+
+from fastapi import APIRouter, HTTPException, status
+
+from backend.services.jobs import job_runner
+
+router = APIRouter()
+
+
+@router.get("/{job_id}")
+async def obter_job(job_id: str):
+    """Status, progresso (linhas processadas), duração e resultado de um job"""
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+
+    job = await job_runner.obter(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+    return job
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
-from backend.config.supabase_client import get_supabase
+from backend.config.supabase_client import get_supabase_async
+from backend.services.cache import cache_referencia
+from backend.services.referencia import consulta_cacheada
 
 router = APIRouter()
 
@@ -13,29 +15,31 @@ class LaboratorioSchema(BaseModel):
     ativo: Optional[bool] = True
 
 @router.get("/")
-def listar_laboratorios():
-    sb = get_supabase()
-    res = sb.table("laboratorios").select("*").eq("ativo", True).order("nome").execute()
-    return res.data
+async def listar_laboratorios():
+    sb = get_supabase_async()
+    return await consulta_cacheada(("laboratorios", "ativos"), sb.table("laboratorios").select("*").eq("ativo", True).order("nome"))
 
 @router.post("/")
-def criar_laboratorio(lab: LaboratorioSchema):
-    sb = get_supabase()
-    res = sb.table("laboratorios").insert(lab.model_dump()).execute()
+async def criar_laboratorio(lab: LaboratorioSchema):
+    sb = get_supabase_async()
+    res = await sb.table("laboratorios").insert(lab.model_dump()).execute()
+    cache_referencia.invalidar("laboratorios")
     return res.data[0]
 
 @router.put("/{id}")
-def editar_laboratorio(id: str, lab: LaboratorioSchema):
-    sb = get_supabase()
-    res = sb.table("laboratorios").update(lab.model_dump()).eq("id", id).execute()
+async def editar_laboratorio(id: str, lab: LaboratorioSchema):
+    sb = get_supabase_async()
+    res = await sb.table("laboratorios").update(lab.model_dump()).eq("id", id).execute()
+    cache_referencia.invalidar("laboratorios")
     if not res.data:
         raise HTTPException(status_code=404, detail="Laboratório não encontrado")
     return res.data[0]
 
 @router.delete("/{id}")
-def desativar_laboratorio(id: str):
-    sb = get_supabase()
-    res = sb.table("laboratorios").update({"ativo": False}).eq("id", id).execute()
+async def desativar_laboratorio(id: str):
+    sb = get_supabase_async()
+    res = await sb.table("laboratorios").update({"ativo": False}).eq("id", id).execute()
+    cache_referencia.invalidar("laboratorios")
     if not res.data:
         raise HTTPException(status_code=404, detail="Laboratório não encontrado")
     return {"ok": True}
@@ -4,7 +4,7 @@ Rotas da API - Odontograma do Paciente
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
 from typing import Optional, List
-from backend.config.supabase_client import get_supabase
+from backend.config.supabase_client import get_supabase_async
 
 router = APIRouter()
 
@@ -21,24 +21,24 @@ class OdontogramaUpdate(BaseModel):
 
 
 @router.get("/{paciente_id}")
-def get_odontograma(paciente_id: str):
+async def get_odontograma(paciente_id: str):
     """Retorna o estado atual do odontograma de um paciente."""
-    sb = get_supabase()
-    r = sb.table("paciente_odontograma").select("*").eq("paciente_id", paciente_id).execute()
+    sb = get_supabase_async()
+    r = await sb.table("paciente_odontograma").select("*").eq("paciente_id", paciente_id).execute()
     # Transforma lista de registros em dict indexado pelo numero_dente
     resultado = {str(d["numero_dente"]): d for d in r.data}
     return resultado
 
 
 @router.post("/{paciente_id}", status_code=status.HTTP_200_OK)
-def salvar_odontograma(paciente_id: str, dados: OdontogramaUpdate):
+async def salvar_odontograma(paciente_id: str, dados: OdontogramaUpdate):
     """Salva ou atualiza o odontograma completo de um paciente (upsert por dente) e deleta os removidos."""
-    sb = get_supabase()
+    sb = get_supabase_async()
     
     # Processa deleções primeiro (se houver)
     qtd_removida = 0
     if dados.dentes_removidos:
-        r_del = sb.table("paciente_odontograma")\
+        r_del = await sb.table("paciente_odontograma")\
             .delete()\
             .eq("paciente_id", paciente_id)\
             .in_("numero_dente", dados.dentes_removidos)\
@@ -58,7 +58,7 @@ def salvar_odontograma(paciente_id: str, dados: OdontogramaUpdate):
             for d in dados.dentes
         ]
 
-        r = sb.table("paciente_odontograma").upsert(
+        r = await sb.table("paciente_odontograma").upsert(
             registros,
             on_conflict="paciente_id,numero_dente"
         ).execute()
@@ -1,12 +1,27 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional
-from backend.config.supabase_client import get_supabase
+from backend.config.supabase_client import get_supabase_async
+from backend.services.queries import fetch_all
+from backend.services.pagination import MAX_LIMIT, parse_sort, aplicar_ordem, paginar
+from backend.services.projection import montar_select
 
 router = APIRouter()
 
 COLUNAS_VALIDAS = ["PRE_ENVIO", "EM_LABORATORIO", "RETORNOU", "AGENDADO", "INSTALADO"]
 
+# Colunas e recursos relacionados aceitos em `?fields=` / `?include=`
+CAMPOS_ORDEM = {
+    "id", "paciente_id", "dentista_id", "laboratorio_id", "agendamento_id", "procedimento_id",
+    "descricao", "dente_regiao", "cor_escala", "tipo_werk", "data_envio", "previsao_retorno",
+    "custo_laboratorio", "observacoes", "status", "created_at", "updated_at",
+}
+EMBEDS_ORDEM = {
+    "pacientes": "pacientes(nome, telefone)",
+    "dentistas": "dentistas(nome)",
+    "laboratorios": "laboratorios(nome)",
+}
+
 class OrdemSchema(BaseModel):
     paciente_id: str
     dentista_id: Optional[str] = None
@@ -26,34 +41,46 @@ class StatusUpdate(BaseModel):
     status: str
 
 @router.get("/")
-def listar_ordens(dentista_id: Optional[str] = None, status: Optional[str] = None):
-    sb = get_supabase()
-    query = sb.table("ordens_proteticas").select(
-        "*, pacientes(nome, telefone), dentistas(nome), laboratorios(nome)"
-    ).order("created_at", desc=True)
+async def listar_ordens(
+    dentista_id: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+):
+    sb = get_supabase_async()
+    ordem = parse_sort(sort, {"created_at", "previsao_retorno"}, "-created_at")
+    select = montar_select(fields, include, CAMPOS_ORDEM, EMBEDS_ORDEM, tuple(c for c, _ in ordem))
 
-    if dentista_id:
-        query = query.eq("dentista_id", dentista_id)
-    if status:
-        query = query.eq("status", status)
+    def consulta():
+        query = sb.table("ordens_proteticas").select(select)
+        if dentista_id:
+            query = query.eq("dentista_id", dentista_id)
+        if status:
+            query = query.eq("status", status)
+        return query
 
-    res = query.execute()
-    return res.data
+    # Com `limit`, devolve uma página `{items, next_cursor}`; sem ele, a lista completa
+    if limit:
+        return await paginar(consulta(), ordem, limit, cursor)
+    return await fetch_all(lambda: aplicar_ordem(consulta(), ordem))
 
 @router.post("/")
-def criar_ordem(ordem: OrdemSchema):
-    sb = get_supabase()
+async def criar_ordem(ordem: OrdemSchema):
+    sb = get_supabase_async()
     payload = ordem.model_dump(exclude_none=True)
     if "status" not in payload:
         payload["status"] = "PRE_ENVIO"
-    res = sb.table("ordens_proteticas").insert(payload).execute()
+    res = await sb.table("ordens_proteticas").insert(payload).execute()
     return res.data[0]
 
 @router.patch("/{id}/status")
-def atualizar_status(id: str, update: StatusUpdate):
+async def atualizar_status(id: str, update: StatusUpdate):
     if update.status not in COLUNAS_VALIDAS:
         raise HTTPException(status_code=400, detail=f"Status inválido. Use: {COLUNAS_VALIDAS}")
-    sb = get_supabase()
+    sb = get_supabase_async()
     
     # Set date fields automatically on status transitions
     extra = {}
@@ -62,21 +89,21 @@ def atualizar_status(id: str, update: StatusUpdate):
     elif update.status == "INSTALADO":
         extra["data_instalacao"] = "now()"
 
-    res = sb.table("ordens_proteticas").update({"status": update.status, **extra}).eq("id", id).execute()
+    res = await sb.table("ordens_proteticas").update({"status": update.status, **extra}).eq("id", id).execute()
     if not res.data:
         raise HTTPException(status_code=404, detail="Ordem não encontrada")
     return res.data[0]
 
 @router.put("/{id}")
-def editar_ordem(id: str, ordem: OrdemSchema):
-    sb = get_supabase()
-    res = sb.table("ordens_proteticas").update(ordem.model_dump(exclude_none=True)).eq("id", id).execute()
+async def editar_ordem(id: str, ordem: OrdemSchema):
+    sb = get_supabase_async()
+    res = await sb.table("ordens_proteticas").update(ordem.model_dump(exclude_none=True)).eq("id", id).execute()
     if not res.data:
         raise HTTPException(status_code=404, detail="Ordem não encontrada")
     return res.data[0]
 
 @router.delete("/{id}")
-def deletar_ordem(id: str):
-    sb = get_supabase()
-    res = sb.table("ordens_proteticas").delete().eq("id", id).execute()
+async def deletar_ordem(id: str):
+    sb = get_supabase_async()
+    res = await sb.table("ordens_proteticas").delete().eq("id", id).execute()
     return {"ok": True}
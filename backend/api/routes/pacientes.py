@@ -1,15 +1,24 @@
 """
 Rotas da API - Pacientes
 """
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 from typing import List
 from pydantic import BaseModel
 from datetime import date
 
-from backend.config.supabase_client import get_supabase
+from backend.config.supabase_client import get_supabase_async
+from backend.services.queries import fetch_all
+from backend.services.pagination import MAX_LIMIT, parse_sort, aplicar_ordem, paginar
+from backend.services.projection import montar_select
 
 router = APIRouter()
 
+# Colunas aceitas em `?fields=`
+CAMPOS_PACIENTE = {
+    "id", "nome", "cpf", "data_nascimento", "telefone", "celular", "email",
+    "endereco", "cidade", "estado", "cep", "observacoes", "ativo", "created_at", "updated_at",
+}
+
 
 # Schemas Pydantic
 class PacienteBase(BaseModel):
@@ -47,18 +56,36 @@ class PacienteUpdate(BaseModel):
 
 
 @router.get("/")
-def listar_pacientes(ativo: bool | None = None):
-    """Lista todos os pacientes"""
-    sb = get_supabase()
-    query = sb.table('pacientes').select('*').order('nome')
-    if ativo is not None:
-        query = query.eq('ativo', ativo)
-    result = query.execute()
-    return result.data
+async def listar_pacientes(
+    ativo: bool | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: str | None = None,
+    sort: str | None = None,
+    fields: str | None = None,
+):
+    """
+    Lista os pacientes.
+    Com `limit`, devolve uma página `{items, next_cursor}`; sem ele, a lista completa.
+    `fields` restringe as colunas retornadas (ex.: `?fields=nome,telefone`).
+    """
+    sb = get_supabase_async()
+    ordem = parse_sort(sort, {"nome", "created_at"}, "nome")
+    select = montar_select(fields, None, CAMPOS_PACIENTE, {}, tuple(c for c, _ in ordem))
+
+    def consulta():
+        query = sb.table('pacientes').select(select)
+        if ativo is not None:
+            query = query.eq('ativo', ativo)
+        return query
+
+    if limit:
+        return await paginar(consulta(), ordem, limit, cursor)
+    # Lido em blocos para não ser cortado pelo max-rows do PostgREST
+    return await fetch_all(lambda: aplicar_ordem(consulta(), ordem))
 
 
 @router.get("/search")
-def pesquisar_pacientes(q: str, limit: int = 10):
+async def pesquisar_pacientes(q: str, limit: int = 10):
     """
     Busca global otimizada para a omni-search bar.
     Filtra por nome, cpf ou celular.
@@ -66,7 +93,7 @@ def pesquisar_pacientes(q: str, limit: int = 10):
     if not q or len(q) < 2:
         return []
         
-    sb = get_supabase()
+    sb = get_supabase_async()
     
     # Prepara o termo de busca para a cláusula ILIKE
     search_term = f"%{q}%"
@@ -79,53 +106,54 @@ def pesquisar_pacientes(q: str, limit: int = 10):
               .order('nome') \
               .limit(limit)
               
-    result = query.execute()
+    result = await query.execute()
     return result.data
 
 
 @router.get("/{paciente_id}")
-def obter_paciente(paciente_id: str):
+async def obter_paciente(paciente_id: str, fields: str | None = None):
     """Obtém um paciente específico"""
-    sb = get_supabase()
-    result = sb.table('pacientes').select('*').eq('id', paciente_id).execute()
+    sb = get_supabase_async()
+    select = montar_select(fields, None, CAMPOS_PACIENTE, {})
+    result = await sb.table('pacientes').select(select).eq('id', paciente_id).execute()
     if not result.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Paciente não encontrado")
     return result.data[0]
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def criar_paciente(paciente_data: PacienteCreate):
+async def criar_paciente(paciente_data: PacienteCreate):
     """Cria um novo paciente"""
-    sb = get_supabase()
+    sb = get_supabase_async()
     dados = paciente_data.model_dump(exclude_none=True)
     if 'data_nascimento' in dados and dados['data_nascimento']:
         dados['data_nascimento'] = str(dados['data_nascimento'])
-    result = sb.table('pacientes').insert(dados).execute()
+    result = await sb.table('pacientes').insert(dados).execute()
     if not result.data:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Erro ao criar paciente")
     return result.data[0]
 
 
 @router.put("/{paciente_id}")
-def atualizar_paciente(paciente_id: str, paciente_data: PacienteUpdate):
+async def atualizar_paciente(paciente_id: str, paciente_data: PacienteUpdate):
     """Atualiza um paciente"""
-    sb = get_supabase()
+    sb = get_supabase_async()
     dados = paciente_data.model_dump(exclude_unset=True)
     if 'data_nascimento' in dados and dados['data_nascimento']:
         dados['data_nascimento'] = str(dados['data_nascimento'])
-    result = sb.table('pacientes').update(dados).eq('id', paciente_id).execute()
+    result = await sb.table('pacientes').update(dados).eq('id', paciente_id).execute()
     if not result.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Paciente não encontrado")
     return result.data[0]
 
 
 @router.delete("/{paciente_id}", status_code=status.HTTP_204_NO_CONTENT)
-def deletar_paciente(paciente_id: str):
+async def deletar_paciente(paciente_id: str):
     """Hard delete com verificação de histórico (bloqueio de integridade)"""
-    sb = get_supabase()
+    sb = get_supabase_async()
     
     # 1. Checa se o paciente tem histórico de agendamentos
-    agendamentos = sb.table('agendamentos').select('id', count='exact').eq('paciente_id', paciente_id).execute()
+    agendamentos = await sb.table('agendamentos').select('id', count='exact').eq('paciente_id', paciente_id).execute()
     if agendamentos.count and agendamentos.count > 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
@@ -133,7 +161,7 @@ def deletar_paciente(paciente_id: str):
         )
 
     # 2. Hard Delete
-    result = sb.table('pacientes').delete().eq('id', paciente_id).execute()
+    result = await sb.table('pacientes').delete().eq('id', paciente_id).execute()
     if not result.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Paciente não encontrado")
     return None
@@ -3,7 +3,9 @@ Rotas da API - Procedimentos
 """
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
-from backend.config.supabase_client import get_supabase
+from backend.config.supabase_client import get_supabase_async
+from backend.services.cache import cache_referencia
+from backend.services.referencia import consulta_cacheada
 
 router = APIRouter()
 
@@ -29,47 +31,50 @@ class ProcedimentoUpdate(BaseModel):
 
 
 @router.get("/")
-def listar_procedimentos(ativo: bool | None = None):
-    sb = get_supabase()
+async def listar_procedimentos(ativo: bool | None = None):
+    sb = get_supabase_async()
     q = sb.table("procedimentos").select("*").order("nome")
     if ativo is not None:
         q = q.eq("ativo", ativo)
-    return q.execute().data
+    return await consulta_cacheada(("procedimentos", "lista", ativo), q)
 
 
 @router.get("/{procedimento_id}")
-def obter_procedimento(procedimento_id: str):
-    sb = get_supabase()
-    r = sb.table("procedimentos").select("*").eq("id", procedimento_id).execute()
-    if not r.data:
+async def obter_procedimento(procedimento_id: str):
+    sb = get_supabase_async()
+    dados = await consulta_cacheada(("procedimentos", procedimento_id), sb.table("procedimentos").select("*").eq("id", procedimento_id))
+    if not dados:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Procedimento nao encontrado")
-    return r.data[0]
+    return dados[0]
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def criar_procedimento(procedimento_data: ProcedimentoCreate):
-    sb = get_supabase()
+async def criar_procedimento(procedimento_data: ProcedimentoCreate):
+    sb = get_supabase_async()
     dados = procedimento_data.model_dump(exclude_none=True)
-    r = sb.table("procedimentos").insert(dados).execute()
+    r = await sb.table("procedimentos").insert(dados).execute()
+    cache_referencia.invalidar("procedimentos")
     if not r.data:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Erro ao criar procedimento")
     return r.data[0]
 
 
 @router.put("/{procedimento_id}")
-def atualizar_procedimento(procedimento_id: str, procedimento_data: ProcedimentoUpdate):
-    sb = get_supabase()
+async def atualizar_procedimento(procedimento_id: str, procedimento_data: ProcedimentoUpdate):
+    sb = get_supabase_async()
     dados = procedimento_data.model_dump(exclude_unset=True)
-    r = sb.table("procedimentos").update(dados).eq("id", procedimento_id).execute()
+    r = await sb.table("procedimentos").update(dados).eq("id", procedimento_id).execute()
+    cache_referencia.invalidar("procedimentos")
     if not r.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Procedimento nao encontrado")
     return r.data[0]
 
 
 @router.delete("/{procedimento_id}", status_code=status.HTTP_204_NO_CONTENT)
-def deletar_procedimento(procedimento_id: str):
-    sb = get_supabase()
-    r = sb.table("procedimentos").delete().eq("id", procedimento_id).execute()
+async def deletar_procedimento(procedimento_id: str):
+    sb = get_supabase_async()
+    r = await sb.table("procedimentos").delete().eq("id", procedimento_id).execute()
+    cache_referencia.invalidar("procedimentos")
     if not r.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Procedimento nao encontrado")
     return None
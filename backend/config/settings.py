@@ -18,6 +18,22 @@ class Settings(BaseSettings):
     # Supabase REST API
     SUPABASE_URL: str = ""
     SUPABASE_KEY: str = ""
+    SUPABASE_TIMEOUT_SECONDS: float = 30.0
+    SUPABASE_POOL_MAX_CONNECTIONS: int = 50
+
+    # Cache em memória dos dados de referência (procedimentos, dentistas, categorias...)
+    REFERENCE_CACHE_TTL_SECONDS: float = 300.0
+    REFERENCE_CACHE_MAXSIZE: int = 256
+
+    # Cache dos KPIs do dashboard por mês (descartado pelas escritas do próprio processo)
+    DASHBOARD_CACHE_TTL_SECONDS: float = 60.0
+    DASHBOARD_CACHE_MAXSIZE: int = 120
+
+    # Jobs em segundo plano (migrações e reprocessamentos longos)
+    JOBS_MAX_WORKERS: int = 2
+    JOBS_RESULT_CACHE_TTL_SECONDS: float = 3600.0
+    # Jobs ativos sem atualização há mais que isso são dados como órfãos na subida da API
+    JOBS_STALE_AFTER_SECONDS: float = 900.0
 
     # JWT Auth
     JWT_SECRET_KEY: str = ""
@@ -1,31 +1,121 @@
 """
 Cliente Supabase (conexão via HTTPS/PostgREST)
 """
+import asyncio
+import math
 from functools import lru_cache
-from postgrest import SyncPostgrestClient
+
+import httpx
+from postgrest import SyncPostgrestClient, AsyncPostgrestClient
 from backend.config.settings import get_settings
 
 
+def _headers(key: str) -> dict:
+    return {
+        "apikey":        key,
+        "Authorization": f"Bearer {key}",
+        "Content-Profile": "public",
+    }
+
+
 class FakeSupabaseClient:
     def __init__(self, url: str, key: str):
         rest_url = f"{url}/rest/v1"
-        headers = {
-            "apikey":        key,
-            "Authorization": f"Bearer {key}",
-            "Content-Profile": "public",
-        }
-        self.postgrest = SyncPostgrestClient(rest_url, headers=headers)
+        self.postgrest = SyncPostgrestClient(rest_url, headers=_headers(key))
 
     def table(self, table_name: str):
         return self.postgrest.table(table_name)
 
+    def rpc(self, func: str, params: dict):
+        return self.postgrest.rpc(func, params)
 
-@lru_cache()
-def get_supabase() -> FakeSupabaseClient:
-    """Retorna cliente Supabase (cached) usando variáveis do .env"""
+
+class _PoolFragmentado(httpx.AsyncBaseTransport):
+    """
+    Pool de conexões dividido em fragmentos pequenos, com semáforo na frente.
+
+    O pool do httpcore faz varreduras O(conexões²) e O(fila × conexões) a cada
+    requisição atendida; com 50+ conexões e centenas de handlers aguardando,
+    isso consome mais CPU que o próprio I/O. Segurando o excedente no semáforo
+    e repartindo as conexões em fragmentos de `por_fragmento`, cada pool
+    interno continua pequeno e barato de varrer.
+    """
+
+    def __init__(self, max_connections: int, por_fragmento: int = 10):
+        qtd = max(1, math.ceil(max_connections / por_fragmento))
+        limites = httpx.Limits(max_connections=por_fragmento, max_keepalive_connections=por_fragmento)
+        self._fragmentos = [httpx.AsyncHTTPTransport(limits=limites) for _ in range(qtd)]
+        self._livres = [por_fragmento] * qtd
+        self._slots = asyncio.Semaphore(qtd * por_fragmento)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        async with self._slots:
+            i = max(range(len(self._livres)), key=self._livres.__getitem__)
+            self._livres[i] -= 1
+            try:
+                response = await self._fragmentos[i].handle_async_request(request)
+                await response.aread()
+                return response
+            finally:
+                self._livres[i] += 1
+
+    async def aclose(self):
+        for fragmento in self._fragmentos:
+            await fragmento.aclose()
+
+
+class FakeAsyncSupabaseClient:
+    """
+    Variante assíncrona do cliente, usada pelas rotas `async def`.
+
+    Todas as requisições compartilham um único `httpx.AsyncClient`, que mantém
+    o pool de conexões keep-alive com o PostgREST. Enquanto aguarda a resposta
+    o handler libera o event loop em vez de ocupar uma thread do threadpool.
+    """
+
+    def __init__(self, url: str, key: str, http_client: httpx.AsyncClient | None = None):
+        settings = get_settings()
+        rest_url = f"{url}/rest/v1"
+        self.http = http_client or httpx.AsyncClient(
+            transport=_PoolFragmentado(settings.SUPABASE_POOL_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(settings.SUPABASE_TIMEOUT_SECONDS),
+            follow_redirects=True,
+        )
+        self.postgrest = AsyncPostgrestClient(rest_url, headers=_headers(key), http_client=self.http)
+
+    def table(self, table_name: str):
+        return self.postgrest.table(table_name)
+
+    def rpc(self, func: str, params: dict):
+        return self.postgrest.rpc(func, params)
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+def _credenciais() -> tuple[str, str]:
     settings = get_settings()
     if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
         raise RuntimeError(
             "SUPABASE_URL e SUPABASE_KEY devem estar definidos no arquivo .env"
         )
-    return FakeSupabaseClient(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return settings.SUPABASE_URL, settings.SUPABASE_KEY
+
+
+@lru_cache()
+def get_supabase() -> FakeSupabaseClient:
+    """Retorna cliente Supabase (cached) usando variáveis do .env"""
+    return FakeSupabaseClient(*_credenciais())
+
+
+@lru_cache()
+def get_supabase_async() -> FakeAsyncSupabaseClient:
+    """Retorna cliente Supabase assíncrono (cached), com pool de conexões compartilhado"""
+    return FakeAsyncSupabaseClient(*_credenciais())
+
+
+async def close_supabase_async():
+    """Fecha o pool de conexões do cliente assíncrono (chamado no shutdown da API)"""
+    if get_supabase_async.cache_info().currsize:
+        await get_supabase_async().aclose()
+        get_supabase_async.cache_clear()
@@ -0,0 +1,53 @@
+"""
+Verifica ou reconstrói o livro de saldos financeiros (fin_saldos_faturamento /
+fin_saldos_paciente) criado por database/saldos_financeiros_v1.sql.
+
+Uso:
+    python backend/scripts/saldos_financeiros.py verificar
+    python backend/scripts/saldos_financeiros.py reconstruir
+    python backend/scripts/saldos_financeiros.py verificar --reconstruir-se-divergir
+"""
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from backend.config.supabase_client import get_supabase
+
+
+def verificar(sb) -> list:
+    divergencias = sb.rpc("fin_saldos_verificar", {}).execute().data or []
+    if not divergencias:
+        print("✅ Livro de saldos íntegro.")
+        return []
+    print(f"⚠️  {len(divergencias)} divergência(s):")
+    for d in divergencias[:50]:
+        print(f"   {d['nivel']:<12} {d['id']}\n      gravado:  {d['gravado']}\n      esperado: {d['esperado']}")
+    if len(divergencias) > 50:
+        print(f"   ... e mais {len(divergencias) - 50}")
+    return divergencias
+
+
+def reconstruir(sb):
+    print("⏳ Reconstruindo saldos a partir de fin_faturamentos / fin_transacoes...")
+    res = sb.rpc("fin_saldos_reconstruir", {}).execute().data
+    print(f"✅ Saldos reconstruídos: {res}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Livro de saldos financeiros")
+    parser.add_argument("acao", choices=["verificar", "reconstruir"])
+    parser.add_argument("--reconstruir-se-divergir", action="store_true")
+    args = parser.parse_args()
+
+    sb = get_supabase()
+    if args.acao == "reconstruir":
+        reconstruir(sb)
+    else:
+        divergencias = verificar(sb)
+        if divergencias and args.reconstruir_se_divergir:
+            reconstruir(sb)
+            verificar(sb)
+        elif divergencias:
+            sys.exit(1)
@@ -1,3 +1,12 @@
-from .database import get_db, init_db, Base, engine
+from .queries import gather_queries, iter_chunks, iter_rows, fetch_all, PAGE_SIZE
 
-__all__ = ["get_db", "init_db", "Base", "engine"]
+__all__ = ["get_db", "init_db", "Base", "engine", "gather_queries", "iter_chunks", "iter_rows", "fetch_all", "PAGE_SIZE"]
+
+
+def __getattr__(name):
+    # O módulo database cria o engine SQLAlchemy (e exige o driver psycopg) no
+    # import; a API usa só PostgREST, então ele é carregado sob demanda.
+    if name in ("get_db", "init_db", "Base", "engine"):
+        from . import database
+        return getattr(database, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
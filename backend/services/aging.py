@@ -0,0 +1,68 @@
+"""
+Aging de recebíveis (`/financeiro/consultorio/aging`)
+
+Parcelas a receber PENDENTES e vencidas, por faixa de dias de atraso. O
+banco entrega os grupos prontos pelas views de database/aging_v1.sql; sem
+elas, as funções abaixo agrupam as vencidas aqui, no mesmo formato.
+"""
+from datetime import date
+
+from backend.services.dinheiro import centavos, reais
+
+FAIXAS = ("0-30", "31-60", "61-90", "90+")
+
+
+def faixa_de(dias: int) -> str:
+    """Faixa de atraso (mesmos limites de fin_aging_faixa no banco)"""
+    if dias <= 30:
+        return "0-30"
+    if dias <= 60:
+        return "31-60"
+    if dias <= 90:
+        return "61-90"
+    return "90+"
+
+
+def a_receber(t: dict) -> bool:
+    return t.get("faturamento_id") is not None or (t.get("fin_categorias") or {}).get("tipo") == "RECEITA"
+
+
+def agrupar_vencidas(txs: list[dict], hoje: date) -> tuple[list[dict], list[dict]]:
+    """
+    Agrupa transações PENDENTES já vencidas (com o embed `fin_faturamentos(paciente_id,
+    pacientes(nome, telefone))`) como as views: totais por faixa e linhas por (paciente, faixa).
+    """
+    faixas: dict[str, dict] = {}
+    pacientes: dict[tuple, dict] = {}
+    for t in txs:
+        if not a_receber(t):
+            continue
+        venc = str(t["data_vencimento"])[:10]
+        faixa = faixa_de((hoje - date.fromisoformat(venc)).days)
+        valor = centavos(t["valor"])
+        fat = t.get("fin_faturamentos") or {}
+        paciente_id = fat.get("paciente_id")
+
+        resumo = faixas.setdefault(faixa, {"faixa": faixa, "total": 0, "qtd": 0, "ids": set()})
+        resumo["total"] += valor
+        resumo["qtd"] += 1
+        if paciente_id is not None:
+            resumo["ids"].add(paciente_id)
+
+        if paciente_id is None:
+            continue
+        paciente = fat.get("pacientes") or {}
+        linha = pacientes.setdefault((paciente_id, faixa), {
+            "paciente_id": paciente_id, "nome": paciente.get("nome"), "telefone": paciente.get("telefone"),
+            "faixa": faixa, "total": 0, "qtd": 0, "vencimento_mais_antigo": venc,
+        })
+        linha["total"] += valor
+        linha["qtd"] += 1
+        linha["vencimento_mais_antigo"] = min(linha["vencimento_mais_antigo"], venc)
+
+    resumo_faixas = [
+        {"faixa": r["faixa"], "total": reais(r["total"]), "qtd": r["qtd"], "pacientes": len(r["ids"])}
+        for r in faixas.values()
+    ]
+    linhas = [{**l, "total": reais(l["total"])} for l in pacientes.values()]
+    return resumo_faixas, linhas
@@ -0,0 +1,134 @@
+"""
+Cache em memória (TTL + LRU) para dados de referência
+
+Procedimentos, dentistas, categorias, formas de pagamento e laboratórios mudam
+pouco e eram buscados no PostgREST a cada chamada. As leituras passam por
+`CacheReferencia.obter`, que guarda o resultado por `ttl` segundos; as rotas
+que alteram essas tabelas chamam `invalidar(tabela)` logo após gravar.
+
+As chaves são tuplas cujo primeiro elemento é o nome da tabela, o que permite
+invalidar de uma vez todas as variações (filtros, projeções) de uma tabela.
+O cache é por processo: com vários workers, cada um expira no seu TTL.
+
+Cargas simultâneas da mesma chave são compartilhadas (single-flight): a
+primeira requisição executa `carregar()` e as que chegam enquanto ela roda
+aguardam o mesmo resultado, em vez de repetir a consulta.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from backend.config.settings import get_settings
+
+
+class CacheReferencia:
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._itens: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+        # Geração por tabela: uma carga iniciada antes de uma invalidação não
+        # pode gravar o resultado (possivelmente antigo) depois dela. Também há
+        # geração por chave, para `descartar` entradas específicas
+        self._geracao: dict[str | tuple, int] = {}
+        self._em_andamento: dict[tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.compartilhadas = 0
+        self.invalidacoes = 0
+
+    async def obter(self, chave: tuple, carregar: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Retorna o valor em cache para `chave` ou executa `carregar()` e o guarda.
+        `None` não é guardado (registro ainda inexistente é consultado de novo).
+        Se a mesma chave já estiver sendo carregada, aguarda essa carga.
+        """
+        item = self._itens.get(chave)
+        if item is not None and item[0] > time.monotonic():
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return item[1]
+
+        carga = self._em_andamento.get(chave)
+        if carga is not None:
+            self.compartilhadas += 1
+            return await asyncio.shield(carga)
+
+        self.misses += 1
+        tabela = chave[0]
+        geracao = (self._geracao.get(tabela, 0), self._geracao.get(chave, 0))
+        carga = asyncio.ensure_future(carregar())
+        self._em_andamento[chave] = carga
+
+        def concluir(c: asyncio.Future):
+            if self._em_andamento.get(chave) is c:
+                del self._em_andamento[chave]
+            if c.cancelled() or c.exception() is not None:
+                return
+            valor = c.result()
+            if valor is not None and (self._geracao.get(tabela, 0), self._geracao.get(chave, 0)) == geracao:
+                self.guardar(chave, valor)
+
+        carga.add_done_callback(concluir)
+        # shield: se quem iniciou a carga for cancelado, quem está aguardando ainda recebe o valor
+        return await asyncio.shield(carga)
+
+    def guardar(self, chave: tuple, valor: Any):
+        """Guarda `valor` diretamente (quem já tem o valor em mãos não precisa de `carregar`)"""
+        self._itens[chave] = (time.monotonic() + self.ttl, valor)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.maxsize:
+            self._itens.popitem(last=False)
+
+    def invalidar(self, *tabelas: str):
+        """Descarta todas as entradas das `tabelas` informadas."""
+        for tabela in tabelas:
+            self._geracao[tabela] = self._geracao.get(tabela, 0) + 1
+            for chave in [c for c in self._itens if c[0] == tabela]:
+                del self._itens[chave]
+            # Quem chegar depois não aguarda uma carga anterior à invalidação
+            for chave in [c for c in self._em_andamento if c[0] == tabela]:
+                del self._em_andamento[chave]
+        self.invalidacoes += 1
+
+    def descartar(self, *chaves: tuple):
+        """Descarta apenas as `chaves` informadas (as demais entradas da tabela continuam)."""
+        for chave in chaves:
+            self._geracao[chave] = self._geracao.get(chave, 0) + 1
+            self._itens.pop(chave, None)
+            self._em_andamento.pop(chave, None)
+        if chaves:
+            self.invalidacoes += 1
+
+    def limpar(self):
+        for tabela in {c[0] for c in self._itens}:
+            self._geracao[tabela] = self._geracao.get(tabela, 0) + 1
+        self._itens.clear()
+        self._em_andamento.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entradas": len(self._itens),
+            "maxsize": self.maxsize,
+            "ttl_segundos": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "compartilhadas": self.compartilhadas,
+            "invalidacoes": self.invalidacoes,
+        }
+
+
+_settings = get_settings()
+cache_referencia = CacheReferencia(
+    maxsize=_settings.REFERENCE_CACHE_MAXSIZE,
+    ttl=_settings.REFERENCE_CACHE_TTL_SECONDS,
+)
+
+# KPIs do dashboard por mês: chave ("dashboard", ano, mes); as escritas em
+# fin_transacoes descartam só os meses que tocaram (resumo_mensal.descartar_meses)
+cache_dashboard = CacheReferencia(
+    maxsize=_settings.DASHBOARD_CACHE_MAXSIZE,
+    ttl=_settings.DASHBOARD_CACHE_TTL_SECONDS,
+)
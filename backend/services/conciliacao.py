@@ -0,0 +1,256 @@
+"""
+Conciliação de extrato bancário (`/financeiro/consultorio/conciliacao`)
+
+Lê um extrato OFX ou CSV em fluxo — pedaço a pedaço, sem carregar o arquivo
+inteiro — e guarda só os créditos, já compactos (data, centavos, descrição).
+As parcelas PENDENTES do período entram num índice valor → candidatas; cada
+crédito consulta só as parcelas do seu valor, dentro da janela de dias do
+vencimento, e desempata pela descrição (nome do paciente, descrição da parcela).
+"""
+import csv
+import io
+import itertools
+import re
+import unicodedata
+from datetime import date
+from typing import IO, Iterable, Iterator, NamedTuple, Optional
+
+from backend.services.dinheiro import centavos
+
+FORMATOS = ("ofx", "csv")
+
+# Palavras comuns nos históricos dos bancos, que não ajudam a achar o paciente
+PALAVRAS_IGNORADAS = {
+    "PIX", "TED", "DOC", "TEF", "TRANSF", "TRANSFERENCIA", "RECEBIDO", "RECEBIDA", "RECEB", "CREDITO",
+    "DEPOSITO", "PAGAMENTO", "PAGTO", "PARCELA", "ENTRADA", "VISTA", "ORDEM", "CONTA", "BANCO", "LTDA",
+}
+
+# Nomes de coluna aceitos no CSV (comparados já normalizados)
+COLUNAS_CSV = {
+    "data": ("DATA", "DATE", "DT", "DATA LANCAMENTO", "DATA MOVIMENTO"),
+    "valor": ("VALOR", "VALUE", "AMOUNT", "VALOR R$", "VALOR (R$)"),
+    "descricao": ("DESCRICAO", "HISTORICO", "MEMO", "DESCRIPTION", "LANCAMENTO"),
+    "id": ("ID", "FITID", "DOCUMENTO", "IDENTIFICADOR"),
+}
+
+
+class Lancamento(NamedTuple):
+    linha: int                # posição no extrato (1 = primeiro lançamento)
+    data: Optional[date]      # None: linha que não pôde ser lida
+    valor: int                # centavos; positivo = crédito
+    descricao: str
+    id: Optional[str] = None  # FITID / documento do banco
+
+
+def normalizar(texto: str) -> str:
+    """Maiúsculas, sem acentos"""
+    sem_acento = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode()
+    return sem_acento.upper().strip()
+
+
+def palavras(texto: str) -> set[str]:
+    """Palavras (3+ letras) que identificam quem pagou"""
+    return {p for p in re.split(r"[^A-Z0-9]+", normalizar(texto)) if len(p) >= 3 and p not in PALAVRAS_IGNORADAS}
+
+
+def ler_data(texto: str) -> Optional[date]:
+    """AAAAMMDD[hhmmss...] (OFX), AAAA-MM-DD ou DD/MM/AAAA"""
+    texto = (texto or "").strip()
+    try:
+        if re.match(r"^\d{8}", texto):
+            return date(int(texto[:4]), int(texto[4:6]), int(texto[6:8]))
+        if re.match(r"^\d{4}-\d{2}-\d{2}", texto):
+            return date.fromisoformat(texto[:10])
+        dia, mes, ano = re.match(r"^(\d{1,2})/(\d{1,2})/(\d{2,4})", texto).groups()
+        return date(int(ano) + (2000 if len(ano) == 2 else 0), int(mes), int(dia))
+    except (AttributeError, ValueError):
+        return None
+
+
+def ler_valor(texto: str) -> Optional[int]:
+    """'1.234,56', '-50,00', 'R$ 80', '1,234.56' → centavos"""
+    texto = re.sub(r"[^\d,.\-+]", "", texto or "")
+    # O separador decimal é o último que aparece
+    if "," in texto and texto.rfind(",") > texto.rfind("."):
+        texto = texto.replace(".", "").replace(",", ".")
+    else:
+        texto = texto.replace(",", "")
+    try:
+        return centavos(texto) if texto else None
+    except ArithmeticError:
+        return None
+
+
+def ler_ofx(pedacos: Iterable[str]) -> Iterator[Lancamento]:
+    """
+    Lançamentos (<STMTTRN>) de um OFX 1.x (SGML, tags sem fechamento) ou 2.x (XML).
+    Aceita o texto em pedaços de qualquer tamanho: um banco manda tudo numa linha só.
+    """
+    tag = re.compile(r"<(/?[A-Za-z0-9_.]+)>([^<]*)")
+    atual = None
+    qtd = 0
+    resto = ""
+    for pedaco in itertools.chain(pedacos, [None]):
+        if pedaco is None:
+            texto, resto = resto, ""
+        else:
+            texto = resto + pedaco
+            # Um `<` sem o texto seguinte completo fica para o próximo pedaço
+            corte = texto.rfind("<")
+            texto, resto = (texto[:corte], texto[corte:]) if corte >= 0 else ("", texto)
+        for nome, valor in tag.findall(texto):
+            nome = nome.upper()
+            if nome == "STMTTRN":
+                atual = {}
+            elif nome == "/STMTTRN" and atual is not None:
+                qtd += 1
+                yield Lancamento(
+                    linha=qtd,
+                    data=ler_data(atual.get("DTPOSTED", "")),
+                    valor=ler_valor(atual.get("TRNAMT", "")) or 0,
+                    descricao=" ".join(filter(None, (atual.get("NAME"), atual.get("MEMO")))),
+                    id=atual.get("FITID"),
+                )
+                atual = None
+            elif atual is not None and not nome.startswith("/"):
+                atual[nome] = valor.strip()
+
+
+def ler_csv(linhas: Iterable[str]) -> Iterator[Lancamento]:
+    """
+    Lançamentos de um CSV com cabeçalho (separador `;` ou `,`). Precisa das colunas
+    de data e valor; descrição e identificador são opcionais.
+    """
+    linhas = iter(linhas)
+    cabecalho = next(linhas, "")
+    separador = ";" if cabecalho.count(";") >= cabecalho.count(",") else ","
+    nomes = [normalizar(c).strip('"') for c in next(csv.reader([cabecalho], delimiter=separador), [])]
+    indices = {
+        campo: next((i for i, nome in enumerate(nomes) if nome in aceitos), None)
+        for campo, aceitos in COLUNAS_CSV.items()
+    }
+    if indices["data"] is None or indices["valor"] is None:
+        raise ValueError("CSV sem colunas de data e valor no cabeçalho")
+
+    def coluna(campos: list[str], campo: str) -> str:
+        i = indices[campo]
+        return campos[i] if i is not None and i < len(campos) else ""
+
+    for n, campos in enumerate(csv.reader(linhas, delimiter=separador), start=1):
+        if not any(c.strip() for c in campos):
+            continue
+        data, valor = ler_data(coluna(campos, "data")), ler_valor(coluna(campos, "valor"))
+        yield Lancamento(
+            linha=n,
+            # Linhas de saldo/rodapé sem data ou valor são marcadas como ilegíveis
+            data=data if valor is not None else None,
+            valor=valor or 0,
+            descricao=coluna(campos, "descricao").strip(),
+            id=coluna(campos, "id").strip() or None,
+        )
+
+
+def detectar_formato(nome_arquivo: str, inicio: bytes) -> str:
+    """Pela extensão do arquivo; sem ela, pelo começo do conteúdo"""
+    extensao = (nome_arquivo or "").rsplit(".", 1)[-1].lower()
+    if extensao in ("ofx", "qfx"):
+        return "ofx"
+    if extensao == "csv":
+        return "csv"
+    cabeca = inicio.upper()
+    return "ofx" if b"OFXHEADER" in cabeca or b"<OFX>" in cabeca else "csv"
+
+
+def detectar_encoding(inicio: bytes) -> str:
+    """
+    OFX 1.x declara CHARSET:1252 no cabeçalho; sem a declaração, UTF-8 (com ou sem
+    BOM) se o começo do arquivo for UTF-8 válido, senão cp1252 (CSV exportado pelo Excel)
+    """
+    cabeca = inicio.upper()
+    if b"CHARSET:1252" in cabeca or b"ISO-8859-1" in cabeca or b"CHARSET:ISO" in cabeca:
+        return "cp1252"
+    try:
+        inicio.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Um caractere de vários bytes cortado no fim do trecho lido não conta
+        if e.start < len(inicio) - 3 or e.reason != "unexpected end of data":
+            return "cp1252"
+    return "utf-8-sig"
+
+
+def ler_extrato(binario: IO[bytes], formato: str, encoding: str, pedaco: int = 64 * 1024) -> tuple[list[Lancamento], dict]:
+    """
+    Lê o extrato de um arquivo binário aberto, em pedaços de `pedaco` bytes, e
+    devolve os créditos e a contagem do resto. Leitura bloqueante: a rota chama
+    em thread.
+    """
+    texto = io.TextIOWrapper(binario, encoding=encoding, errors="replace", newline="")
+    try:
+        if formato == "ofx":
+            lancamentos = ler_ofx(iter(lambda: texto.read(pedaco), ""))
+        else:
+            lancamentos = ler_csv(texto)
+        return separar_creditos(lancamentos)
+    finally:
+        # Devolve o arquivo intacto para quem o abriu (UploadFile fecha no fim da requisição)
+        texto.detach()
+
+
+def separar_creditos(lancamentos: Iterable[Lancamento]) -> tuple[list[Lancamento], dict]:
+    """Guarda só os créditos; conta o que ficou de fora"""
+    creditos = []
+    contagem = {"lancamentos": 0, "debitos": 0, "ilegiveis": 0}
+    for lanc in lancamentos:
+        contagem["lancamentos"] += 1
+        if lanc.data is None:
+            contagem["ilegiveis"] += 1
+        elif lanc.valor <= 0:
+            contagem["debitos"] += 1
+        else:
+            creditos.append(lanc)
+    return creditos, contagem
+
+
+class IndiceCandidatos:
+    """
+    Parcelas PENDENTES por valor em centavos. Cada crédito olha só a lista do
+    seu valor (normalmente poucas parcelas), em vez de percorrer todas.
+    """
+
+    def __init__(self, janela_dias: int):
+        self.janela_dias = janela_dias
+        self._por_valor: dict[int, list[tuple[int, dict, set[str]]]] = {}
+
+    def adicionar(self, t: dict):
+        """`t` com valor, data_vencimento, descricao e o embed fin_faturamentos(pacientes(nome))"""
+        paciente = ((t.get("fin_faturamentos") or {}).get("pacientes") or {}).get("nome") or ""
+        vencimento = date.fromisoformat(str(t["data_vencimento"])[:10]).toordinal()
+        self._por_valor.setdefault(centavos(t["valor"]), []).append(
+            (vencimento, t, palavras(f"{paciente} {t.get('descricao') or ''}"))
+        )
+
+    def casar(self, lanc: Lancamento) -> tuple[Optional[dict], list[dict]]:
+        """
+        (parcela, []) quando o crédito casa com uma parcela só — que sai do índice;
+        (None, candidatas) quando há empate; (None, []) quando nenhuma serve.
+        """
+        dia = lanc.data.toordinal()
+        lista = self._por_valor.get(lanc.valor, [])
+        na_janela = sorted(
+            (c for c in lista if abs(c[0] - dia) <= self.janela_dias),
+            key=lambda c: abs(c[0] - dia),
+        )
+        if not na_janela:
+            return None, []
+        escolhida = na_janela[0] if len(na_janela) == 1 else None
+        if escolhida is None:
+            # Mesmo valor e janela: a descrição do extrato decide, se apontar para uma só
+            termos = palavras(lanc.descricao)
+            pontos = [len(termos & c[2]) for c in na_janela]
+            melhor = max(pontos)
+            if melhor > 0 and pontos.count(melhor) == 1:
+                escolhida = na_janela[pontos.index(melhor)]
+        if escolhida is None:
+            return None, [c[1] for c in na_janela]
+        lista.remove(escolhida)
+        return escolhida[1], []
@@ -0,0 +1,59 @@
+"""
+Dinheiro em centavos inteiros
+
+Valores chegam do banco e das requisições em reais (numeric(10,2), float no
+JSON). As contas do financeiro (parcelas, residuais, KPIs, saldos) convertem
+para centavos `int` na entrada, somam e dividem em inteiros — exato, sem
+re-arredondar a cada passo — e voltam para reais só na resposta ou na gravação.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable
+
+
+def centavos(valor) -> int:
+    """Valor em reais (float/str/Decimal) para centavos inteiros, arredondando meio centavo para cima"""
+    if isinstance(valor, (int, float)):
+        # Caminho rápido: valores com até 2 casas (o que vem do banco) dão um inteiro exato
+        bruto = valor * 100
+        inteiro = round(bruto)
+        if abs(bruto - inteiro) < 1e-6:
+            return int(inteiro)
+    return int((Decimal(str(valor or 0)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def reais(valor_centavos: int) -> float:
+    """Centavos para reais (o float mais próximo de um valor com 2 casas)"""
+    return valor_centavos / 100
+
+
+def somar(valores: Iterable) -> int:
+    """Soma valores em reais, em centavos"""
+    return sum(centavos(v) for v in valores)
+
+
+def distribuir_centavos(total: int, qtd: int) -> list[int]:
+    """
+    Divide `total` centavos em `qtd` partes que somam exatamente `total`;
+    os centavos que sobram da divisão vão para as primeiras partes.
+    """
+    if qtd <= 0:
+        raise ValueError(f"não há partes para distribuir {total} centavos (qtd={qtd})")
+    base, resto = divmod(total, qtd)
+    return [base + (1 if i < resto else 0) for i in range(qtd)]
+
+
+def dividir_resto_na_ultima(total: int, qtd: int) -> list[int]:
+    """
+    Divide `total` centavos em `qtd` parcelas iguais; a última leva o que sobra
+    da divisão (R$ 100 em 3x: 33,33 + 33,33 + 33,34).
+    """
+    if qtd <= 0:
+        raise ValueError(f"não há parcelas para dividir {total} centavos (qtd={qtd})")
+    base, resto = divmod(total, qtd)
+    return [base] * (qtd - 1) + [base + resto]
+
+
+def percentual(valor_centavos: int, porcentagem) -> int:
+    """`porcentagem`% de um valor em centavos, arredondando meio centavo para cima"""
+    bruto = Decimal(valor_centavos) * Decimal(str(porcentagem or 0)) / 100
+    return int(bruto.to_integral_value(ROUND_HALF_UP))
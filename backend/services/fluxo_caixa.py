@@ -0,0 +1,94 @@
+"""
+Previsão de fluxo de caixa da clínica (`/financeiro/consultorio/fluxo-caixa`)
+
+Parte das transações PENDENTES com vencimento no horizonte (parcelas dos
+faturamentos, despesas lançadas). Recebimentos caem no caixa no vencimento
+mais os `dias_repasse` da forma de pagamento (a operadora do cartão repassa
+dias depois); pagamentos saem no vencimento.
+
+As linhas chegam em blocos do PostgREST e cada uma é somada, em centavos, ao
+período (dia ou semana) em que cai: uma passada só, sem consulta por dia. O
+período é achado por aritmética sobre o número do dia, não por busca.
+"""
+from datetime import date, timedelta
+from typing import AsyncIterable
+
+from backend.services.dinheiro import centavos
+
+GRANULARIDADES = {"dia": 1, "semana": 7}
+
+
+def repasse_por_metodo(formas: list[dict]) -> dict[str, int]:
+    """
+    Dias de repasse por método de pagamento. O método gravado na transação (ou no
+    faturamento) é o nome da forma ou o tipo (PIX, CREDITO...); o nome prevalece.
+    Formas com o mesmo tipo ficam com o maior prazo.
+    """
+    dias: dict[str, int] = {}
+    for f in formas:
+        dias[f["tipo"]] = max(dias.get(f["tipo"], 0), f.get("dias_repasse") or 0)
+    for f in formas:
+        dias[f["nome"]] = f.get("dias_repasse") or 0
+    return dias
+
+
+def sentido(t: dict) -> int:
+    """+1 entra no caixa da clínica, -1 sai dele, 0 não passa por ele"""
+    cat = t.get("fin_categorias") or {}
+    origem, destino = t.get("conta_origem"), t.get("conta_destino")
+    # Parcelas pendentes ainda não têm conta_destino (é gravada na baixa)
+    if destino == "CLINICA" or (destino is None and cat.get("tipo") == "RECEITA" and cat.get("escopo") != "PESSOAL"):
+        return 1
+    if origem == "CLINICA" or (origem is None and cat.get("tipo") == "DESPESA" and cat.get("escopo") == "CLINICA"):
+        return -1
+    return 0
+
+
+async def projetar(linhas: AsyncIterable[dict], repasse: dict[str, int], inicio: date, fim: date, passo: int) -> dict:
+    """
+    Entradas e saídas previstas de `inicio` a `fim` (exclusivo), em períodos de `passo` dias.
+    Devolve centavos por período e quantos lançamentos caíram no horizonte.
+    """
+    base = inicio.toordinal()
+    qtd_periodos = -(-(fim.toordinal() - base) // passo)
+    entradas = [0] * qtd_periodos
+    saidas = [0] * qtd_periodos
+    ordinais: dict[str, int] = {}  # muitas parcelas vencem no mesmo dia
+    considerados = 0
+
+    async for t in linhas:
+        direcao = sentido(t)
+        if not direcao:
+            continue
+        venc = str(t["data_vencimento"])
+        dia = ordinais.get(venc)
+        if dia is None:
+            dia = ordinais[venc] = date.fromisoformat(venc[:10]).toordinal()
+        if direcao > 0:
+            metodo = t.get("metodo_pagamento") or (t.get("fin_faturamentos") or {}).get("metodo_pagamento")
+            dia += repasse.get(metodo, 0)
+
+        periodo = (dia - base) // passo
+        if dia < base or periodo >= qtd_periodos:
+            continue
+        considerados += 1
+        if direcao > 0:
+            entradas[periodo] += centavos(t["valor"])
+        else:
+            saidas[periodo] += centavos(t["valor"])
+
+    periodos = []
+    acumulado = 0
+    for i in range(qtd_periodos):
+        acumulado += entradas[i] - saidas[i]
+        de = inicio + timedelta(days=i * passo)
+        ate = min(de + timedelta(days=passo - 1), fim - timedelta(days=1))
+        periodos.append({
+            "inicio": de.isoformat(),
+            "fim": ate.isoformat(),
+            "entradas": entradas[i],
+            "saidas": saidas[i],
+            "saldo": entradas[i] - saidas[i],
+            "acumulado": acumulado,
+        })
+    return {"periodos": periodos, "entradas": sum(entradas), "saidas": sum(saidas), "lancamentos": considerados}
@@ -0,0 +1,231 @@
+"""
+Jobs em segundo plano para operações longas (migrações, reprocessamentos)
+
+A rota chama `job_runner.submeter(...)` e responde na hora com o id do job; o
+trabalho roda numa task do próprio processo, limitado a `JOBS_MAX_WORKERS`
+jobs simultâneos (os demais esperam como PENDENTE), sem prender a requisição
+HTTP nem estourar o timeout do proxy.
+
+O estado de cada job é gravado na tabela `jobs` (database/jobs_v1.sql) a cada
+mudança, para `GET /api/jobs/{id}` funcionar em qualquer worker e depois de um
+restart. Sem a tabela, os jobs ficam só em memória. Jobs concluídos ficam num
+cache em memória por `JOBS_RESULT_CACHE_TTL_SECONDS`.
+
+Com a tabela, `unico=True` vale entre workers (índice único parcial
+`idx_jobs_tipo_ativo`), e na subida da API os jobs que ficaram PENDENTE ou
+EXECUTANDO sem atualização há mais de `JOBS_STALE_AFTER_SECONDS` (o processo
+que os rodava caiu) são marcados como ERRO.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
+
+from postgrest.exceptions import APIError
+
+from backend.config.settings import get_settings
+from backend.config.supabase_client import get_supabase_async
+from backend.services.cache import CacheReferencia
+from backend.services.queries import objeto_inexistente
+
+logger = logging.getLogger(__name__)
+
+STATUS_FINAIS = ("CONCLUIDO", "ERRO")
+STATUS_ATIVOS = ("PENDENTE", "EXECUTANDO")
+
+# Recebe `ao_progredir(processadas)` e devolve o resultado do job
+Trabalho = Callable[[Callable[[int], Awaitable[None]]], Awaitable[Any]]
+
+
+class JobRunner:
+    def __init__(self, max_workers: int = 2, ttl_resultados: float = 3600.0, pulso: float = 300.0):
+        self.max_workers = max_workers
+        self.pulso = pulso
+        self._vagas: asyncio.Semaphore | None = None
+        self._ativos: dict[str, dict] = {}
+        self._tarefas: set[asyncio.Task] = set()
+        self._concluidos = CacheReferencia(maxsize=256, ttl=ttl_resultados)
+
+    async def submeter(self, tipo: str, trabalho: Trabalho, unico: bool = False) -> dict:
+        """
+        Enfileira `trabalho` e devolve o job (status PENDENTE).
+
+        `unico=True` impede dois jobs do mesmo tipo ao mesmo tempo: se já houver
+        um pendente ou em execução, neste ou em outro worker, ele é devolvido no
+        lugar de um novo.
+        """
+        if unico:
+            for job in self._ativos.values():
+                if job["tipo"] == tipo:
+                    return dict(job)
+
+        if self._vagas is None:
+            self._vagas = asyncio.Semaphore(self.max_workers)
+
+        job = {
+            "id": str(uuid.uuid4()),
+            "tipo": tipo,
+            "unico": unico,
+            "status": "PENDENTE",
+            "processadas": 0,
+            "resultado": None,
+            "erro": None,
+            "criado_em": datetime.now().isoformat(),
+            "iniciado_em": None,
+            "concluido_em": None,
+            "duracao_s": None,
+            "atualizado_em": None,
+        }
+        # Registrado antes do await, para `unico=True` valer contra chamadas simultâneas;
+        # se a gravação falhar, sai de `_ativos` (senão ficaria lá para sempre, sem task)
+        self._ativos[job["id"]] = job
+        try:
+            await self._gravar(job)
+        except APIError as e:
+            self._ativos.pop(job["id"], None)
+            # Outro worker já tem um job deste tipo (unique_violation em idx_jobs_tipo_ativo)
+            if unico and e.code == "23505":
+                ativo = await self._ativo_no_banco(tipo)
+                if ativo:
+                    return ativo
+            raise
+        except BaseException:
+            self._ativos.pop(job["id"], None)
+            raise
+
+        tarefa = asyncio.create_task(self._executar(job, trabalho))
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+        return dict(job)
+
+    async def _executar(self, job: dict, trabalho: Trabalho):
+        # Regrava o job a cada `pulso` enquanto espera vaga ou roda sem progresso,
+        # para `recuperar_orfaos` de outro worker não o tomar por órfão
+        batimento = asyncio.create_task(self._pulsar(job))
+        try:
+            await self._rodar(job, trabalho, batimento)
+        finally:
+            batimento.cancel()
+
+    async def _pulsar(self, job: dict):
+        while True:
+            await asyncio.sleep(self.pulso)
+            try:
+                await self._gravar(job)
+            except Exception:
+                logger.warning("Não foi possível atualizar o job %s", job["id"], exc_info=True)
+
+    async def _rodar(self, job: dict, trabalho: Trabalho, batimento: asyncio.Task):
+        async with self._vagas:
+            inicio = time.perf_counter()
+            job.update(status="EXECUTANDO", iniciado_em=datetime.now().isoformat())
+
+            async def ao_progredir(processadas: int):
+                job["processadas"] = processadas
+                job["duracao_s"] = round(time.perf_counter() - inicio, 3)
+                await self._gravar(job)
+
+            try:
+                await self._gravar(job)
+                job["resultado"] = await trabalho(ao_progredir)
+                job["status"] = "CONCLUIDO"
+            except asyncio.CancelledError:
+                job.update(status="ERRO", erro="Interrompido no desligamento do servidor")
+                raise
+            except Exception as e:
+                logger.exception("Job %s (%s) falhou", job["id"], job["tipo"])
+                job.update(status="ERRO", erro=str(e))
+            finally:
+                job.update(concluido_em=datetime.now().isoformat(), duracao_s=round(time.perf_counter() - inicio, 3))
+                self._concluidos.guardar(("jobs", job["id"]), dict(job))
+                self._ativos.pop(job["id"], None)
+                batimento.cancel()
+                await asyncio.gather(batimento, return_exceptions=True)
+                try:
+                    await self._gravar(job)
+                except Exception:
+                    logger.exception("Não foi possível gravar o estado final do job %s", job["id"])
+
+    async def _gravar(self, job: dict):
+        job["atualizado_em"] = datetime.now().isoformat()
+        try:
+            await get_supabase_async().table("jobs").upsert(job, on_conflict="id").execute()
+        except APIError as e:
+            if not objeto_inexistente(e):
+                raise
+
+    async def _ativo_no_banco(self, tipo: str) -> dict | None:
+        res = await (
+            get_supabase_async().table("jobs").select("*")
+            .eq("tipo", tipo).eq("unico", True).in_("status", list(STATUS_ATIVOS))
+            .execute()
+        )
+        return res.data[0] if res.data else None
+
+    async def obter(self, job_id: str) -> dict | None:
+        """Estado do job: em memória se ativo ou recém-concluído, senão lido da tabela `jobs`"""
+        if job_id in self._ativos:
+            return dict(self._ativos[job_id])
+
+        chave = ("jobs", job_id)
+
+        async def carregar():
+            try:
+                res = await get_supabase_async().table("jobs").select("*").eq("id", job_id).execute()
+            except APIError as e:
+                if not objeto_inexistente(e):
+                    raise
+                return None
+            return res.data[0] if res.data else None
+
+        job = await self._concluidos.obter(chave, carregar)
+        if job and job["status"] not in STATUS_FINAIS:
+            # Ainda rodando em outro worker: não pode ficar no cache, ele ainda muda
+            self._concluidos.descartar(chave)
+        return job
+
+    async def recuperar_orfaos(self, parados_ha: float) -> int:
+        """
+        Marca como ERRO os jobs PENDENTE/EXECUTANDO sem atualização há mais de
+        `parados_ha` segundos: o processo que os rodava parou sem gravar o estado
+        final, e um job `unico` órfão bloquearia novos jobs do tipo. Chamado na
+        subida da API; uma falha aqui é registrada no log e não impede a subida.
+        """
+        limite = (datetime.now() - timedelta(seconds=parados_ha)).isoformat()
+        agora = datetime.now().isoformat()
+        try:
+            res = await (
+                get_supabase_async().table("jobs")
+                .update({
+                    "status": "ERRO", "erro": "Interrompido: o servidor parou antes de o job terminar",
+                    "concluido_em": agora, "atualizado_em": agora,
+                })
+                .in_("status", list(STATUS_ATIVOS)).lt("atualizado_em", limite)
+                .execute()
+            )
+        except APIError as e:
+            if not objeto_inexistente(e):
+                logger.exception("Não foi possível marcar os jobs órfãos")
+            return 0
+        except Exception:
+            logger.exception("Não foi possível marcar os jobs órfãos")
+            return 0
+        if res.data:
+            logger.warning("%d job(s) órfão(s) marcado(s) como ERRO", len(res.data))
+        return len(res.data)
+
+    async def encerrar(self):
+        """Cancela os jobs em andamento (chamado no desligamento da API)"""
+        for tarefa in list(self._tarefas):
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+
+
+_settings = get_settings()
+job_runner = JobRunner(
+    max_workers=_settings.JOBS_MAX_WORKERS,
+    ttl_resultados=_settings.JOBS_RESULT_CACHE_TTL_SECONDS,
+    pulso=_settings.JOBS_STALE_AFTER_SECONDS / 3,
+)
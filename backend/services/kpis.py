@@ -0,0 +1,90 @@
+"""
+Motor de KPIs financeiros (`/financeiro/consultorio/dashboard`)
+
+Cada transação é classificada uma vez por (tipo, escopo, conta_origem,
+conta_destino, status) e somada, em centavos inteiros, ao total da sua classe —
+numa passada só. No fim, o total de cada classe vai para todos os KPIs cuja
+regra a aceita; as regras são avaliadas uma vez por classe distinta (são
+poucas), então o custo da passada não depende do número de KPIs.
+
+KPIs derivados (lucro, caixa livre) são calculados sobre os totais no fim.
+"""
+from typing import Callable, NamedTuple
+
+
+class Classe(NamedTuple):
+    tipo: str | None
+    escopo: str | None
+    conta_origem: str | None
+    conta_destino: str | None
+    status: str | None
+
+
+def classificar(t: dict) -> tuple:
+    """Chave da classe da transação (uma tupla simples; `Classe` só é montada para avaliar as regras)"""
+    # fin_categorias pode vir None (transações sem categoria, faturamentos avulsos)
+    cat = t.get("fin_categorias") or {}
+    return (cat.get("tipo"), cat.get("escopo"), t.get("conta_origem"), t.get("conta_destino"), t.get("status"))
+
+
+# Regras dos KPIs do dashboard global
+KPIS_DASHBOARD: dict[str, Callable[[Classe], bool]] = {
+    # Entrou na conta clínica (apenas PAGO)
+    "faturamento_bruto": lambda c: c.tipo == "RECEITA" and c.conta_destino == "CLINICA" and c.status == "PAGO",
+    # Despesas da clínica pagas (inclui taxas de operadora registradas como despesa real)
+    "despesas_clinica": lambda c: c.tipo == "DESPESA" and c.escopo == "CLINICA" and c.status == "PAGO",
+    # A receber no mês (inadimplência ou a vencer)
+    "a_receber": lambda c: c.tipo == "RECEITA" and c.status == "PENDENTE",
+    # O que o dentista injetou do próprio bolso na clínica
+    "aportes_pessoais": lambda c: c.conta_origem == "PESSOAL" and c.conta_destino == "CLINICA" and c.status == "PAGO",
+    # O que tirou da clínica pro bolso
+    "retiradas_pro_labore": lambda c: c.conta_origem == "CLINICA" and c.conta_destino == "PESSOAL" and c.status == "PAGO",
+    "despesas_pessoais": lambda c: c.tipo == "DESPESA" and c.escopo == "PESSOAL" and c.status == "PAGO",
+}
+
+DERIVADOS_DASHBOARD: dict[str, Callable[[dict], int]] = {
+    "lucro_operacional": lambda k: k["faturamento_bruto"] - k["despesas_clinica"],
+    # O que sobrou da retirada após as contas pessoais
+    "caixa_pessoal_livre": lambda k: k["retiradas_pro_labore"] - k["despesas_pessoais"],
+}
+
+
+class AgregadorKPI:
+    def __init__(self, regras: dict[str, Callable[[Classe], bool]], derivados: dict[str, Callable[[dict], int]] | None = None):
+        self.regras = regras
+        self.derivados = derivados or {}
+        self._nomes = list(regras)
+        # Chave da classe -> índices dos KPIs que a aceitam (preenchido sob demanda)
+        self._kpis_por_classe: dict[tuple, tuple[int, ...]] = {}
+
+    def _kpis_da_classe(self, chave: tuple) -> tuple[int, ...]:
+        indices = self._kpis_por_classe.get(chave)
+        if indices is None:
+            classe = Classe(*chave)
+            indices = tuple(i for i, nome in enumerate(self._nomes) if self.regras[nome](classe))
+            self._kpis_por_classe[chave] = indices
+        return indices
+
+    def agregar(self, txs) -> dict[str, int]:
+        """Totais em centavos de cada KPI (regras e derivados) sobre `txs`"""
+        # A passada só soma por classe; cada classe é repassada aos seus KPIs no fim
+        # (classificar() e dinheiro.centavos() estão expandidos aqui: é o laço quente do dashboard;
+        # valores numeric(10,2) vindos do banco dão valor*100 a < 1e-9 de um inteiro)
+        por_classe: dict[tuple, int] = {}
+        for t in txs:
+            cat = t.get("fin_categorias") or {}
+            chave = (cat.get("tipo"), cat.get("escopo"), t.get("conta_origem"), t.get("conta_destino"), t.get("status"))
+            por_classe[chave] = por_classe.get(chave, 0) + round((t["valor"] or 0) * 100)
+
+        totais = [0] * len(self._nomes)
+        for chave, valor in por_classe.items():
+            for i in self._kpis_da_classe(chave):
+                totais[i] += valor
+
+        kpis = dict(zip(self._nomes, totais))
+        for nome, calcular in self.derivados.items():
+            kpis[nome] = calcular(kpis)
+        return kpis
+
+
+agregador_dashboard = AgregadorKPI(KPIS_DASHBOARD, DERIVADOS_DASHBOARD)
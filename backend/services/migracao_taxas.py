@@ -0,0 +1,123 @@
+"""
+Migração retroativa das taxas de operadora para despesas
+
+Para cada fin_transacao PAGA com taxa_valor > 0 cria a despesa "Taxa de Operadora"
+correspondente, se ainda não existir. O marcador [taxa-tx:{id}] na descrição da
+despesa torna a migração idempotente.
+
+Roda em lotes: os marcadores já gravados são lidos uma vez para um set, cada
+página de transações vira no máximo um insert, e o último id processado fica
+gravado em `job_checkpoints` (database/jobs_v1.sql) para a migração retomar
+dali se for interrompida.
+"""
+import re
+import time
+from datetime import datetime
+
+from postgrest.exceptions import APIError
+
+from backend.services.queries import iter_chunks, iter_rows, objeto_inexistente
+from backend.services.referencia import categoria_id
+
+CHECKPOINT = "migrar_taxas"
+LOTE_PADRAO = 500
+
+_MARCADOR = re.compile(r"\[taxa-tx:([^\]]+)\]")
+
+
+async def _ler_checkpoint(sb) -> str | None:
+    try:
+        res = await sb.table("job_checkpoints").select("cursor").eq("nome", CHECKPOINT).execute()
+    except APIError as e:
+        if not objeto_inexistente(e):
+            raise
+        return None
+    return res.data[0]["cursor"] if res.data else None
+
+
+async def _gravar_checkpoint(sb, cursor: str | None):
+    """Grava o cursor (ou apaga o checkpoint com `None`); sem a tabela, segue sem checkpoint"""
+    try:
+        if cursor is None:
+            await sb.table("job_checkpoints").delete().eq("nome", CHECKPOINT).execute()
+        else:
+            await sb.table("job_checkpoints").upsert({
+                "nome": CHECKPOINT, "cursor": cursor, "atualizado_em": datetime.now().isoformat(),
+            }, on_conflict="nome").execute()
+    except APIError as e:
+        if not objeto_inexistente(e):
+            raise
+
+
+async def migrar_taxas(sb, lote: int = LOTE_PADRAO, ao_progredir=None) -> dict:
+    """
+    Executa a migração e devolve as contagens e a vazão (linhas/s).
+
+    `ao_progredir(processadas)`, se informado, é aguardado ao fim de cada lote.
+    """
+    inicio = time.perf_counter()
+    cat_taxa_id = await categoria_id("Taxa de Operadora", criar={"tipo": "DESPESA", "escopo": "CLINICA"})
+    if not cat_taxa_id:
+        raise RuntimeError("Erro ao criar categoria Taxa de Operadora")
+
+    # Transações que já têm despesa de taxa (uma varredura só, em vez de um ilike por transação)
+    migradas = set()
+    async for despesa in iter_rows(
+        lambda: sb.table("fin_transacoes").select("id, descricao").eq("categoria_id", cat_taxa_id).like("descricao", "%[taxa-tx:%"),
+        key="id",
+    ):
+        migradas.update(_MARCADOR.findall(despesa.get("descricao") or ""))
+
+    retomado_de = await _ler_checkpoint(sb)
+    hoje = datetime.now().date().isoformat()
+    criadas = ignoradas = processadas = 0
+
+    def origem():
+        q = sb.table("fin_transacoes").select("*").eq("status", "PAGO").gt("taxa_valor", 0)
+        return q.gt("id", retomado_de) if retomado_de else q
+
+    async for pagina in iter_chunks(origem, chunk_size=lote, key="id"):
+        novas = []
+        for tx in pagina:
+            taxa_val = round(float(tx.get("taxa_valor") or 0), 2)
+            if taxa_val <= 0:
+                continue
+            if tx["id"] in migradas:
+                ignoradas += 1
+                continue
+
+            data_pag = tx.get("data_pagamento") or tx.get("data_vencimento") or hoje
+            metodo = tx.get("metodo_pagamento") or "Não informado"
+            novas.append({
+                "categoria_id": cat_taxa_id,
+                "faturamento_id": tx.get("faturamento_id"),
+                "descricao": f"Taxa de Operadora ({metodo}) [taxa-tx:{tx['id']}]",
+                "valor": taxa_val,
+                "data_vencimento": str(data_pag),
+                "data_pagamento": str(data_pag),
+                "conta_origem": "CLINICA",
+                "status": "PAGO",
+                "metodo_pagamento": metodo,
+            })
+
+        if novas:
+            await sb.table("fin_transacoes").insert(novas).execute()
+            criadas += len(novas)
+        processadas += len(pagina)
+        await _gravar_checkpoint(sb, pagina[-1]["id"])
+        if ao_progredir:
+            await ao_progredir(processadas)
+
+    # Terminou: a próxima execução volta a varrer tudo (ids novos podem ser menores que o cursor)
+    await _gravar_checkpoint(sb, None)
+
+    duracao = time.perf_counter() - inicio
+    return {
+        "message": f"Migração concluída: {criadas} despesas de taxa criadas, {ignoradas} já existiam.",
+        "criadas": criadas,
+        "ignoradas": ignoradas,
+        "processadas": processadas,
+        "retomado_de": retomado_de,
+        "duracao_s": round(duracao, 3),
+        "linhas_por_segundo": round(processadas / duracao, 1) if duracao > 0 else None,
+    }
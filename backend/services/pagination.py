@@ -0,0 +1,143 @@
+"""
+Paginação keyset (cursor) para as rotas de listagem
+
+A ordenação é feita no PostgREST por uma coluna permitida mais `id` como
+desempate, o que torna a ordem total e estável. O cursor é opaco para o
+cliente: carrega a ordenação e os valores da última linha entregue, e a
+próxima página continua estritamente depois dela (`WHERE (col, id) > (...)`),
+sem OFFSET — o custo por página não cresce com o histórico.
+
+NULL conta como o maior valor, como no padrão do Postgres (ASC NULLS LAST,
+DESC NULLS FIRST, explícitos na ordenação): os índices btree comuns continuam
+servindo a ordem, e o filtro do cursor inclui os termos `is.null` certos.
+"""
+import base64
+import json
+
+from fastapi import HTTPException, status
+
+from backend.services.queries import PAGE_SIZE
+
+# Limite máximo aceito em `?limit=`; acima disso o PostgREST cortaria em max-rows
+MAX_LIMIT = PAGE_SIZE
+
+
+def parse_sort(sort: str | None, permitidos: set[str], padrao: str, desempate: str = "id") -> list[tuple[str, bool]]:
+    """
+    Converte `?sort=campo` / `?sort=-campo` (decrescente) numa lista
+    [(coluna, desc), (desempate, desc)] validada contra `permitidos`.
+    `desempate` é a chave única da tabela/view (normalmente `id`).
+    """
+    campo = sort or padrao
+    desc = campo.startswith("-")
+    coluna = campo.lstrip("-")
+    if coluna not in permitidos and coluna != desempate:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ordenação inválida. Use: {sorted(permitidos)} (prefixo '-' para decrescente)",
+        )
+    ordem = [(coluna, desc)]
+    if coluna != desempate:
+        ordem.append((desempate, desc))
+    return ordem
+
+
+def aplicar_ordem(q, ordem: list[tuple[str, bool]]):
+    for coluna, desc in ordem:
+        q = q.order(coluna, desc=desc, nullsfirst=desc)
+    return q
+
+
+def encode_cursor(ordem: list[tuple[str, bool]], linha: dict) -> str:
+    payload = {"o": [[c, d] for c, d in ordem], "v": [linha.get(c) for c, _ in ordem]}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, ordem: list[tuple[str, bool]]) -> list:
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(bruto)
+        valido = [tuple(o) for o in payload["o"]] == ordem and len(payload["v"]) == len(ordem)
+    except (ValueError, KeyError, TypeError):
+        valido = False
+    if not valido:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido para esta ordenação")
+    return payload["v"]
+
+
+def _literal(valor) -> str:
+    # Valores entre aspas duplas: datas e timestamps contêm ':' e '.', que são
+    # separadores na sintaxe de filtros lógicos do PostgREST
+    texto = str(valor).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{texto}"'
+
+
+def _igual(coluna: str, valor) -> str:
+    return f"{coluna}.is.null" if valor is None else f"{coluna}.eq.{_literal(valor)}"
+
+
+def _depois(coluna: str, desc: bool, valor, anulavel: bool = True) -> list[str]:
+    """Condições para `coluna` vir depois de `valor` (NULL é o maior valor)"""
+    if valor is None:
+        # Crescente: NULL é o último, nada vem depois; decrescente: vêm todos os não nulos
+        return [f"{coluna}.not.is.null"] if desc else []
+    if desc:
+        return [f"{coluna}.lt.{_literal(valor)}"]
+    return [f"{coluna}.gt.{_literal(valor)}"] + ([f"{coluna}.is.null"] if anulavel else [])
+
+
+def filtro_keyset(ordem: list[tuple[str, bool]], valores: list) -> str:
+    """
+    Monta o `or=(...)` equivalente a "(c1, c2, ...) vem depois de (v1, v2, ...)"
+    respeitando a direção de cada coluna e os NULLs.
+    """
+    termos = []
+    for i, (coluna, desc) in enumerate(ordem):
+        iguais = [_igual(c, v) for (c, _), v in zip(ordem[:i], valores[:i])]
+        # A última coluna é o desempate (chave única, nunca NULL)
+        for depois in _depois(coluna, desc, valores[i], anulavel=i < len(ordem) - 1):
+            termos.append(f"and({','.join(iguais + [depois])})" if iguais else depois)
+    return ",".join(termos)
+
+
+async def paginar(q, ordem: list[tuple[str, bool]], limit: int, cursor: str | None = None) -> dict:
+    """
+    Executa uma página da consulta `q` (já filtrada, sem ordenação).
+
+    Retorna `{"items": [...], "next_cursor": str | None}`; `next_cursor` é
+    None na última página. Pede `limit + 1` linhas para saber se há mais.
+    """
+    q = aplicar_ordem(q, ordem)
+    if cursor:
+        q = q.or_(filtro_keyset(ordem, decode_cursor(cursor, ordem)))
+    linhas = (await q.limit(limit + 1).execute()).data
+    items = linhas[:limit]
+    next_cursor = encode_cursor(ordem, items[-1]) if len(linhas) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def chave_ordem(valor) -> tuple:
+    """Chave de `sort` com NULL depois de qualquer valor, como em `aplicar_ordem`"""
+    return (valor is None, valor)
+
+
+def paginar_lista(linhas: list[dict], ordem: list[tuple[str, bool]], limit: int, cursor: str | None = None) -> dict:
+    """
+    Mesmo contrato (e cursor) de `paginar` para linhas já em memória — usado
+    pelas rotas que calculam o resultado na API quando a view não existe.
+    """
+    for coluna, desc in reversed(ordem):
+        linhas = sorted(linhas, key=lambda l: chave_ordem(l[coluna]), reverse=desc)
+    if cursor:
+        valores = decode_cursor(cursor, ordem)
+
+        def depois(linha: dict) -> bool:
+            for (coluna, desc), valor in zip(ordem, valores):
+                if linha[coluna] != valor:
+                    return chave_ordem(linha[coluna]) < chave_ordem(valor) if desc else chave_ordem(linha[coluna]) > chave_ordem(valor)
+            return False
+
+        linhas = [l for l in linhas if depois(l)]
+    items = linhas[:limit]
+    next_cursor = encode_cursor(ordem, items[-1]) if len(linhas) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,315 @@
+"""
+Cronograma de cobrança de um faturamento (entrada + parcelas)
+
+Cálculo puro, sem acesso ao banco: a rota monta o cronograma e o envia pronto
+para a função SQL que grava tudo numa transação só. Os valores são divididos em
+centavos (backend/services/dinheiro.py): entrada + parcelas somam exatamente o
+valor final, com o resto da divisão na última parcela.
+
+O mesmo motor (primeiro vencimento, datas, divisão) gera o cronograma gravado
+por criar/setup de faturamento e as opções do simulador (`simular_planos`).
+"""
+from datetime import date, datetime
+from uuid import uuid4
+
+from dateutil.relativedelta import relativedelta
+
+from backend.services.dinheiro import centavos, distribuir_centavos, dividir_resto_na_ultima, percentual, reais, somar
+
+
+def redistribuir_residual(pendentes: list[dict], residual_centavos: int) -> list[dict]:
+    """
+    Soma o residual (em centavos) de um pagamento parcial às parcelas `pendentes`
+    (já ordenadas por vencimento), sem perder nem criar centavo no arredondamento.
+    Retorna as linhas com o novo `valor`.
+    """
+    partes = distribuir_centavos(residual_centavos, len(pendentes))
+    return [
+        {**p, "valor": reais(centavos(p["valor"]) + parte)}
+        for p, parte in zip(pendentes, partes)
+    ]
+
+
+def primeiro_vencimento(hoje: date, numero_parcelas: int, data_vencimento_primeira=None) -> date:
+    """Data informada; sem ela, o mês que vem (ou hoje, se for uma parcela só)"""
+    if data_vencimento_primeira:
+        return datetime.fromisoformat(str(data_vencimento_primeira)).date()
+    return hoje if numero_parcelas == 1 else hoje + relativedelta(months=1)
+
+
+def vencimentos(data_base: date, qtd: int) -> list[str]:
+    """Vencimentos mensais a partir de `data_base` (dia 31 cai no último dia dos meses curtos)"""
+    return [(data_base + relativedelta(months=i)).isoformat() for i in range(qtd)]
+
+
+def gerar_cronograma(
+    *,
+    descricao: str,
+    valor_final: float,
+    metodo_pagamento: str,
+    valor_entrada: float = 0.0,
+    numero_parcelas: int = 1,
+    data_vencimento_primeira: str | None = None,
+    taxa_porcentagem_entrada: float = 0.0,
+    taxa_valor_entrada: float = 0.0,
+    hoje: date | None = None,
+) -> dict:
+    """
+    Retorna `{"transacoes": [...], "taxa_entrada": {...} | None, "status": str}`.
+
+    As transações não trazem `categoria_id` nem `faturamento_id`: quem grava
+    resolve os dois. `taxa_entrada` é a despesa de Taxa de Operadora da entrada
+    (quando houve taxa na maquininha) e `status` é o status inicial do faturamento.
+    """
+    hoje = hoje or datetime.now().date()
+    entrada = centavos(valor_entrada)
+    a_parcelar = centavos(valor_final) - entrada
+    numero_parcelas = numero_parcelas if numero_parcelas > 0 else 1
+
+    transacoes = []
+    taxa_entrada = None
+    if entrada > 0:
+        transacoes.append({
+            "descricao": f"Entrada (À Vista) - {descricao}",
+            "valor": reais(entrada),
+            "taxa_porcentagem": taxa_porcentagem_entrada,
+            "taxa_valor": taxa_valor_entrada,
+            "data_vencimento": hoje.isoformat(),
+            "data_pagamento": hoje.isoformat(),
+            "conta_destino": "CLINICA",
+            "status": "PAGO",
+            "metodo_pagamento": metodo_pagamento,
+        })
+        # Se teve taxa na operadora, gerar a despesa correspondente (igual ao 'Dar Baixa')
+        if taxa_valor_entrada and taxa_valor_entrada > 0:
+            taxa_entrada = {
+                "descricao": f"Taxa de Operadora ({metodo_pagamento}) — Entrada",
+                "valor": reais(centavos(taxa_valor_entrada)),
+                "data_vencimento": hoje.isoformat(),
+                "data_pagamento": hoje.isoformat(),
+                "metodo_pagamento": metodo_pagamento,
+            }
+
+    # Se não houver saldo a parcelar (pagou tudo na entrada), não gera parcelas extras
+    if a_parcelar > 0:
+        datas = vencimentos(primeiro_vencimento(hoje, numero_parcelas, data_vencimento_primeira), numero_parcelas)
+        for i, (parcela, vencimento) in enumerate(zip(dividir_resto_na_ultima(a_parcelar, numero_parcelas), datas)):
+            transacoes.append({
+                "descricao": f"Parcela {i+1}/{numero_parcelas} - {descricao}",
+                "valor": reais(parcela),
+                "data_vencimento": vencimento,
+                "data_pagamento": None,
+                "conta_destino": None,
+                "status": "PENDENTE",
+            })
+
+    if a_parcelar == 0 and entrada > 0:
+        status_global = "QUITADO"
+    elif entrada > 0:
+        status_global = "PAGO_PARCIAL"
+    else:
+        status_global = "ABERTO"  # Aceitando faturamento zerado/100% aberto
+
+    return {"transacoes": transacoes, "taxa_entrada": taxa_entrada, "status": status_global}
+
+
+# Colunas de fin_transacoes que o cronograma define, com o valor padrão da tabela
+CAMPOS_CRONOGRAMA = {
+    "categoria_id": None, "descricao": None, "valor": 0.0, "data_vencimento": None, "data_pagamento": None,
+    "conta_origem": None, "conta_destino": None, "status": "PENDENTE", "metodo_pagamento": None,
+    "taxa_porcentagem": 0.0, "taxa_valor": 0.0,
+}
+
+
+class ConflitoPagamento(ValueError):
+    """O cronograma novo apagaria ou mudaria dinheiro que já foi recebido"""
+
+
+def _mesmo_valor(campo: str, atual, desejado) -> bool:
+    if campo in ("valor", "taxa_porcentagem", "taxa_valor"):
+        return centavos(atual or 0) == centavos(desejado or 0)
+    if campo in ("data_vencimento", "data_pagamento"):
+        return (str(atual)[:10] if atual else None) == (str(desejado)[:10] if desejado else None)
+    return atual == desejado
+
+
+def _e_entrada(t: dict) -> bool:
+    return (t.get("descricao") or "").startswith("Entrada")
+
+
+def _e_taxa_entrada(t: dict) -> bool:
+    """Despesa de Taxa de Operadora da entrada, gerada pelo cronograma (`taxa_entrada`)"""
+    descricao = t.get("descricao") or ""
+    return descricao.startswith("Taxa de Operadora") and descricao.endswith("— Entrada")
+
+
+def _e_parcela(t: dict) -> bool:
+    return not _e_entrada(t) and "Taxa de Operadora" not in (t.get("descricao") or "")
+
+
+def _paga(t: dict | None) -> bool:
+    return bool(t) and t.get("status") == "PAGO"
+
+
+def _manter_pagas(pares: list[tuple]) -> list[tuple]:
+    """
+    Parcelas pareadas que já foram PAGAS ficam como estão (valor, datas, baixa); o
+    que o plano novo cobra em parcelas, menos o que já foi pago nelas, é dividido
+    entre as parcelas em aberto, com o resto na última.
+    """
+    if not any(_paga(atual) for atual, nova in pares if nova is not None):
+        return pares
+    novas = [nova for _, nova in pares if nova is not None]
+    pagas = [atual for atual, nova in pares if nova is not None and _paga(atual)]
+    abertas = len(novas) - len(pagas)
+    saldo = somar(n["valor"] for n in novas) - somar(a["valor"] for a in pagas)
+    if saldo < abertas or (not abertas and saldo):
+        raise ConflitoPagamento(
+            f"as parcelas já pagas somam R$ {reais(somar(a['valor'] for a in pagas)):.2f}; "
+            "o novo plano não fecha com esse valor"
+        )
+    valores = iter(dividir_resto_na_ultima(saldo, abertas) if abertas else [])
+    ajustados = []
+    for atual, nova in pares:
+        if nova is not None:
+            if _paga(atual):
+                nova = {**atual, "faturamento_id": nova["faturamento_id"]}
+            else:
+                nova = {**nova, "valor": reais(next(valores))}
+        ajustados.append((atual, nova))
+    return ajustados
+
+
+def diferenca_cronograma(existentes: list[dict], desejadas: list[dict]) -> dict:
+    """
+    Compara o cronograma desejado (`gerar_cronograma(...)["transacoes"]` e a
+    despesa `taxa_entrada`, com categoria_id e faturamento_id) com as transações
+    já gravadas do faturamento.
+
+    A entrada é pareada com a entrada, a taxa da entrada com a taxa da entrada e
+    as parcelas, na ordem, com as parcelas existentes (por vencimento). Linhas
+    pareadas e iguais não são tocadas; as diferentes são regravadas com o mesmo
+    id; as que faltam ganham id novo; as que sobram são removidas. As taxas das
+    baixas de parcela não pertencem ao cronograma e ficam fora da comparação.
+
+    Entrada e taxa da entrada seguem o cronograma, mas mantêm as datas em que
+    foram pagas. Uma parcela já PAGA não é tocada: as em aberto dividem o que
+    falta (`_manter_pagas`). Uma entrada ou parcela PAGA que sobraria, ou pagas
+    que não fecham com o novo plano, levantam `ConflitoPagamento`.
+
+    Retorna `{"gravar": [...], "remover": [ids], "datas": [...]}` — `gravar` com
+    as mesmas colunas em todas as linhas (um upsert só) e `datas` com os
+    vencimentos tocados, antigos e novos.
+    """
+    ordem = lambda t: (str(t.get("data_vencimento")), t.get("descricao") or "", str(t["id"]))
+    pares = []
+    for grupo in (_e_entrada, _e_taxa_entrada, _e_parcela):
+        antigas = sorted((t for t in existentes if grupo(t)), key=ordem)
+        novas = [t for t in desejadas if grupo(t)]
+        pares_grupo = [(antigas[i] if i < len(antigas) else None, nova) for i, nova in enumerate(novas)]
+        pares_grupo += [(antiga, None) for antiga in antigas[len(novas):]]
+        pares += _manter_pagas(pares_grupo) if grupo is _e_parcela else pares_grupo
+
+    gravar, remover, datas = [], [], []
+    for atual, nova in pares:
+        if nova is None:
+            if _paga(atual) and not _e_taxa_entrada(atual):
+                raise ConflitoPagamento(
+                    f"'{atual.get('descricao')}' já foi paga e não cabe no novo cronograma"
+                )
+            remover.append(atual["id"])
+            datas.append(atual["data_vencimento"])
+            continue
+        # Colunas que o motor não define para esta linha ficam como estão (ou com o padrão, se nova)
+        linha = {c: (atual.get(c) if atual else padrao) for c, padrao in CAMPOS_CRONOGRAMA.items()}
+        linha.update({c: v for c, v in nova.items() if c in CAMPOS_CRONOGRAMA})
+        if _paga(atual) and nova.get("status") == "PAGO":
+            # Entrada e sua taxa: pagas no dia em que foram lançadas, não no dia em que o plano é salvo de novo
+            linha["data_vencimento"] = atual.get("data_vencimento")
+            linha["data_pagamento"] = atual.get("data_pagamento")
+        if atual and all(_mesmo_valor(c, atual.get(c), linha[c]) for c in CAMPOS_CRONOGRAMA):
+            continue
+        gravar.append({"id": atual["id"] if atual else str(uuid4()), "faturamento_id": nova["faturamento_id"], **linha})
+        datas.append(linha["data_vencimento"])
+        if atual:
+            datas.append(atual["data_vencimento"])
+    return {"gravar": gravar, "remover": remover, "datas": datas}
+
+
+def taxas_por_metodo(formas: list[dict]) -> dict[str, float]:
+    """
+    Taxa padrão (%) por forma de pagamento, pelo nome ou pelo tipo (PIX, CREDITO...);
+    o nome prevalece e formas com o mesmo tipo ficam com a maior taxa.
+    """
+    taxas: dict[str, float] = {}
+    for f in formas:
+        taxas[f["tipo"]] = max(taxas.get(f["tipo"], 0.0), f.get("taxa_padrao_porcentagem") or 0.0)
+    for f in formas:
+        taxas[f["nome"]] = f.get("taxa_padrao_porcentagem") or 0.0
+    return taxas
+
+
+def simular_planos(valor_final: float, cenarios: list[dict], taxas: dict[str, float], hoje: date | None = None) -> list[dict]:
+    """
+    Um plano de pagamento por cenário, sem gravar nada. Cada cenário traz
+    `numero_parcelas` e, opcionais, `valor_entrada`, `forma_pagamento` /
+    `forma_entrada` (nome ou tipo em `taxas`), `taxa_porcentagem` /
+    `taxa_porcentagem_entrada` (sobrepõem a taxa da forma) e `data_vencimento_primeira`.
+
+    Tudo em centavos, numa passada: os vencimentos de cada data base são
+    calculados uma vez, para o maior número de parcelas pedido, e reaproveitados.
+    Levanta ValueError (com o índice do cenário) se a entrada passar do total
+    ou a forma de pagamento não existir.
+    """
+    hoje = hoje or datetime.now().date()
+    total = centavos(valor_final)
+    maximo = max((c["numero_parcelas"] for c in cenarios), default=1)
+    datas_por_base: dict[date, list[str]] = {}
+
+    def taxa_de(i: int, explicita, forma) -> float:
+        if explicita is not None:
+            return explicita
+        if forma is None:
+            return 0.0
+        if forma not in taxas:
+            raise ValueError(f"cenário {i}: forma de pagamento desconhecida: {forma}")
+        return taxas[forma]
+
+    planos = []
+    for i, c in enumerate(cenarios):
+        numero_parcelas = c["numero_parcelas"] if c["numero_parcelas"] > 0 else 1
+        entrada = centavos(c.get("valor_entrada") or 0)
+        if entrada > total:
+            raise ValueError(f"cenário {i}: entrada maior que o valor final")
+        taxa_parcelas = taxa_de(i, c.get("taxa_porcentagem"), c.get("forma_pagamento"))
+        taxa_entrada = taxa_de(i, c.get("taxa_porcentagem_entrada"), c.get("forma_entrada"))
+
+        parcelas = []
+        a_parcelar = total - entrada
+        if a_parcelar > 0:
+            base = primeiro_vencimento(hoje, numero_parcelas, c.get("data_vencimento_primeira"))
+            datas = datas_por_base.get(base)
+            if datas is None:
+                datas = datas_por_base[base] = vencimentos(base, maximo)
+            for n, (valor, vencimento) in enumerate(zip(dividir_resto_na_ultima(a_parcelar, numero_parcelas), datas), start=1):
+                taxa = percentual(valor, taxa_parcelas)
+                parcelas.append({"numero": n, "valor": valor, "taxa": taxa, "liquido": valor - taxa, "data_vencimento": vencimento})
+
+        taxa_sobre_entrada = percentual(entrada, taxa_entrada)
+        taxas_total = taxa_sobre_entrada + sum(p["taxa"] for p in parcelas)
+        planos.append({
+            "numero_parcelas": numero_parcelas,
+            "forma_pagamento": c.get("forma_pagamento"),
+            "forma_entrada": c.get("forma_entrada"),
+            "taxa_porcentagem": taxa_parcelas,
+            "taxa_porcentagem_entrada": taxa_entrada,
+            "valor_entrada": reais(entrada),
+            "taxa_entrada": reais(taxa_sobre_entrada),
+            "valor_parcela": reais(parcelas[0]["valor"]) if parcelas else 0.0,
+            "ultima_parcela": reais(parcelas[-1]["valor"]) if parcelas else 0.0,
+            "parcelas": [{**p, "valor": reais(p["valor"]), "taxa": reais(p["taxa"]), "liquido": reais(p["liquido"])} for p in parcelas],
+            "total": reais(total),
+            "taxas": reais(taxas_total),
+            "liquido": reais(total - taxas_total),
+        })
+    return planos
@@ -0,0 +1,59 @@
+"""
+Projeção de campos (`?fields=` / `?include=`) para as rotas de leitura
+
+Cada rota declara as colunas que podem ser pedidas e os recursos relacionados
+(embeds do PostgREST) que sabe montar. O cliente escolhe o subconjunto e a
+rota pede ao PostgREST só isso — payload e serialização passam a acompanhar o
+que a tela de fato mostra.
+
+Sem `fields` nem `include` o select continua o mesmo de antes (todas as
+colunas e todos os embeds), para não quebrar quem já consome as rotas.
+"""
+from fastapi import HTTPException, status
+
+
+def _lista(valor: str) -> list[str]:
+    return [p.strip() for p in valor.split(",") if p.strip()]
+
+
+def montar_select(
+    fields: str | None,
+    include: str | None,
+    colunas: set[str],
+    embeds: dict[str, str],
+    obrigatorias: tuple[str, ...] = ("id",),
+) -> str:
+    """
+    Monta a string de `select` do PostgREST.
+
+    - `fields`: colunas separadas por vírgula, validadas contra `colunas`;
+      ausente → `*`. As `obrigatorias` (id, coluna de ordenação do cursor,
+      colunas usadas em filtros da rota) entram sempre.
+    - `include`: nomes de `embeds` separados por vírgula; vazio → nenhum.
+      Ausente → todos os embeds se `fields` também estiver ausente, nenhum
+      caso contrário (quem já está estreitando as colunas pede os embeds que usa).
+    """
+    if fields is None:
+        partes = ["*"]
+    else:
+        pedidas = _lista(fields)
+        invalidas = [c for c in pedidas if c not in colunas]
+        if invalidas:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Campos inválidos: {invalidas}. Permitidos: {sorted(colunas)}",
+            )
+        partes = list(dict.fromkeys([*obrigatorias, *pedidas]))
+
+    if include is None:
+        nomes = list(embeds) if fields is None else []
+    else:
+        nomes = _lista(include)
+        invalidos = [n for n in nomes if n not in embeds]
+        if invalidos:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Include inválido: {invalidos}. Permitidos: {sorted(embeds)}",
+            )
+    partes += [embeds[n] for n in dict.fromkeys(nomes)]
+    return ", ".join(partes)
@@ -0,0 +1,107 @@
+"""
+Utilitários de consulta ao PostgREST compartilhados pelas rotas
+"""
+import asyncio
+
+from postgrest.exceptions import APIError
+
+
+async def gather_queries(*queries) -> list[list]:
+    """
+    Executa consultas PostgREST independentes em paralelo.
+
+    Recebe builders ainda não executados (ex.: `sb.table("x").select("*")`) e
+    devolve o `.data` de cada um, na mesma ordem. A latência total passa a ser
+    a da consulta mais lenta, e não a soma de todas.
+    """
+    respostas = await asyncio.gather(*(q.execute() for q in queries))
+    return [r.data for r in respostas]
+
+
+# Igual ao max-rows padrão do Supabase: páginas maiores seriam truncadas em
+# silêncio pelo servidor e o iterador pararia antes do fim.
+PAGE_SIZE = 1000
+
+
+async def iter_chunks(build, chunk_size: int = PAGE_SIZE, key: str | None = None):
+    """
+    Percorre uma consulta em blocos de no máximo `chunk_size` linhas.
+
+    `build` é uma função sem argumentos que devolve um builder novo a cada
+    chamada (os builders do postgrest acumulam parâmetros, então não podem
+    ser reaproveitados entre páginas).
+
+    - `key=None`: paginação por offset/limit; o builder deve ter uma ordenação
+      total (ex.: `.order("nome").order("id")`) para as páginas não se
+      sobreporem.
+    - `key="id"` (ou outra coluna única e ordenável): paginação keyset com
+      `key > último visto`; o builder não deve ordenar, e `key` precisa estar
+      no select. Não degrada com o avanço das páginas como o offset.
+    """
+    inicio = 0
+    ultimo = None
+    while True:
+        if key is None:
+            q = build().range(inicio, inicio + chunk_size - 1)
+        else:
+            q = build().order(key).limit(chunk_size)
+            if ultimo is not None:
+                q = q.gt(key, ultimo)
+
+        pagina = (await q.execute()).data
+        if pagina:
+            yield pagina
+        if len(pagina) < chunk_size:
+            return
+
+        inicio += chunk_size
+        if key is not None:
+            ultimo = pagina[-1][key]
+
+
+async def iter_rows(build, chunk_size: int = PAGE_SIZE, key: str | None = None):
+    """Como `iter_chunks`, mas entrega uma linha por vez"""
+    async for pagina in iter_chunks(build, chunk_size, key):
+        for row in pagina:
+            yield row
+
+
+async def fetch_all(build, chunk_size: int = PAGE_SIZE, key: str | None = None) -> list:
+    """Materializa todas as páginas de `iter_chunks` (para rotas que devolvem a lista completa)"""
+    dados = []
+    async for pagina in iter_chunks(build, chunk_size, key):
+        dados.extend(pagina)
+    return dados
+
+
+# Códigos de "objeto não existe": tabela/view (42P01, PGRST205), função (42883,
+# PGRST202) ou relacionamento para embed (PGRST200). Usados pelas rotas que leem
+# views/RPCs versionadas e recorrem ao cálculo em Python enquanto o SQL não foi
+# aplicado no banco. Coluna inexistente (42703) fica de fora: quase sempre é erro
+# de digitação ou projeção, e deve aparecer — ver `coluna_inexistente`.
+_CODIGOS_INEXISTENTE = {"42P01", "42883", "PGRST200", "PGRST202", "PGRST205"}
+
+
+def objeto_inexistente(erro: APIError) -> bool:
+    return erro.code in _CODIGOS_INEXISTENTE
+
+
+def coluna_inexistente(erro: APIError, coluna: str) -> bool:
+    """A coluna `coluna`, criada por uma migração versionada, ainda não existe no banco"""
+    return erro.code == "42703" and coluna in (erro.message or "")
+
+
+async def chamar_rpc(sb, nome: str, params: dict, alternativa):
+    """
+    Chama a função SQL `nome` via /rpc e devolve o `.data`: a escrita inteira numa
+    transação, num round-trip só. Enquanto a migração que cria a função não tiver
+    sido aplicada no banco, devolve `await alternativa()` — o caminho antigo,
+    chamada a chamada, que não é atômico (um erro no meio deixa a escrita pela
+    metade) nem protegido contra chamadas simultâneas.
+    """
+    try:
+        return (await sb.rpc(nome, params).execute()).data
+    except APIError as e:
+        if not objeto_inexistente(e):
+            raise
+    return await alternativa()
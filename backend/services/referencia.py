@@ -0,0 +1,37 @@
+"""
+Consultas a dados de referência que passam pelo cache em memória
+"""
+from backend.config.supabase_client import get_supabase_async
+from backend.services.cache import cache_referencia
+
+
+async def categoria_id(nome: str, criar: dict | None = None) -> int | None:
+    """
+    Id da categoria financeira pelo nome ("Atendimento Clínico", "Taxa de Operadora"...).
+
+    Se não existir e `criar` for informado (tipo/escopo), cria a categoria e
+    invalida o cache de `fin_categorias`.
+    """
+    sb = get_supabase_async()
+
+    async def carregar():
+        res = await sb.table("fin_categorias").select("id").eq("nome", nome).execute()
+        return res.data[0]["id"] if res.data else None
+
+    cat_id = await cache_referencia.obter(("fin_categorias", "id_por_nome", nome), carregar)
+    if cat_id is None and criar is not None:
+        nova = await sb.table("fin_categorias").insert({"nome": nome, "ativo": True, **criar}).execute()
+        cat_id = nova.data[0]["id"] if nova.data else None
+        cache_referencia.invalidar("fin_categorias")
+    return cat_id
+
+
+async def consulta_cacheada(chave: tuple, consulta) -> list:
+    """
+    Executa `consulta` (builder do PostgREST) passando pelo cache.
+    `chave[0]` deve ser a tabela consultada, para que a invalidação a alcance.
+    """
+    async def carregar():
+        return (await consulta.execute()).data
+
+    return await cache_referencia.obter(chave, carregar)
@@ -0,0 +1,97 @@
+"""
+Motor de agregação do resumo financeiro por paciente (`/faturamentos/resumo-clientes`)
+
+Recebe as linhas já compactadas de faturamentos e agendamentos e agrupa por
+paciente em uma passada sobre cada conjunto, com índices em dict/set — em vez
+de varrer as listas inteiras para cada paciente.
+
+As linhas compactadas guardam os valores em centavos inteiros (ver
+backend/services/dinheiro.py); as somas são exatas e só o resumo final volta
+para reais.
+"""
+from backend.services.dinheiro import centavos, reais
+
+STATUS_AGENDAMENTO_A_FATURAR = ["agendado", "confirmado", "em_atendimento", "concluido"]
+
+
+def soma_transacoes(txs: list, status_tx: str) -> int:
+    """Soma, em centavos, as transações no status informado, ignorando as despesas de Taxa de Operadora"""
+    return sum(centavos(t["valor"]) for t in txs if t["status"] == status_tx and "Taxa de Operadora" not in (t.get("descricao") or ""))
+
+
+def compactar_faturamento(f: dict) -> dict:
+    """Reduz um faturamento (com `fin_transacoes` aninhadas) ao que o resumo usa, em centavos"""
+    txs = f.get("fin_transacoes", []) or []
+    pago = soma_transacoes(txs, "PAGO")
+    pend = soma_transacoes(txs, "PENDENTE")
+    return {
+        "paciente_id": f["paciente_id"],
+        "status": f["status"],
+        "agendamento_id": f.get("agendamento_id"),
+        "valor_final": pago + pend if txs else centavos(f["valor_final"]),
+        "pendente": pend,
+    }
+
+
+def compactar_agendamento(ag: dict) -> dict:
+    """Reduz um agendamento ao valor padrão somado dos seus procedimentos, em centavos"""
+    valor = 0
+    for ap in ag.get("agendamento_procedimentos", []) or []:
+        if ap and ap.get("procedimentos") and ap["procedimentos"].get("valor_padrao"):
+            valor += centavos(ap["procedimentos"]["valor_padrao"])
+    return {"id": ag["id"], "paciente_id": ag["paciente_id"], "valor": valor}
+
+
+def status_financeiro(total_pendente: float, total_a_faturar: float) -> str:
+    if total_pendente > 0:
+        return "PENDENTE"
+    if total_a_faturar > 0:
+        return "A_FATURAR"
+    return "EM_DIA"
+
+
+def resumir_clientes(pacientes: list[dict], faturamentos: list[dict], agendamentos: list[dict]) -> list[dict]:
+    """
+    Monta uma linha de resumo por paciente, na ordem de `pacientes`.
+
+    O(P + F + A): uma passada em cada lista. As somas de cada paciente são
+    feitas em centavos inteiros, então não dependem da ordem das linhas, e os
+    totais saem em reais.
+    """
+    # Agendamentos que já viraram faturamento (inclusive cancelados) não entram no "a faturar"
+    agendamentos_faturados = {f["agendamento_id"] for f in faturamentos if f.get("agendamento_id")}
+
+    # paciente_id -> [total_faturado, total_pendente, qtd_faturamentos]
+    por_paciente: dict[str, list] = {}
+    for f in faturamentos:
+        if f["status"] == "CANCELADO":
+            continue
+        acc = por_paciente.get(f["paciente_id"])
+        if acc is None:
+            acc = por_paciente[f["paciente_id"]] = [0, 0, 0]
+        acc[0] += f["valor_final"]
+        acc[1] += f["pendente"]
+        acc[2] += 1
+
+    a_faturar: dict[str, int] = {}
+    for ag in agendamentos:
+        if ag["id"] not in agendamentos_faturados:
+            a_faturar[ag["paciente_id"]] = a_faturar.get(ag["paciente_id"], 0) + ag["valor"]
+
+    vazio = (0, 0, 0)
+    resumo = []
+    for p in pacientes:
+        total_faturado, total_pendente, qtd = por_paciente.get(p["id"], vazio)
+        total_a_faturar = a_faturar.get(p["id"], 0)
+        resumo.append({
+            "paciente_id": p["id"],
+            "nome": p["nome"],
+            "cpf": p["cpf"],
+            "telefone": p["telefone"],
+            "total_faturado": reais(total_faturado),
+            "total_pendente": reais(total_pendente),
+            "total_a_faturar": reais(total_a_faturar),
+            "qtd_faturamentos": qtd,
+            "status_financeiro": status_financeiro(total_pendente, total_a_faturar),
+        })
+    return resumo
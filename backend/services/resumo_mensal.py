@@ -0,0 +1,94 @@
+"""
+Leitura do financeiro agrupado por mês (dashboard e série histórica)
+
+Lê o rollup `fin_resumo_mensal` (database/resumo_mensal_v1.sql): algumas
+linhas por mês, já somadas, com o mesmo formato que o `AgregadorKPI` espera
+(`valor`, `status`, contas e `fin_categorias`). Enquanto o rollup não existir
+no banco, cai para as transações do período, agrupadas aqui.
+
+O resultado do dashboard de cada mês fica em `cache_dashboard`; quem grava em
+fin_transacoes chama `descartar_meses` com as datas de vencimento que tocou.
+"""
+from postgrest.exceptions import APIError
+
+from backend.services.cache import cache_dashboard
+from backend.services.queries import fetch_all, objeto_inexistente
+
+Mes = tuple[int, int]  # (ano, mes)
+
+
+def somar_meses(periodo: Mes, meses: int) -> Mes:
+    ano, mes = periodo
+    total = ano * 12 + (mes - 1) + meses
+    return total // 12, total % 12 + 1
+
+
+def meses_entre(inicio: Mes, fim: Mes) -> list[Mes]:
+    """Meses de `inicio` a `fim`, inclusive"""
+    qtd = (fim[0] * 12 + fim[1]) - (inicio[0] * 12 + inicio[1]) + 1
+    return [somar_meses(inicio, i) for i in range(qtd)]
+
+
+def mes_da_data(data) -> Mes | None:
+    """(ano, mes) de uma data, `date` ou texto AAAA-MM[-DD]; None se vazia"""
+    if not data:
+        return None
+    texto = str(data)
+    return int(texto[:4]), int(texto[5:7])
+
+
+def descartar_meses(*datas):
+    """Descarta do cache do dashboard os meses das datas de vencimento informadas"""
+    meses = {m for m in map(mes_da_data, datas) if m}
+    cache_dashboard.descartar(*(("dashboard", ano, mes) for ano, mes in meses))
+
+
+def descartar_dashboard():
+    """Descarta todos os meses (escritas que não sabem quais meses tocaram)"""
+    cache_dashboard.invalidar("dashboard")
+
+
+def filtro_meses(inicio: Mes, fim: Mes) -> str:
+    """Filtro PostgREST (`or`) das linhas com (ano, mes) de `inicio` a `fim`, inclusive"""
+    (ano_ini, mes_ini), (ano_fim, mes_fim) = inicio, fim
+    if ano_ini == ano_fim:
+        return f"and(ano.eq.{ano_ini},mes.gte.{mes_ini},mes.lte.{mes_fim})"
+    return (
+        f"and(ano.eq.{ano_ini},mes.gte.{mes_ini}),"
+        f"and(ano.gt.{ano_ini},ano.lt.{ano_fim}),"
+        f"and(ano.eq.{ano_fim},mes.lte.{mes_fim})"
+    )
+
+
+async def linhas_por_mes(sb, inicio: Mes, fim: Mes) -> dict[Mes, list[dict]]:
+    """
+    Linhas de cada mês entre `inicio` e `fim` (inclusive), prontas para o `AgregadorKPI`.
+    Cada linha traz `qtd` (quantas transações ela resume).
+    """
+    meses = {m: [] for m in meses_entre(inicio, fim)}
+    try:
+        linhas = await fetch_all(
+            lambda: sb.table("fin_resumo_mensal")
+            .select("ano, mes, conta_origem, conta_destino, status, valor:total, qtd, fin_categorias(tipo, escopo)")
+            .gte("ano", inicio[0]).lte("ano", fim[0]).or_(filtro_meses(inicio, fim))
+            .order("ano").order("mes").order("categoria_id").order("conta_origem").order("conta_destino").order("status")
+        )
+        for linha in linhas:
+            chave = (linha["ano"], linha["mes"])
+            if chave in meses:
+                meses[chave].append(linha)
+        return meses
+    except APIError as e:
+        if not objeto_inexistente(e):
+            raise
+
+    # Sem o rollup: todas as transações do período
+    prox = somar_meses(fim, 1)
+    txs = await fetch_all(
+        lambda: sb.table("fin_transacoes").select("valor, data_vencimento, conta_origem, conta_destino, status, fin_categorias(tipo, escopo), id")
+        .gte("data_vencimento", f"{inicio[0]}-{inicio[1]:02d}-01").lt("data_vencimento", f"{prox[0]}-{prox[1]:02d}-01"),
+        key="id",
+    )
+    for t in txs:
+        meses[mes_da_data(t["data_vencimento"])].append({**t, "qtd": 1})
+    return meses
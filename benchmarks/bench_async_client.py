@@ -0,0 +1,105 @@
+"""
+Benchmark: rotas síncronas (threadpool) x rotas async sobre o pool compartilhado.
+
+Monta mini-APIs equivalentes — uma com `def` + FakeSupabaseClient (como as
+rotas eram antes) e outras com `async def` + FakeAsyncSupabaseClient, sobre um
+`httpx.AsyncClient` com `httpx.Limits` simples e sobre o pool fragmentado
+padrão (`_PoolFragmentado`) — e dispara requisições concorrentes contra cada uma. Cada requisição faz `--consultas`
+round-trips sequenciais ao stand-in local do PostgREST, que responde após
+`--latencia-ms` (simulando a WAN até o Supabase).
+
+Uso:
+    python -m benchmarks.bench_async_client --requisicoes 2000 --concorrencia 200
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from backend.config.settings import get_settings
+from backend.config.supabase_client import FakeSupabaseClient, FakeAsyncSupabaseClient
+from benchmarks.postgrest_standin import PostgrestStandin
+
+
+def _app_sincrona(url: str, consultas: int) -> FastAPI:
+    app = FastAPI()
+    sb = FakeSupabaseClient(url, "bench")
+
+    @app.get("/pacientes")
+    def listar():
+        dados = []
+        for _ in range(consultas):
+            dados = sb.table("pacientes").select("*").order("nome").execute().data
+        return dados
+
+    return app
+
+
+def _app_async(url: str, consultas: int, http_client: httpx.AsyncClient | None = None) -> tuple[FastAPI, FakeAsyncSupabaseClient]:
+    app = FastAPI()
+    sb = FakeAsyncSupabaseClient(url, "bench", http_client=http_client)
+
+    @app.get("/pacientes")
+    async def listar():
+        dados = []
+        for _ in range(consultas):
+            dados = (await sb.table("pacientes").select("*").order("nome").execute()).data
+        return dados
+
+    return app, sb
+
+
+async def _disparar(app: FastAPI, total: int, concorrencia: int) -> float:
+    sem = asyncio.Semaphore(concorrencia)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def uma():
+            async with sem:
+                r = await client.get("/pacientes")
+                r.raise_for_status()
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(uma() for _ in range(total)))
+        return time.perf_counter() - inicio
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requisicoes", type=int, default=1000)
+    parser.add_argument("--concorrencia", type=int, default=200)
+    parser.add_argument("--consultas", type=int, default=3, help="round-trips ao PostgREST por requisição")
+    parser.add_argument("--latencia-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    async with PostgrestStandin(latencia_ms=args.latencia_ms) as standin:
+        print(f"Stand-in PostgREST em {standin.url} (latência {args.latencia_ms:.0f} ms, {args.consultas} consultas/req)")
+        print(f"{args.requisicoes} requisições, concorrência {args.concorrencia}\n")
+
+        duracao = await _disparar(_app_sincrona(standin.url, args.consultas), args.requisicoes, args.concorrencia)
+        antes = args.requisicoes / duracao
+        print(f"antes  (def + SyncPostgrestClient):   {antes:8.1f} req/s  ({duracao:.2f}s)")
+
+        conexoes = get_settings().SUPABASE_POOL_MAX_CONNECTIONS
+        simples = httpx.AsyncClient(limits=httpx.Limits(max_connections=conexoes, max_keepalive_connections=conexoes))
+        app, sb = _app_async(standin.url, args.consultas, http_client=simples)
+        try:
+            duracao = await _disparar(app, args.requisicoes, args.concorrencia)
+        finally:
+            await sb.aclose()
+        limits = args.requisicoes / duracao
+        print(f"async + httpx.Limits({conexoes}):           {limits:8.1f} req/s  ({duracao:.2f}s)")
+
+        app, sb = _app_async(standin.url, args.consultas)
+        try:
+            duracao = await _disparar(app, args.requisicoes, args.concorrencia)
+        finally:
+            await sb.aclose()
+        depois = args.requisicoes / duracao
+        print(f"depois (async + pool fragmentado):     {depois:8.1f} req/s  ({duracao:.2f}s)")
+        print(f"\nganho: {depois / antes:.1f}x sobre o síncrono, {depois / limits:.1f}x sobre httpx.Limits")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""
+Benchmark: KPIs do `/financeiro/consultorio/dashboard`.
+
+Compara o cálculo anterior da rota (sete `sum()` sobre a lista de transações,
+cada um reavaliando a categoria de cada transação, em float) com o
+`AgregadorKPI` de `backend.services.kpis` (classificação única e uma passada,
+em centavos), sobre transações sintéticas. Confere que os totais batem ao
+centavo. Repete o agregador com `--kpis-extras` regras a mais para mostrar que
+o custo da passada não cresce com o número de KPIs.
+
+Uso:
+    python -m benchmarks.bench_kpis --transacoes 100000
+"""
+import argparse
+import random
+import time
+
+from backend.services.kpis import DERIVADOS_DASHBOARD, KPIS_DASHBOARD, AgregadorKPI, agregador_dashboard
+
+
+def _dados(qtd: int, seed: int = 42) -> list[dict]:
+    rnd = random.Random(seed)
+    categorias = [
+        {"nome": "Atendimento Clínico", "tipo": "RECEITA", "escopo": "CLINICA"},
+        {"nome": "Taxa de Operadora", "tipo": "DESPESA", "escopo": "CLINICA"},
+        {"nome": "Aluguel", "tipo": "DESPESA", "escopo": "CLINICA"},
+        {"nome": "Mercado", "tipo": "DESPESA", "escopo": "PESSOAL"},
+        {"nome": "Pró-Labore", "tipo": "TRANSFERENCIA", "escopo": "GLOBAL"},
+        None,
+    ]
+    contas = [None, "CLINICA", "PESSOAL"]
+    return [
+        {
+            "id": i,
+            "valor": round(rnd.uniform(1, 2500), 2),
+            "status": rnd.choice(["PAGO", "PAGO", "PENDENTE", "CANCELADO"]),
+            "conta_origem": rnd.choice(contas),
+            "conta_destino": rnd.choice(contas),
+            "fin_categorias": rnd.choice(categorias),
+        }
+        for i in range(qtd)
+    ]
+
+
+def _kpis_sete_passadas(txs: list[dict]) -> dict:
+    """Cálculo anterior da rota, preservado aqui como referência"""
+    def get_cat_tipo(t):
+        return t.get("fin_categorias", {}).get("tipo") if t.get("fin_categorias") else None
+
+    def get_cat_escopo(t):
+        return t.get("fin_categorias", {}).get("escopo") if t.get("fin_categorias") else None
+
+    faturamento_bruto = sum(t["valor"] for t in txs if get_cat_tipo(t) == "RECEITA" and t.get("conta_destino") == "CLINICA" and t.get("status") == "PAGO")
+    despesas_clinica = sum(t["valor"] for t in txs if get_cat_tipo(t) == "DESPESA" and get_cat_escopo(t) == "CLINICA" and t.get("status") == "PAGO")
+    a_receber = sum(t["valor"] for t in txs if get_cat_tipo(t) == "RECEITA" and t.get("status") == "PENDENTE")
+    aportes = sum(t["valor"] for t in txs if t.get("conta_origem") == "PESSOAL" and t.get("conta_destino") == "CLINICA" and t.get("status") == "PAGO")
+    retiradas = sum(t["valor"] for t in txs if t.get("conta_origem") == "CLINICA" and t.get("conta_destino") == "PESSOAL" and t.get("status") == "PAGO")
+    despesas_pessoais = sum(t["valor"] for t in txs if get_cat_tipo(t) == "DESPESA" and get_cat_escopo(t) == "PESSOAL" and t.get("status") == "PAGO")
+    return {
+        "faturamento_bruto": faturamento_bruto,
+        "lucro_operacional": faturamento_bruto - despesas_clinica,
+        "a_receber": a_receber,
+        "aportes_pessoais": aportes,
+        "retiradas_pro_labore": retiradas,
+        "despesas_pessoais": despesas_pessoais,
+        "caixa_pessoal_livre": retiradas - despesas_pessoais,
+    }
+
+
+def _melhor_de(repeticoes: int, funcao, *args) -> tuple[float, object]:
+    melhor, resultado = float("inf"), None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transacoes", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--kpis-extras", type=int, default=20)
+    args = parser.parse_args()
+
+    txs = _dados(args.transacoes)
+    print(f"{args.transacoes} transações, melhor de {args.repeticoes}\n")
+
+    antes, antigo = _melhor_de(args.repeticoes, _kpis_sete_passadas, txs)
+    print(f"antes  (7 passadas, float):            {antes * 1000:8.1f} ms")
+    depois, novo = _melhor_de(args.repeticoes, agregador_dashboard.agregar, txs)
+    print(f"depois (1 passada, centavos):          {depois * 1000:8.1f} ms")
+
+    for nome, valor in antigo.items():
+        assert round(valor * 100) == novo[nome], f"{nome} divergente: {valor} x {novo[nome] / 100}"
+    print(f"\ntotais iguais ao centavo · ganho: {antes / depois:.1f}x")
+
+    extras = {
+        f"extra_{i}": (lambda c, i=i: c.status == ("PAGO", "PENDENTE", "CANCELADO")[i % 3] and c.conta_destino is not None)
+        for i in range(args.kpis_extras)
+    }
+    ampliado = AgregadorKPI({**KPIS_DASHBOARD, **extras}, DERIVADOS_DASHBOARD)
+    com_extras, _ = _melhor_de(args.repeticoes, ampliado.agregar, txs)
+    print(f"com +{args.kpis_extras} KPIs:                     {com_extras * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
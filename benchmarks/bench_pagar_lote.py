@@ -0,0 +1,110 @@
+"""
+Benchmark: baixa em lote (`POST /financeiro/consultorio/pagar-lote`).
+
+Roda o código das rotas contra o stand-in local do PostgREST e compara, para
+lotes de tamanhos diferentes, três formas de quitar as mesmas parcelas (com
+taxa de operadora): uma chamada de `pagar_parcela` por parcela (RPC, como o
+"pagar" clicado uma a uma), o lote pelo caminho sem RPC
+(`_pagar_lote_sequencial`) e o lote pela função `pagar_lote_v1`.
+
+Uso:
+    python -m benchmarks.bench_pagar_lote --latencia-ms 50 --lotes 5,100
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from backend.api.routes import financeiro_consultorio
+from backend.api.routes.financeiro_consultorio import (
+    ItemPagamentoLote, PagamentoLote, PagamentoTx, _pagar_lote_sequencial, pagar_lote, pagar_parcela,
+)
+from backend.config.supabase_client import FakeAsyncSupabaseClient
+from backend.services import referencia
+from backend.services.cache import cache_referencia
+from benchmarks.postgrest_standin import PostgrestStandin
+
+# Parcelas de 10 faturamentos diferentes
+FATURAMENTOS = 10
+
+
+def _id(i: int) -> str:
+    return f"00000000-0000-0000-0000-{i:012d}"
+
+
+def _transacoes(qtd: int) -> list[dict]:
+    return [
+        {
+            "id": _id(i), "faturamento_id": _id(900 + i % FATURAMENTOS), "categoria_id": 1,
+            "descricao": f"Parcela {i} - Tratamento", "valor": 150.0, "data_vencimento": "2026-01-10",
+            "status": "PENDENTE", "metodo_pagamento": None,
+        }
+        for i in range(1, qtd + 1)
+    ]
+
+
+def _responder(txs: list[dict]):
+    def responder(method: str, path: str, body: bytes):
+        if "/rpc/pagar_lote_v1" in path:
+            pagas = [{**t, "status": "PAGO"} for t in txs]
+            return {"pagas": pagas, "ignoradas": [], "faturamentos_atualizados": FATURAMENTOS, "categoria_criada": False, "meses": ["2026-01"]}
+        if "/rpc/pagar_parcela_v1" in path:
+            return {"transacao": {**txs[0], "status": "PAGO"}, "categoria_criada": False, "meses": ["2026-01"]}
+        if "fin_categorias" in path:
+            return [{"id": 9}]
+        if method == "POST" and "fin_transacoes" in path:
+            return json.loads(body)
+        return txs
+
+    return responder
+
+
+async def _medir(standin: PostgrestStandin, repeticoes: int, txs: list[dict], modo: str) -> tuple[float, float]:
+    sb = FakeAsyncSupabaseClient(standin.url, "bench")
+    financeiro_consultorio.get_supabase_async = referencia.get_supabase_async = lambda: sb
+    cache_referencia.limpar()
+    itens = [{"id": t["id"], "data_pagamento": None, "taxa_porcentagem": 3.5, "taxa_valor": 5.25, "metodo_pagamento": "CREDITO"} for t in txs]
+
+    async def pagar():
+        if modo == "uma a uma":
+            for item in itens:
+                await pagar_parcela(item["id"], PagamentoTx(taxa_porcentagem=3.5, taxa_valor=5.25, metodo_pagamento="CREDITO"))
+        elif modo == "lote sem rpc":
+            await _pagar_lote_sequencial(sb, itens)
+        else:
+            await pagar_lote(PagamentoLote(itens=[ItemPagamentoLote(**item) for item in itens]))
+
+    try:
+        await pagar()  # aquece conexão e cache de categorias
+        antes = standin.requisicoes
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            await pagar()
+        duracao = time.perf_counter() - inicio
+        return duracao / repeticoes * 1000, (standin.requisicoes - antes) / repeticoes
+    finally:
+        await sb.aclose()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencia-ms", type=float, default=50.0)
+    parser.add_argument("--lotes", default="5,100", help="tamanhos de lote, separados por vírgula")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    modos = ("uma a uma", "lote sem rpc", "lote rpc")
+    print(f"Stand-in PostgREST (latência {args.latencia_ms:.0f} ms), parcelas de {FATURAMENTOS} faturamentos\n")
+    print(f"{'parcelas':>8} " + " ".join(f"{m:>22}" for m in modos))
+    for qtd in (int(n) for n in args.lotes.split(",")):
+        txs = _transacoes(qtd)
+        linha = []
+        for modo in modos:
+            async with PostgrestStandin(latencia_ms=args.latencia_ms, responder=_responder(txs)) as standin:
+                ms, chamadas = await _medir(standin, args.repeticoes, txs, modo)
+            linha.append(f"{ms:9.1f} ms ({chamadas:5.1f} rt)")
+        print(f"{qtd:>8} " + " ".join(f"{c:>22}" for c in linha))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
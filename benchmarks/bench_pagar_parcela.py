@@ -0,0 +1,99 @@
+"""
+Benchmark: baixa de parcela (`POST /financeiro/consultorio/{tx_id}/pagar`).
+
+Roda o código da rota contra o stand-in local do PostgREST nos dois caminhos:
+o antigo, chamada a chamada (`_pagar_parcela_sequencial`), e a função
+`pagar_parcela_v1` chamada uma vez via /rpc. Mede a latência por baixa e conta
+os round-trips em três cenários: pagamento integral, pagamento parcial com
+`recalcular_todas` sobre `--pendentes` parcelas e pagamento com taxa de operadora.
+
+Uso:
+    python -m benchmarks.bench_pagar_parcela --latencia-ms 80 --pendentes 24
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from backend.api.routes import financeiro_consultorio
+from backend.api.routes.financeiro_consultorio import PagamentoTx, _pagar_parcela_sequencial, pagar_parcela
+from backend.config.supabase_client import FakeAsyncSupabaseClient
+from backend.services import referencia
+from backend.services.cache import cache_referencia
+from benchmarks.postgrest_standin import PostgrestStandin
+
+TX_ID = "00000000-0000-0000-0000-000000000001"
+FAT_ID = "00000000-0000-0000-0000-0000000000f1"
+
+
+def _responder(pendentes: int):
+    tx = {
+        "id": TX_ID, "faturamento_id": FAT_ID, "categoria_id": 1, "descricao": "Parcela 1/25 - Implante",
+        "valor": 200.0, "data_vencimento": "2026-01-10", "status": "PENDENTE",
+    }
+    parcelas = [
+        {**tx, "id": f"00000000-0000-0000-0000-{i:012d}", "descricao": f"Parcela {i}/25 - Implante"}
+        for i in range(2, pendentes + 2)
+    ]
+
+    def responder(method: str, path: str, body: bytes):
+        if "/rpc/pagar_parcela_v1" in path:
+            return {"transacao": {**tx, **json.loads(body), "status": "PAGO"}, "categoria_criada": False}
+        if "fin_categorias" in path:
+            return [{"id": 9}]
+        if method == "GET" and "status=eq.PENDENTE" in path:
+            return parcelas
+        if method == "GET" and "faturamento_id=eq." in path:
+            return [{**tx, "status": "PAGO"}] + parcelas
+        return [tx]
+
+    return responder
+
+
+async def _medir(standin: PostgrestStandin, repeticoes: int, dados: PagamentoTx, usar_rpc: bool) -> tuple[float, float]:
+    sb = FakeAsyncSupabaseClient(standin.url, "bench")
+    financeiro_consultorio.get_supabase_async = referencia.get_supabase_async = lambda: sb
+    cache_referencia.limpar()
+
+    async def pagar():
+        if usar_rpc:
+            return await pagar_parcela(TX_ID, dados)
+        return await _pagar_parcela_sequencial(sb, TX_ID, dados)
+
+    try:
+        await pagar()  # aquece conexão e cache de categorias
+        antes = standin.requisicoes
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            await pagar()
+        duracao = time.perf_counter() - inicio
+        return duracao / repeticoes * 1000, (standin.requisicoes - antes) / repeticoes
+    finally:
+        await sb.aclose()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencia-ms", type=float, default=50.0)
+    parser.add_argument("--pendentes", type=int, default=24, help="parcelas pendentes no faturamento")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    cenarios = {
+        "integral": PagamentoTx(),
+        "parcial + recalcular_todas": PagamentoTx(valor_pago=120.0, acao_residual="recalcular_todas"),
+        "com taxa de operadora": PagamentoTx(taxa_porcentagem=3.5, taxa_valor=7.0, metodo_pagamento="CREDITO"),
+    }
+    print(f"Stand-in PostgREST (latência {args.latencia_ms:.0f} ms), {args.pendentes} parcelas pendentes\n")
+    print(f"{'cenário':<28} {'antes':>20} {'depois (rpc)':>20}")
+    for nome, dados in cenarios.items():
+        linha = []
+        for usar_rpc in (False, True):
+            async with PostgrestStandin(latencia_ms=args.latencia_ms, responder=_responder(args.pendentes)) as standin:
+                ms, chamadas = await _medir(standin, args.repeticoes, dados, usar_rpc)
+            linha.append(f"{ms:8.1f} ms ({chamadas:4.1f} rt)")
+        print(f"{nome:<28} {linha[0]:>20} {linha[1]:>20}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
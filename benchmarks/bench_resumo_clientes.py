@@ -0,0 +1,112 @@
+"""
+Benchmark: agregação do `/faturamentos/resumo-clientes`.
+
+Compara o cálculo paciente a paciente (como a rota fazia: para cada paciente,
+varre todos os faturamentos e todos os agendamentos, com `in` sobre lista) com
+o motor de uma passada de `backend.services.resumo_clientes`, sobre dados
+sintéticos já compactados (valores em centavos, como `compactar_*` entrega).
+Confere que as duas saídas são idênticas.
+
+O custo do cálculo antigo cresce com P·(F+A); na escala padrão ele levaria
+minutos, então roda sobre uma amostra de `--amostra` pacientes e o tempo
+total é extrapolado (o custo por paciente é constante para F e A fixos).
+
+Uso:
+    python -m benchmarks.bench_resumo_clientes --pacientes 10000 --faturamentos 100000
+"""
+import argparse
+import random
+import time
+
+from backend.services.resumo_clientes import resumir_clientes
+
+
+def _dados(qtd_pacientes: int, qtd_faturamentos: int, qtd_agendamentos: int, seed: int = 42):
+    rnd = random.Random(seed)
+    pacientes = [
+        {"id": f"p{i:06d}", "nome": f"Paciente {i}", "cpf": f"{i:011d}", "telefone": "11999990000"}
+        for i in range(qtd_pacientes)
+    ]
+    agendamentos = [
+        {"id": f"a{i:07d}", "paciente_id": f"p{rnd.randrange(qtd_pacientes):06d}", "valor": rnd.choice([0, 15000, 8990, 32050])}
+        for i in range(qtd_agendamentos)
+    ]
+    faturamentos = []
+    for _ in range(qtd_faturamentos):
+        ag = rnd.choice(agendamentos) if rnd.random() < 0.4 else None
+        valor = rnd.randint(5_000, 300_000)
+        pendente = rnd.choice([0, 0, valor // 3])
+        faturamentos.append({
+            "paciente_id": ag["paciente_id"] if ag else f"p{rnd.randrange(qtd_pacientes):06d}",
+            "status": rnd.choice(["ABERTO", "PAGO_PARCIAL", "QUITADO", "QUITADO", "CANCELADO"]),
+            "agendamento_id": ag["id"] if ag else None,
+            "valor_final": valor,
+            "pendente": pendente,
+        })
+    return pacientes, faturamentos, agendamentos
+
+
+def _resumo_por_paciente(pacientes, faturamentos, agendamentos):
+    """Cálculo anterior da rota, preservado aqui como referência"""
+    agendamentos_faturados_ids = [f["agendamento_id"] for f in faturamentos if f.get("agendamento_id")]
+    resumo = []
+    for p in pacientes:
+        fat_paciente = [f for f in faturamentos if f["paciente_id"] == p["id"] and f["status"] != "CANCELADO"]
+        total_pendente = 0
+        total_faturado = 0
+        for f in fat_paciente:
+            total_pendente += f["pendente"]
+            total_faturado += f["valor_final"]
+        a_faturar_pac = [a for a in agendamentos if a["paciente_id"] == p["id"] and a["id"] not in agendamentos_faturados_ids]
+        total_a_faturar = 0
+        for ag in a_faturar_pac:
+            total_a_faturar += ag["valor"]
+        status_financeiro = "EM_DIA"
+        if total_pendente > 0:
+            status_financeiro = "PENDENTE"
+        elif total_a_faturar > 0:
+            status_financeiro = "A_FATURAR"
+        resumo.append({
+            "paciente_id": p["id"],
+            "nome": p["nome"],
+            "cpf": p["cpf"],
+            "telefone": p["telefone"],
+            "total_faturado": total_faturado / 100,
+            "total_pendente": total_pendente / 100,
+            "total_a_faturar": total_a_faturar / 100,
+            "qtd_faturamentos": len(fat_paciente),
+            "status_financeiro": status_financeiro,
+        })
+    return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pacientes", type=int, default=10_000)
+    parser.add_argument("--faturamentos", type=int, default=100_000)
+    parser.add_argument("--agendamentos", type=int, default=50_000)
+    parser.add_argument("--amostra", type=int, default=50, help="pacientes usados para medir o cálculo antigo")
+    args = parser.parse_args()
+
+    pacientes, faturamentos, agendamentos = _dados(args.pacientes, args.faturamentos, args.agendamentos)
+    print(f"{args.pacientes} pacientes, {args.faturamentos} faturamentos, {args.agendamentos} agendamentos\n")
+
+    inicio = time.perf_counter()
+    novo = resumir_clientes(pacientes, faturamentos, agendamentos)
+    depois = time.perf_counter() - inicio
+    print(f"depois (uma passada, índices dict/set): {depois * 1000:10.1f} ms")
+
+    amostra = pacientes[: args.amostra]
+    inicio = time.perf_counter()
+    antigo = _resumo_por_paciente(amostra, faturamentos, agendamentos)
+    duracao = time.perf_counter() - inicio
+    antes = duracao / len(amostra) * len(pacientes)
+    print(f"antes  (paciente a paciente):           {antes * 1000:10.1f} ms  "
+          f"(extrapolado de {len(amostra)} pacientes em {duracao:.2f}s)")
+
+    assert antigo == novo[: len(amostra)], "saídas divergentes"
+    print(f"\nsaídas idênticas na amostra · ganho: {antes / depois:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Stand-in local do PostgREST para os benchmarks.
+
+Servidor HTTP/1.1 mínimo (keep-alive) sobre asyncio que responde a qualquer
+requisição com JSON após uma latência fixa, simulando o round-trip WAN até o
+Supabase. Não implementa a semântica do PostgREST: quem precisa de respostas
+específicas passa um `responder(method, path, body) -> objeto JSON` (ou
+`(status_http, objeto JSON)` para simular erros do PostgREST).
+"""
+import asyncio
+import json
+from typing import Any, Callable, Optional
+
+
+def _linhas_padrao(qtd: int = 20) -> list[dict]:
+    return [{"id": f"00000000-0000-0000-0000-{i:012d}", "nome": f"Paciente {i}", "ativo": True} for i in range(qtd)]
+
+
+class PostgrestStandin:
+    def __init__(
+        self,
+        latencia_ms: float = 50.0,
+        responder: Optional[Callable[[str, str, bytes], Any]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.latencia = latencia_ms / 1000
+        self.responder = responder or (lambda method, path, body: _linhas_padrao())
+        self.host = host
+        self.port = port
+        self.requisicoes = 0
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    @property
+    def url(self) -> str:
+        """URL base no formato do SUPABASE_URL (o cliente acrescenta /rest/v1)"""
+        return f"http://{self.host}:{self.port}"
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._atender, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                method, path, _ = linha.decode().split(" ", 2)
+                tamanho = 0
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    nome, _, valor = h.decode().partition(":")
+                    if nome.strip().lower() == "content-length":
+                        tamanho = int(valor.strip())
+                body = await reader.readexactly(tamanho) if tamanho else b""
+
+                self.requisicoes += 1
+                await asyncio.sleep(self.latencia)
+                resposta = self.responder(method, path, body)
+                status_http, resposta = resposta if isinstance(resposta, tuple) else (200, resposta)
+                payload = json.dumps(resposta).encode()
+                writer.write(
+                    f"HTTP/1.1 {status_http} -\r\n".encode() +
+                    b"Content-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(payload)).encode() + b"\r\n\r\n" + payload
+                )
+                await writer.drain()
+        except (ConnectionResetError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
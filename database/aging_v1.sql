@@ -0,0 +1,58 @@
+-- ============================================================
+-- AGING DE RECEBÍVEIS (inadimplência por faixa de atraso) - v1
+-- Views lidas por GET /api/financeiro/consultorio/aging e /aging/{faixa}
+-- Colar no SQL Editor do Supabase e clicar em Run (após schema_financeiro.sql)
+--
+-- Parcelas a receber PENDENTES e vencidas, agrupadas por faixa de dias de
+-- atraso (0-30, 31-60, 61-90, 90+) no total e por paciente. A leitura das
+-- vencidas é um trecho do índice (status, data_vencimento); cada view é uma
+-- consulta agrupada só.
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION fin_aging_faixa(p_dias INTEGER)
+RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN p_dias <= 30 THEN '0-30'
+        WHEN p_dias <= 60 THEN '31-60'
+        WHEN p_dias <= 90 THEN '61-90'
+        ELSE '90+'
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- A receber vencidas: parcelas de faturamento ou lançamentos de categoria RECEITA
+CREATE OR REPLACE VIEW fin_aging_vencidas_v1 AS
+SELECT
+    t.id,
+    f.paciente_id,
+    t.valor,
+    t.data_vencimento,
+    fin_aging_faixa(CURRENT_DATE - t.data_vencimento) AS faixa
+FROM fin_transacoes t
+LEFT JOIN fin_faturamentos f ON f.id = t.faturamento_id
+LEFT JOIN fin_categorias c ON c.id = t.categoria_id
+WHERE t.status = 'PENDENTE'
+  AND t.data_vencimento < CURRENT_DATE
+  AND (t.faturamento_id IS NOT NULL OR c.tipo = 'RECEITA');
+
+-- Totais por faixa (inclui lançamentos sem paciente)
+CREATE OR REPLACE VIEW fin_aging_faixas_v1 AS
+SELECT faixa, SUM(valor) AS total, COUNT(*) AS qtd, COUNT(DISTINCT paciente_id) AS pacientes
+FROM fin_aging_vencidas_v1
+GROUP BY faixa;
+
+-- Uma linha por (paciente, faixa), para o drill-down paginado de cada faixa
+CREATE OR REPLACE VIEW fin_aging_pacientes_v1 AS
+SELECT
+    v.paciente_id,
+    p.nome,
+    p.telefone,
+    v.faixa,
+    SUM(v.valor) AS total,
+    COUNT(*) AS qtd,
+    MIN(v.data_vencimento) AS vencimento_mais_antigo
+FROM fin_aging_vencidas_v1 v
+JOIN pacientes p ON p.id = v.paciente_id
+GROUP BY v.paciente_id, p.nome, p.telefone, v.faixa;
+
+-- Mesmo índice de indices_financeiro_v1.sql (as vencidas são um trecho dele)
+CREATE INDEX IF NOT EXISTS idx_fin_transacoes_status_venc ON fin_transacoes (status, data_vencimento);
@@ -0,0 +1,52 @@
+-- ============================================================
+-- ESCOPO DA CATEGORIA NAS TRANSAÇÕES - v1
+-- Colar no SQL Editor do Supabase e clicar em Run (após schema_financeiro.sql)
+--
+-- O filtro ?escopo=CLINICA|PESSOAL de GET /api/financeiro/consultorio/ olha
+-- conta_origem, conta_destino e o escopo da categoria. O PostgREST não aceita
+-- coluna de recurso embutido dentro de um or=, então o escopo da categoria é
+-- copiado para fin_transacoes.categoria_escopo (mantido por triggers) e o
+-- filtro inteiro vira um or= sobre colunas da própria tabela, cada uma com
+-- índice junto de data_vencimento (BitmapOr dos três, limitado ao período).
+-- ============================================================
+
+ALTER TABLE fin_transacoes ADD COLUMN IF NOT EXISTS categoria_escopo VARCHAR(20);
+
+-- Preenche categoria_escopo ao gravar a transação (ou ao trocar a categoria)
+CREATE OR REPLACE FUNCTION fin_transacoes_categoria_escopo()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.categoria_escopo := (SELECT escopo FROM fin_categorias WHERE id = NEW.categoria_id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_fin_transacoes_categoria_escopo ON fin_transacoes;
+CREATE TRIGGER trg_fin_transacoes_categoria_escopo
+    BEFORE INSERT OR UPDATE OF categoria_id, categoria_escopo ON fin_transacoes
+    FOR EACH ROW EXECUTE FUNCTION fin_transacoes_categoria_escopo();
+
+-- Mudou o escopo de uma categoria: atualiza as transações dela
+CREATE OR REPLACE FUNCTION fin_categorias_propagar_escopo()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE fin_transacoes SET categoria_escopo = NEW.escopo
+    WHERE categoria_id = NEW.id AND categoria_escopo IS DISTINCT FROM NEW.escopo;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_fin_categorias_propagar_escopo ON fin_categorias;
+CREATE TRIGGER trg_fin_categorias_propagar_escopo
+    AFTER UPDATE OF escopo ON fin_categorias
+    FOR EACH ROW WHEN (OLD.escopo IS DISTINCT FROM NEW.escopo)
+    EXECUTE FUNCTION fin_categorias_propagar_escopo();
+
+-- Carga inicial
+UPDATE fin_transacoes t SET categoria_escopo = c.escopo
+FROM fin_categorias c
+WHERE c.id = t.categoria_id AND t.categoria_escopo IS DISTINCT FROM c.escopo;
+
+CREATE INDEX IF NOT EXISTS idx_fin_transacoes_escopo_venc ON fin_transacoes (categoria_escopo, data_vencimento);
+CREATE INDEX IF NOT EXISTS idx_fin_transacoes_origem_venc ON fin_transacoes (conta_origem, data_vencimento);
+CREATE INDEX IF NOT EXISTS idx_fin_transacoes_destino_venc ON fin_transacoes (conta_destino, data_vencimento);
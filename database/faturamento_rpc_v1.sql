@@ -0,0 +1,450 @@
+-- ============================================================
+-- RPCs DE FATURAMENTO - v1
+-- Colar no SQL Editor do Supabase e clicar em Run (após schema_financeiro.sql)
+--
+-- Operações que antes eram uma sequência de chamadas PostgREST (cada uma um
+-- round-trip até o Supabase, e um erro no meio deixava dados pela metade)
+-- passam a ser uma função chamada uma vez via /rpc, dentro de uma transação.
+-- ============================================================
+
+-- Busca (ou cria) a categoria financeira pelo nome. O lock (liberado no fim da
+-- transação) serializa chamadas com o mesmo nome: duas baixas simultâneas não
+-- criam a categoria duas vezes.
+CREATE OR REPLACE FUNCTION fin_categoria_por_nome(p_nome TEXT, p_tipo TEXT DEFAULT NULL, p_escopo TEXT DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    v_id INTEGER;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('fin_categorias:' || p_nome));
+    SELECT id INTO v_id FROM fin_categorias WHERE nome = p_nome ORDER BY id LIMIT 1;
+    IF v_id IS NULL AND p_tipo IS NOT NULL THEN
+        INSERT INTO fin_categorias (nome, tipo, escopo, ativo) VALUES (p_nome, p_tipo, p_escopo, TRUE)
+        RETURNING id INTO v_id;
+    END IF;
+    RETURN v_id;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Cria faturamento + tratamento clínico + entrada/parcelas (+ taxa da entrada)
+-- e conclui o agendamento de origem. O cronograma chega pronto da API
+-- (backend/services/parcelamento.py); aqui só se grava.
+--
+-- p_faturamento: paciente_id, agendamento_id, descricao, valor_original,
+--                valor_desconto, valor_final, metodo_pagamento, status
+-- p_tratamento:  procedimento_id, procedimentos_ids
+-- p_transacoes:  [{descricao, valor, data_vencimento, data_pagamento, conta_destino,
+--                  status, taxa_porcentagem, taxa_valor, metodo_pagamento}]
+-- p_taxa:        {descricao, valor, data_vencimento, data_pagamento, metodo_pagamento} ou null
+CREATE OR REPLACE FUNCTION criar_faturamento_v1(
+    p_faturamento JSONB,
+    p_tratamento JSONB,
+    p_transacoes JSONB,
+    p_taxa JSONB DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_fat fin_faturamentos%ROWTYPE;
+    v_cat_receita INTEGER;
+    v_cat_taxa INTEGER;
+    v_categoria_criada BOOLEAN := FALSE;
+    v_parcelas INTEGER;
+BEGIN
+    IF jsonb_array_length(COALESCE(p_transacoes, '[]'::jsonb)) = 0 THEN
+        RAISE EXCEPTION 'Faturamento sem entrada nem parcelas a gerar';
+    END IF;
+
+    INSERT INTO fin_faturamentos (paciente_id, agendamento_id, descricao, valor_original, valor_desconto, valor_final, metodo_pagamento, status)
+    VALUES (
+        (p_faturamento->>'paciente_id')::UUID,
+        (p_faturamento->>'agendamento_id')::UUID,
+        p_faturamento->>'descricao',
+        (p_faturamento->>'valor_original')::NUMERIC,
+        COALESCE((p_faturamento->>'valor_desconto')::NUMERIC, 0),
+        (p_faturamento->>'valor_final')::NUMERIC,
+        p_faturamento->>'metodo_pagamento',
+        COALESCE(p_faturamento->>'status', 'ABERTO')
+    )
+    RETURNING * INTO v_fat;
+
+    -- Vínculo com o Tratamento Clínico
+    INSERT INTO clin_tratamentos (paciente_id, procedimento_id, procedimentos_ids, faturamento_id, status, observacoes)
+    VALUES (
+        v_fat.paciente_id,
+        (p_tratamento->>'procedimento_id')::UUID,
+        CASE WHEN jsonb_typeof(p_tratamento->'procedimentos_ids') = 'array'
+             THEN ARRAY(SELECT jsonb_array_elements_text(p_tratamento->'procedimentos_ids'))::UUID[] END,
+        v_fat.id,
+        'EM_ANDAMENTO',
+        'Tratamento gerado a partir do Orçamento: ' || v_fat.descricao
+    );
+
+    -- Categoria de receita clínica (id 1 se a categoria padrão tiver sido removida)
+    v_cat_receita := COALESCE(fin_categoria_por_nome('Atendimento Clínico'), 1);
+
+    INSERT INTO fin_transacoes (categoria_id, faturamento_id, descricao, valor, data_vencimento, data_pagamento,
+                                conta_destino, status, taxa_porcentagem, taxa_valor, metodo_pagamento)
+    SELECT v_cat_receita, v_fat.id, t.descricao, t.valor, t.data_vencimento, t.data_pagamento,
+           t.conta_destino, t.status, COALESCE(t.taxa_porcentagem, 0), COALESCE(t.taxa_valor, 0), t.metodo_pagamento
+    FROM jsonb_to_recordset(p_transacoes) AS t(
+        descricao TEXT, valor NUMERIC, data_vencimento DATE, data_pagamento DATE, conta_destino TEXT,
+        status TEXT, taxa_porcentagem NUMERIC, taxa_valor NUMERIC, metodo_pagamento TEXT
+    );
+    GET DIAGNOSTICS v_parcelas = ROW_COUNT;
+
+    -- Despesa da taxa da operadora sobre a entrada
+    IF p_taxa IS NOT NULL AND jsonb_typeof(p_taxa) = 'object' THEN
+        v_categoria_criada := NOT EXISTS (SELECT 1 FROM fin_categorias WHERE nome = 'Taxa de Operadora');
+        v_cat_taxa := fin_categoria_por_nome('Taxa de Operadora', 'DESPESA', 'CLINICA');
+        INSERT INTO fin_transacoes (categoria_id, faturamento_id, descricao, valor, data_vencimento, data_pagamento,
+                                    conta_origem, status, metodo_pagamento)
+        VALUES (
+            v_cat_taxa, v_fat.id, p_taxa->>'descricao', (p_taxa->>'valor')::NUMERIC,
+            (p_taxa->>'data_vencimento')::DATE, (p_taxa->>'data_pagamento')::DATE,
+            'CLINICA', 'PAGO', p_taxa->>'metodo_pagamento'
+        );
+    END IF;
+
+    IF v_fat.agendamento_id IS NOT NULL THEN
+        UPDATE agendamentos SET status = 'concluido' WHERE id = v_fat.agendamento_id;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'faturamento', to_jsonb(v_fat),
+        'parcelas_geradas', v_parcelas,
+        'categoria_criada', v_categoria_criada
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Setup do faturamento rascunho: grava o contrato e a diferença de cronograma
+-- calculada pela API (backend/services/parcelamento.py: diferenca_cronograma)
+-- numa transação só. Trava o faturamento; se uma parcela que a API ia regravar
+-- ou remover foi paga depois da leitura, nada é gravado (40001: ler de novo).
+--
+-- p_faturamento: paciente_id, procedimento_id, agendamento_id, descricao, valor_original,
+--                valor_desconto, valor_final, metodo_pagamento, numero_parcelas, status
+--                (ausentes mantêm o valor gravado)
+-- p_gravar:      [{id, categoria_id, descricao, valor, data_vencimento, data_pagamento, conta_origem,
+--                  conta_destino, status, metodo_pagamento, taxa_porcentagem, taxa_valor}]
+-- p_remover:     [ids]
+-- Devolve {faturamento}
+CREATE OR REPLACE FUNCTION setup_faturamento_v1(
+    p_faturamento_id UUID,
+    p_faturamento JSONB,
+    p_gravar JSONB DEFAULT '[]',
+    p_remover JSONB DEFAULT '[]'
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_fat fin_faturamentos%ROWTYPE;
+BEGIN
+    PERFORM 1 FROM fin_faturamentos WHERE id = p_faturamento_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Faturamento não encontrado' USING ERRCODE = 'P0002';
+    END IF;
+
+    -- A API só remove pagas que são a taxa da entrada e só regrava como PAGO as pagas
+    IF EXISTS (
+        SELECT 1 FROM fin_transacoes t
+        WHERE t.faturamento_id = p_faturamento_id AND t.status = 'PAGO'
+          AND (
+              (t.id IN (SELECT (r #>> '{}')::UUID FROM jsonb_array_elements(COALESCE(p_remover, '[]')) r)
+               AND COALESCE(t.descricao, '') NOT LIKE 'Taxa de Operadora%')
+              OR t.id IN (SELECT (g->>'id')::UUID FROM jsonb_array_elements(COALESCE(p_gravar, '[]')) g
+                          WHERE g->>'status' IS DISTINCT FROM 'PAGO')
+          )
+    ) THEN
+        RAISE EXCEPTION 'Uma parcela do faturamento foi paga durante o setup' USING ERRCODE = '40001';
+    END IF;
+
+    UPDATE fin_faturamentos SET
+        paciente_id = COALESCE((p_faturamento->>'paciente_id')::UUID, paciente_id),
+        procedimento_id = COALESCE((p_faturamento->>'procedimento_id')::UUID, procedimento_id),
+        agendamento_id = COALESCE((p_faturamento->>'agendamento_id')::UUID, agendamento_id),
+        descricao = COALESCE(p_faturamento->>'descricao', descricao),
+        valor_original = COALESCE((p_faturamento->>'valor_original')::NUMERIC, valor_original),
+        valor_desconto = COALESCE((p_faturamento->>'valor_desconto')::NUMERIC, valor_desconto),
+        valor_final = COALESCE((p_faturamento->>'valor_final')::NUMERIC, valor_final),
+        metodo_pagamento = COALESCE(p_faturamento->>'metodo_pagamento', metodo_pagamento),
+        numero_parcelas = COALESCE((p_faturamento->>'numero_parcelas')::INTEGER, numero_parcelas),
+        status = COALESCE(p_faturamento->>'status', status)
+    WHERE id = p_faturamento_id
+    RETURNING * INTO v_fat;
+
+    INSERT INTO fin_transacoes (id, faturamento_id, categoria_id, descricao, valor, data_vencimento, data_pagamento,
+                                conta_origem, conta_destino, status, metodo_pagamento, taxa_porcentagem, taxa_valor)
+    SELECT g.id, p_faturamento_id, g.categoria_id, g.descricao, g.valor, g.data_vencimento, g.data_pagamento,
+           g.conta_origem, g.conta_destino, g.status, g.metodo_pagamento,
+           COALESCE(g.taxa_porcentagem, 0), COALESCE(g.taxa_valor, 0)
+    FROM jsonb_to_recordset(COALESCE(p_gravar, '[]')) AS g(
+        id UUID, categoria_id INTEGER, descricao TEXT, valor NUMERIC, data_vencimento DATE, data_pagamento DATE,
+        conta_origem TEXT, conta_destino TEXT, status TEXT, metodo_pagamento TEXT, taxa_porcentagem NUMERIC, taxa_valor NUMERIC
+    )
+    ON CONFLICT (id) DO UPDATE SET
+        categoria_id = EXCLUDED.categoria_id,
+        descricao = EXCLUDED.descricao,
+        valor = EXCLUDED.valor,
+        data_vencimento = EXCLUDED.data_vencimento,
+        data_pagamento = EXCLUDED.data_pagamento,
+        conta_origem = EXCLUDED.conta_origem,
+        conta_destino = EXCLUDED.conta_destino,
+        status = EXCLUDED.status,
+        metodo_pagamento = EXCLUDED.metodo_pagamento,
+        taxa_porcentagem = EXCLUDED.taxa_porcentagem,
+        taxa_valor = EXCLUDED.taxa_valor;
+
+    DELETE FROM fin_transacoes
+    WHERE faturamento_id = p_faturamento_id
+      AND id IN (SELECT (r #>> '{}')::UUID FROM jsonb_array_elements(COALESCE(p_remover, '[]')) r);
+
+    IF (p_faturamento->>'agendamento_id') IS NOT NULL THEN
+        UPDATE agendamentos SET status = 'concluido' WHERE id = (p_faturamento->>'agendamento_id')::UUID;
+    END IF;
+
+    RETURN jsonb_build_object('faturamento', to_jsonb(v_fat));
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Baixa de uma parcela: marca como paga, joga o residual (pagamento parcial) nas
+-- pendentes, recalcula status/valor do faturamento e lança a despesa da taxa da
+-- operadora. Trava o faturamento durante a baixa, então pagamentos simultâneos
+-- do mesmo faturamento são aplicados um depois do outro.
+--
+-- Parâmetros nulos mantêm o valor gravado (valor_pago nulo = pagou o valor da parcela).
+-- p_acao_residual: 'somar_proxima' (padrão) ou 'recalcular_todas'
+-- Devolve {transacao, categoria_criada, meses}: meses (AAAA-MM) de vencimento tocados pela baixa
+CREATE OR REPLACE FUNCTION pagar_parcela_v1(
+    p_tx_id UUID,
+    p_valor_pago NUMERIC DEFAULT NULL,
+    p_valor_desconto NUMERIC DEFAULT 0,
+    p_data_pagamento DATE DEFAULT NULL,
+    p_taxa_porcentagem NUMERIC DEFAULT NULL,
+    p_taxa_valor NUMERIC DEFAULT NULL,
+    p_metodo_pagamento TEXT DEFAULT NULL,
+    p_acao_residual TEXT DEFAULT 'somar_proxima'
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_tx fin_transacoes%ROWTYPE;
+    v_fat_id UUID;
+    v_data DATE := COALESCE(p_data_pagamento, CURRENT_DATE);
+    v_residual NUMERIC;
+    v_residual_centavos BIGINT;
+    v_qtd_pendentes INTEGER;
+    v_taxa NUMERIC := ROUND(COALESCE(p_taxa_valor, 0), 2);
+    v_metodo TEXT := COALESCE(NULLIF(p_metodo_pagamento, ''), 'Não informado');
+    v_cat_taxa INTEGER;
+    v_categoria_criada BOOLEAN := FALSE;
+    v_mes TEXT;
+    v_meses TEXT[];  -- meses de vencimento (AAAA-MM) tocados, para a API descartar o cache do dashboard
+BEGIN
+    SELECT faturamento_id INTO v_fat_id FROM fin_transacoes WHERE id = p_tx_id;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Transação não encontrada' USING ERRCODE = 'P0002';
+    END IF;
+
+    IF v_fat_id IS NOT NULL THEN
+        PERFORM 1 FROM fin_faturamentos WHERE id = v_fat_id FOR UPDATE;
+    END IF;
+    SELECT * INTO v_tx FROM fin_transacoes WHERE id = p_tx_id FOR UPDATE;
+
+    v_residual := GREATEST(0, v_tx.valor - COALESCE(p_valor_pago, v_tx.valor) - COALESCE(p_valor_desconto, 0));
+
+    UPDATE fin_transacoes SET
+        status = 'PAGO',
+        data_pagamento = v_data,
+        conta_destino = 'CLINICA',
+        valor = ROUND(COALESCE(p_valor_pago, v_tx.valor), 2),
+        taxa_porcentagem = COALESCE(p_taxa_porcentagem, taxa_porcentagem),
+        taxa_valor = COALESCE(p_taxa_valor, taxa_valor),
+        metodo_pagamento = COALESCE(p_metodo_pagamento, metodo_pagamento)
+    WHERE id = p_tx_id
+    RETURNING * INTO v_tx;
+    v_meses := ARRAY[to_char(v_tx.data_vencimento, 'YYYY-MM')];
+
+    -- Saldo residual (pagamento parcial)
+    IF v_fat_id IS NOT NULL AND v_residual > 0.001 THEN
+        SELECT COUNT(*) INTO v_qtd_pendentes
+        FROM fin_transacoes WHERE faturamento_id = v_fat_id AND status = 'PENDENTE';
+
+        IF v_qtd_pendentes = 0 THEN
+            -- Sem parcelas pra frente: cria uma nova um mês depois
+            INSERT INTO fin_transacoes (faturamento_id, categoria_id, descricao, valor, data_vencimento, status)
+            VALUES (v_fat_id, v_tx.categoria_id, 'Residual Parcial - ' || v_tx.descricao, ROUND(v_residual, 2),
+                    (v_tx.data_vencimento + INTERVAL '1 month')::DATE, 'PENDENTE');
+            v_meses := v_meses || to_char(v_tx.data_vencimento + INTERVAL '1 month', 'YYYY-MM');
+        ELSIF p_acao_residual = 'recalcular_todas' THEN
+            -- Reparte o residual em centavos; a sobra da divisão vai para as primeiras parcelas
+            v_residual_centavos := ROUND(v_residual * 100)::BIGINT;
+            UPDATE fin_transacoes t SET
+                valor = t.valor + (v_residual_centavos / v_qtd_pendentes
+                                   + CASE WHEN o.ordem <= v_residual_centavos % v_qtd_pendentes THEN 1 ELSE 0 END) / 100.0
+            FROM (
+                SELECT id, ROW_NUMBER() OVER (ORDER BY data_vencimento, id) AS ordem
+                FROM fin_transacoes
+                WHERE faturamento_id = v_fat_id AND status = 'PENDENTE'
+            ) o
+            WHERE t.id = o.id;
+            v_meses := v_meses || ARRAY(
+                SELECT DISTINCT to_char(data_vencimento, 'YYYY-MM')
+                FROM fin_transacoes WHERE faturamento_id = v_fat_id AND status = 'PENDENTE'
+            );
+        ELSE
+            UPDATE fin_transacoes SET valor = ROUND(valor + v_residual, 2)
+            WHERE id = (
+                SELECT id FROM fin_transacoes
+                WHERE faturamento_id = v_fat_id AND status = 'PENDENTE'
+                ORDER BY data_vencimento, id LIMIT 1
+            )
+            RETURNING to_char(data_vencimento, 'YYYY-MM') INTO v_mes;
+            v_meses := v_meses || v_mes;
+        END IF;
+    END IF;
+
+    -- Status e valor do faturamento mãe (descontos da baixa passam a valer no valor_final)
+    IF v_fat_id IS NOT NULL THEN
+        UPDATE fin_faturamentos f SET
+            status = CASE WHEN s.todas_pagas THEN 'QUITADO' WHEN s.alguma_paga THEN 'PAGO_PARCIAL' ELSE 'ABERTO' END,
+            valor_final = s.valor_final
+        FROM (
+            SELECT
+                bool_and(status = 'PAGO') AS todas_pagas,
+                bool_or(status = 'PAGO') AS alguma_paga,
+                ROUND(COALESCE(SUM(valor) FILTER (
+                    WHERE status IN ('PAGO', 'PENDENTE') AND COALESCE(descricao, '') NOT LIKE '%Taxa de Operadora%'
+                ), 0), 2) AS valor_final
+            FROM fin_transacoes WHERE faturamento_id = v_fat_id
+        ) s
+        WHERE f.id = v_fat_id;
+    END IF;
+
+    -- Despesa automática da taxa da maquininha/cartão
+    IF v_taxa > 0 THEN
+        v_categoria_criada := NOT EXISTS (SELECT 1 FROM fin_categorias WHERE nome = 'Taxa de Operadora');
+        v_cat_taxa := fin_categoria_por_nome('Taxa de Operadora', 'DESPESA', 'CLINICA');
+        INSERT INTO fin_transacoes (categoria_id, faturamento_id, descricao, valor, data_vencimento, data_pagamento,
+                                    conta_origem, status, metodo_pagamento)
+        VALUES (
+            v_cat_taxa, v_fat_id, 'Taxa de Operadora (' || v_metodo || ') — ' || COALESCE(v_tx.descricao, 'Parcela'),
+            v_taxa, v_data, v_data, 'CLINICA', 'PAGO', v_metodo
+        );
+        v_meses := v_meses || to_char(v_data, 'YYYY-MM');
+    END IF;
+
+    RETURN jsonb_build_object(
+        'transacao', to_jsonb(v_tx),
+        'categoria_criada', v_categoria_criada,
+        'meses', to_jsonb(ARRAY(SELECT DISTINCT unnest(v_meses)))
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Baixa em lote: quita as parcelas PENDENTES informadas (valor integral) com
+-- uma atualização só, recalcula o status/valor de cada faturamento envolvido
+-- uma única vez e lança as despesas de taxa num único INSERT. Ids que não
+-- estão pendentes (já pagos, inexistentes) são devolvidos em 'ignoradas'.
+--
+-- p_itens: [{id, data_pagamento, taxa_porcentagem, taxa_valor, metodo_pagamento}]
+--          (nulos mantêm o valor gravado; data_pagamento nula = hoje)
+-- Devolve {pagas, ignoradas, faturamentos_atualizados, categoria_criada, meses}
+CREATE OR REPLACE FUNCTION pagar_lote_v1(p_itens JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    v_pagas JSONB;
+    v_ignoradas JSONB;
+    v_faturamentos INTEGER := 0;
+    v_cat_taxa INTEGER;
+    v_categoria_criada BOOLEAN := FALSE;
+    v_meses JSONB;
+BEGIN
+    -- Trava os faturamentos envolvidos, em ordem de id (dois lotes simultâneos não se travam mutuamente)
+    PERFORM 1 FROM fin_faturamentos
+    WHERE id IN (
+        SELECT t.faturamento_id FROM fin_transacoes t
+        WHERE t.id IN (SELECT (e->>'id')::UUID FROM jsonb_array_elements(p_itens) e)
+    )
+    ORDER BY id
+    FOR UPDATE;
+
+    WITH itens AS (
+        SELECT DISTINCT ON (i.id) i.*
+        FROM jsonb_to_recordset(p_itens) AS i(
+            id UUID, data_pagamento DATE, taxa_porcentagem NUMERIC, taxa_valor NUMERIC, metodo_pagamento TEXT
+        )
+    ),
+    pagas AS (
+        UPDATE fin_transacoes t SET
+            status = 'PAGO',
+            data_pagamento = COALESCE(i.data_pagamento, CURRENT_DATE),
+            conta_destino = 'CLINICA',
+            taxa_porcentagem = COALESCE(i.taxa_porcentagem, t.taxa_porcentagem),
+            taxa_valor = COALESCE(i.taxa_valor, t.taxa_valor),
+            metodo_pagamento = COALESCE(i.metodo_pagamento, t.metodo_pagamento)
+        FROM itens i
+        WHERE t.id = i.id AND t.status = 'PENDENTE'
+        RETURNING t.*, ROUND(COALESCE(i.taxa_valor, 0), 2) AS taxa_lote
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(p)), '[]'::jsonb) INTO v_pagas FROM pagas p;
+
+    SELECT COALESCE(jsonb_agg(i.id), '[]'::jsonb) INTO v_ignoradas
+    FROM (SELECT DISTINCT e->>'id' AS id FROM jsonb_array_elements(p_itens) e) i
+    WHERE NOT EXISTS (SELECT 1 FROM jsonb_array_elements(v_pagas) p WHERE p->>'id' = i.id);
+
+    -- Status e valor de cada faturamento mãe, uma vez por faturamento
+    UPDATE fin_faturamentos f SET
+        status = CASE WHEN s.todas_pagas THEN 'QUITADO' WHEN s.alguma_paga THEN 'PAGO_PARCIAL' ELSE 'ABERTO' END,
+        valor_final = s.valor_final
+    FROM (
+        SELECT
+            faturamento_id,
+            bool_and(status = 'PAGO') AS todas_pagas,
+            bool_or(status = 'PAGO') AS alguma_paga,
+            ROUND(COALESCE(SUM(valor) FILTER (
+                WHERE status IN ('PAGO', 'PENDENTE') AND COALESCE(descricao, '') NOT LIKE '%Taxa de Operadora%'
+            ), 0), 2) AS valor_final
+        FROM fin_transacoes
+        WHERE faturamento_id IN (SELECT DISTINCT (p->>'faturamento_id')::UUID FROM jsonb_array_elements(v_pagas) p)
+        GROUP BY faturamento_id
+    ) s
+    WHERE f.id = s.faturamento_id;
+    GET DIAGNOSTICS v_faturamentos = ROW_COUNT;
+
+    -- Despesas automáticas das taxas da maquininha/cartão
+    IF EXISTS (SELECT 1 FROM jsonb_array_elements(v_pagas) p WHERE (p->>'taxa_lote')::NUMERIC > 0) THEN
+        v_categoria_criada := NOT EXISTS (SELECT 1 FROM fin_categorias WHERE nome = 'Taxa de Operadora');
+        v_cat_taxa := fin_categoria_por_nome('Taxa de Operadora', 'DESPESA', 'CLINICA');
+        INSERT INTO fin_transacoes (categoria_id, faturamento_id, descricao, valor, data_vencimento, data_pagamento,
+                                    conta_origem, status, metodo_pagamento)
+        SELECT
+            v_cat_taxa, p.faturamento_id,
+            'Taxa de Operadora (' || COALESCE(NULLIF(p.metodo_pagamento, ''), 'Não informado') || ') — ' || COALESCE(p.descricao, 'Parcela'),
+            p.taxa_lote, p.data_pagamento, p.data_pagamento, 'CLINICA', 'PAGO',
+            COALESCE(NULLIF(p.metodo_pagamento, ''), 'Não informado')
+        FROM jsonb_to_recordset(v_pagas) AS p(
+            faturamento_id UUID, descricao TEXT, metodo_pagamento TEXT, data_pagamento DATE, taxa_lote NUMERIC
+        )
+        WHERE p.taxa_lote > 0;
+    END IF;
+
+    -- Meses de vencimento tocados: das parcelas e das taxas (lançadas na data do pagamento)
+    SELECT COALESCE(jsonb_agg(DISTINCT m), '[]'::jsonb) INTO v_meses
+    FROM (
+        SELECT to_char((p->>'data_vencimento')::DATE, 'YYYY-MM') AS m FROM jsonb_array_elements(v_pagas) p
+        UNION
+        SELECT to_char((p->>'data_pagamento')::DATE, 'YYYY-MM') FROM jsonb_array_elements(v_pagas) p
+        WHERE (p->>'taxa_lote')::NUMERIC > 0
+    ) meses;
+
+    RETURN jsonb_build_object(
+        'pagas', (SELECT COALESCE(jsonb_agg(p - 'taxa_lote'), '[]'::jsonb) FROM jsonb_array_elements(v_pagas) p),
+        'ignoradas', v_ignoradas,
+        'faturamentos_atualizados', v_faturamentos,
+        'categoria_criada', v_categoria_criada,
+        'meses', v_meses
+    );
+END;
+$$ LANGUAGE plpgsql;
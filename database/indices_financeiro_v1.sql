@@ -0,0 +1,12 @@
+-- ============================================================
+-- ÍNDICES DO FINANCEIRO POR STATUS E VENCIMENTO - v1
+-- Colar no SQL Editor do Supabase e clicar em Run (após schema_financeiro.sql)
+--
+-- As leituras de pendências filtram fin_transacoes por status e por uma faixa
+-- de data_vencimento: a previsão de caixa (/fluxo-caixa: PENDENTE com
+-- vencimento nos próximos meses) e o aging (/aging: PENDENTE já vencidas,
+-- views de aging_v1.sql). Com status na frente, a faixa de datas vira
+-- um trecho contíguo do índice, em vez de uma varredura da tabela inteira.
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS idx_fin_transacoes_status_venc ON fin_transacoes (status, data_vencimento);
@@ -0,0 +1,39 @@
+-- ============================================================
+-- JOBS DE MANUTENÇÃO - v1
+-- Checkpoints das migrações em lote e estado dos jobs em segundo plano
+-- Colar no SQL Editor do Supabase e clicar em Run (após schema_financeiro.sql)
+-- ============================================================
+
+-- Ponto de retomada de migrações em lote (ex.: POST /financeiro/consultorio/migrar-taxas).
+-- `cursor` é o último id processado; a linha é apagada quando a migração termina.
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+    nome TEXT PRIMARY KEY,
+    cursor TEXT NOT NULL,
+    atualizado_em TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Índices usados pela migração de taxas: transações pagas com taxa (percorridas
+-- por id) e despesas já lançadas por categoria
+CREATE INDEX IF NOT EXISTS idx_fin_transacoes_pagas_com_taxa ON fin_transacoes (id) WHERE status = 'PAGO' AND taxa_valor > 0;
+CREATE INDEX IF NOT EXISTS idx_fin_transacoes_categoria ON fin_transacoes (categoria_id);
+
+-- Estado dos jobs em segundo plano (GET /api/jobs/{id}); gravado pela API a cada mudança
+CREATE TABLE IF NOT EXISTS jobs (
+    id UUID PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    unico BOOLEAN NOT NULL DEFAULT FALSE,
+    status TEXT NOT NULL CHECK (status IN ('PENDENTE', 'EXECUTANDO', 'CONCLUIDO', 'ERRO')),
+    processadas INTEGER NOT NULL DEFAULT 0,
+    resultado JSONB,
+    erro TEXT,
+    criado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    iniciado_em TIMESTAMPTZ,
+    concluido_em TIMESTAMPTZ,
+    duracao_s NUMERIC(12, 3),
+    atualizado_em TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_tipo_criado ON jobs (tipo, criado_em DESC);
+
+-- Um só job `unico` de cada tipo pendente ou em execução, entre todos os workers da API
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_tipo_ativo ON jobs (tipo) WHERE unico AND status IN ('PENDENTE', 'EXECUTANDO');
@@ -0,0 +1,19 @@
+-- ============================================================
+-- ÍNDICES DA PAGINAÇÃO KEYSET - v1
+-- Colar no SQL Editor do Supabase e clicar em Run (após schema.sql e schema_financeiro.sql)
+--
+-- Índices compostos para a paginação keyset das rotas de listagem
+-- (ordenação padrão de cada rota + id como desempate). Com eles o PostgREST
+-- atende `ORDER BY col, id LIMIT n` e o filtro `(col, id) > cursor` por
+-- varredura de índice, sem ordenar a tabela inteira. A API ordena com os
+-- NULLs no padrão do Postgres (ASC NULLS LAST / DESC NULLS FIRST), o mesmo
+-- destes índices.
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS idx_pacientes_nome_id ON pacientes (nome, id);
+CREATE INDEX IF NOT EXISTS idx_dentistas_nome_id ON dentistas (nome, id);
+CREATE INDEX IF NOT EXISTS idx_agendamentos_data_hora_id ON agendamentos (data_hora DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_fin_faturamentos_created_id ON fin_faturamentos (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_fin_transacoes_vencimento_id ON fin_transacoes (data_vencimento DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_clin_tratamentos_created_id ON clin_tratamentos (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_ordens_proteticas_created_id ON ordens_proteticas (created_at DESC, id DESC);
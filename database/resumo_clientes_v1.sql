@@ -0,0 +1,68 @@
+-- ============================================================
+-- RESUMO FINANCEIRO POR PACIENTE - v1
+-- View lida por GET /api/faturamentos/resumo-clientes
+-- Colar no SQL Editor do Supabase e clicar em Run (após schema_financeiro.sql)
+--
+-- Versionada pelo nome: mudanças de contrato criam resumo_clientes_v2 ao
+-- lado desta, e a API passa a ler a nova só depois de aplicada.
+-- ============================================================
+
+CREATE OR REPLACE VIEW resumo_clientes_v1 AS
+WITH tx AS (
+    -- Totais por faturamento; despesas de "Taxa de Operadora" não entram nos saldos
+    SELECT
+        faturamento_id,
+        COALESCE(SUM(valor) FILTER (
+            WHERE status = 'PAGO' AND COALESCE(descricao, '') NOT LIKE '%Taxa de Operadora%'
+        ), 0) AS pago,
+        COALESCE(SUM(valor) FILTER (
+            WHERE status = 'PENDENTE' AND COALESCE(descricao, '') NOT LIKE '%Taxa de Operadora%'
+        ), 0) AS pendente
+    FROM fin_transacoes
+    WHERE faturamento_id IS NOT NULL
+    GROUP BY faturamento_id
+),
+fat AS (
+    -- Faturamento sem transações vale pelo valor_final gravado
+    SELECT
+        f.paciente_id,
+        SUM(CASE WHEN tx.faturamento_id IS NOT NULL THEN tx.pago + tx.pendente ELSE f.valor_final END) AS total_faturado,
+        SUM(COALESCE(tx.pendente, 0)) AS total_pendente,
+        COUNT(*) AS qtd_faturamentos
+    FROM fin_faturamentos f
+    LEFT JOIN tx ON tx.faturamento_id = f.id
+    WHERE f.status IS DISTINCT FROM 'CANCELADO'
+    GROUP BY f.paciente_id
+),
+ag AS (
+    -- Agendamentos ativos que ainda não viraram faturamento (nem cancelado)
+    SELECT a.paciente_id, COALESCE(SUM(p.valor_padrao), 0) AS total_a_faturar
+    FROM agendamentos a
+    LEFT JOIN agendamento_procedimentos ap ON ap.agendamento_id = a.id
+    LEFT JOIN procedimentos p ON p.id = ap.procedimento_id
+    WHERE a.status IN ('agendado', 'confirmado', 'em_atendimento', 'concluido')
+      AND NOT EXISTS (SELECT 1 FROM fin_faturamentos f WHERE f.agendamento_id = a.id)
+    GROUP BY a.paciente_id
+)
+SELECT
+    p.id AS paciente_id,
+    p.nome,
+    p.cpf,
+    p.telefone,
+    COALESCE(fat.total_faturado, 0) AS total_faturado,
+    COALESCE(fat.total_pendente, 0) AS total_pendente,
+    COALESCE(ag.total_a_faturar, 0) AS total_a_faturar,
+    COALESCE(fat.qtd_faturamentos, 0) AS qtd_faturamentos,
+    CASE
+        WHEN COALESCE(fat.total_pendente, 0) > 0 THEN 'PENDENTE'
+        WHEN COALESCE(ag.total_a_faturar, 0) > 0 THEN 'A_FATURAR'
+        ELSE 'EM_DIA'
+    END AS status_financeiro
+FROM pacientes p
+LEFT JOIN fat ON fat.paciente_id = p.id
+LEFT JOIN ag ON ag.paciente_id = p.id;
+
+-- Índices usados pelas junções da view
+CREATE INDEX IF NOT EXISTS idx_fin_transacoes_faturamento ON fin_transacoes (faturamento_id);
+CREATE INDEX IF NOT EXISTS idx_fin_faturamentos_paciente ON fin_faturamentos (paciente_id);
+CREATE INDEX IF NOT EXISTS idx_fin_faturamentos_agendamento ON fin_faturamentos (agendamento_id);
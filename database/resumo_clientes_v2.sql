@@ -0,0 +1,35 @@
+-- ============================================================
+-- RESUMO FINANCEIRO POR PACIENTE - v2
+-- Mesmo contrato da v1, mas lê os totais já consolidados em
+-- fin_saldos_paciente (database/saldos_financeiros_v1.sql) em vez de somar
+-- fin_transacoes a cada consulta. Só o "a faturar" continua calculado.
+-- ============================================================
+
+CREATE OR REPLACE VIEW resumo_clientes_v2 AS
+WITH ag AS (
+    -- Agendamentos ativos que ainda não viraram faturamento (nem cancelado)
+    SELECT a.paciente_id, COALESCE(SUM(p.valor_padrao), 0) AS total_a_faturar
+    FROM agendamentos a
+    LEFT JOIN agendamento_procedimentos ap ON ap.agendamento_id = a.id
+    LEFT JOIN procedimentos p ON p.id = ap.procedimento_id
+    WHERE a.status IN ('agendado', 'confirmado', 'em_atendimento', 'concluido')
+      AND NOT EXISTS (SELECT 1 FROM fin_faturamentos f WHERE f.agendamento_id = a.id)
+    GROUP BY a.paciente_id
+)
+SELECT
+    p.id AS paciente_id,
+    p.nome,
+    p.cpf,
+    p.telefone,
+    COALESCE(s.total_faturado, 0) AS total_faturado,
+    COALESCE(s.total_pendente, 0) AS total_pendente,
+    COALESCE(ag.total_a_faturar, 0) AS total_a_faturar,
+    COALESCE(s.qtd_faturamentos, 0) AS qtd_faturamentos,
+    CASE
+        WHEN COALESCE(s.total_pendente, 0) > 0 THEN 'PENDENTE'
+        WHEN COALESCE(ag.total_a_faturar, 0) > 0 THEN 'A_FATURAR'
+        ELSE 'EM_DIA'
+    END AS status_financeiro
+FROM pacientes p
+LEFT JOIN fin_saldos_paciente s ON s.paciente_id = p.id
+LEFT JOIN ag ON ag.paciente_id = p.id;
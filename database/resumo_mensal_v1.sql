@@ -0,0 +1,93 @@
+-- ============================================================
+-- RESUMO MENSAL DO FINANCEIRO (rollup) - v1
+-- Colar no SQL Editor do Supabase e clicar em Run (após schema_financeiro.sql)
+--
+-- fin_resumo_mensal guarda total e quantidade de fin_transacoes por mês de
+-- vencimento e por (categoria, conta_origem, conta_destino, status). Tipo e
+-- escopo vêm da categoria (embed fin_categorias), então editar uma categoria
+-- não desatualiza o resumo. Triggers de instrução aplicam a diferença de cada
+-- escrita; o dashboard e a série /dashboard/serie leem algumas centenas de
+-- linhas daqui em vez de todas as transações do período.
+--
+-- Reconstrução:  SELECT fin_resumo_mensal_reconstruir();
+--           ou   POST /api/financeiro/consultorio/dashboard/serie/reconstruir
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS fin_resumo_mensal (
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL CHECK (mes BETWEEN 1 AND 12),
+    categoria_id INTEGER REFERENCES fin_categorias(id) ON DELETE RESTRICT,
+    conta_origem VARCHAR(20),
+    conta_destino VARCHAR(20),
+    status VARCHAR(20),
+    total NUMERIC(14,2) NOT NULL DEFAULT 0,
+    qtd INTEGER NOT NULL DEFAULT 0,
+    CONSTRAINT uq_fin_resumo_mensal UNIQUE NULLS NOT DISTINCT (ano, mes, categoria_id, conta_origem, conta_destino, status)
+);
+
+-- Trigger de instrução: retira do resumo as linhas antigas (UPDATE/DELETE) e soma
+-- as novas (INSERT/UPDATE), agrupadas — 12 parcelas inseridas juntas viram um upsert
+-- por mês, e não doze
+CREATE OR REPLACE FUNCTION fin_resumo_mensal_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO fin_resumo_mensal AS r (ano, mes, categoria_id, conta_origem, conta_destino, status, total, qtd)
+        SELECT EXTRACT(YEAR FROM data_vencimento)::INTEGER, EXTRACT(MONTH FROM data_vencimento)::INTEGER,
+               categoria_id, conta_origem, conta_destino, status, -SUM(valor), -COUNT(*)
+        FROM antigas
+        GROUP BY 1, 2, 3, 4, 5, 6
+        ON CONFLICT ON CONSTRAINT uq_fin_resumo_mensal DO UPDATE SET
+            total = r.total + EXCLUDED.total,
+            qtd = r.qtd + EXCLUDED.qtd;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO fin_resumo_mensal AS r (ano, mes, categoria_id, conta_origem, conta_destino, status, total, qtd)
+        SELECT EXTRACT(YEAR FROM data_vencimento)::INTEGER, EXTRACT(MONTH FROM data_vencimento)::INTEGER,
+               categoria_id, conta_origem, conta_destino, status, SUM(valor), COUNT(*)
+        FROM novas
+        GROUP BY 1, 2, 3, 4, 5, 6
+        ON CONFLICT ON CONSTRAINT uq_fin_resumo_mensal DO UPDATE SET
+            total = r.total + EXCLUDED.total,
+            qtd = r.qtd + EXCLUDED.qtd;
+    END IF;
+
+    -- Combinações que ficaram sem transação
+    DELETE FROM fin_resumo_mensal WHERE qtd = 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_fin_resumo_mensal_insert ON fin_transacoes;
+DROP TRIGGER IF EXISTS trg_fin_resumo_mensal_update ON fin_transacoes;
+DROP TRIGGER IF EXISTS trg_fin_resumo_mensal_delete ON fin_transacoes;
+
+CREATE TRIGGER trg_fin_resumo_mensal_insert AFTER INSERT ON fin_transacoes
+    REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION fin_resumo_mensal_trigger();
+CREATE TRIGGER trg_fin_resumo_mensal_update AFTER UPDATE ON fin_transacoes
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION fin_resumo_mensal_trigger();
+CREATE TRIGGER trg_fin_resumo_mensal_delete AFTER DELETE ON fin_transacoes
+    REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION fin_resumo_mensal_trigger();
+
+
+-- Refaz o resumo do zero a partir de fin_transacoes; devolve a quantidade de linhas
+CREATE OR REPLACE FUNCTION fin_resumo_mensal_reconstruir()
+RETURNS JSONB AS $$
+DECLARE
+    v_linhas INTEGER;
+BEGIN
+    LOCK TABLE fin_resumo_mensal IN EXCLUSIVE MODE;
+    DELETE FROM fin_resumo_mensal;
+    INSERT INTO fin_resumo_mensal (ano, mes, categoria_id, conta_origem, conta_destino, status, total, qtd)
+    SELECT EXTRACT(YEAR FROM data_vencimento)::INTEGER, EXTRACT(MONTH FROM data_vencimento)::INTEGER,
+           categoria_id, conta_origem, conta_destino, status, SUM(valor), COUNT(*)
+    FROM fin_transacoes
+    GROUP BY 1, 2, 3, 4, 5, 6;
+    GET DIAGNOSTICS v_linhas = ROW_COUNT;
+    RETURN jsonb_build_object('linhas', v_linhas);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Carga inicial
+SELECT fin_resumo_mensal_reconstruir();
@@ -0,0 +1,239 @@
+-- ============================================================
+-- SALDOS FINANCEIROS (livro-razão por faturamento e por paciente) - v1
+-- Colar no SQL Editor do Supabase e clicar em Run (após schema_financeiro.sql)
+--
+-- fin_saldos_faturamento e fin_saldos_paciente guardam os totais que antes
+-- eram recalculados a partir de fin_transacoes a cada requisição. Triggers
+-- de instrução em fin_transacoes e fin_faturamentos recalculam só os
+-- faturamentos tocados e aplicam a diferença no saldo do paciente, então
+-- qualquer escrita (rotas da API, SQL manual, RPCs) mantém o livro em dia.
+--
+-- Verificação / reconstrução:  python backend/scripts/saldos_financeiros.py verificar
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS fin_saldos_faturamento (
+    -- FK diferida: no DELETE de um faturamento a linha é removida pelo
+    -- trigger (que ainda precisa dela para ajustar o paciente), não em cascata
+    faturamento_id UUID PRIMARY KEY REFERENCES fin_faturamentos(id) DEFERRABLE INITIALLY DEFERRED,
+    paciente_id UUID,
+    qtd_transacoes INTEGER NOT NULL DEFAULT 0,
+    valor_pago NUMERIC(14,2) NOT NULL DEFAULT 0,
+    valor_pendente NUMERIC(14,2) NOT NULL DEFAULT 0,
+    -- pago + pendente; sem transações, o valor_final do faturamento
+    valor_faturado NUMERIC(14,2) NOT NULL DEFAULT 0,
+    -- status <> CANCELADO (só faturamentos ativos entram no saldo do paciente)
+    ativo BOOLEAN NOT NULL DEFAULT TRUE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now())
+);
+
+CREATE INDEX IF NOT EXISTS idx_fin_saldos_faturamento_paciente ON fin_saldos_faturamento (paciente_id);
+
+CREATE TABLE IF NOT EXISTS fin_saldos_paciente (
+    paciente_id UUID PRIMARY KEY REFERENCES pacientes(id) ON DELETE CASCADE,
+    total_faturado NUMERIC(14,2) NOT NULL DEFAULT 0,
+    total_pendente NUMERIC(14,2) NOT NULL DEFAULT 0,
+    qtd_faturamentos INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now())
+);
+
+
+-- Recalcula o saldo de um faturamento e aplica a diferença no paciente
+CREATE OR REPLACE FUNCTION fin_saldos_recalcular_faturamento(p_faturamento_id UUID)
+RETURNS VOID AS $$
+DECLARE
+    antigo fin_saldos_faturamento%ROWTYPE;
+    fat RECORD;
+    existe BOOLEAN;
+    v_qtd INTEGER;
+    v_pago NUMERIC;
+    v_pendente NUMERIC;
+    v_faturado NUMERIC;
+    v_ativo BOOLEAN;
+BEGIN
+    SELECT * INTO antigo FROM fin_saldos_faturamento WHERE faturamento_id = p_faturamento_id FOR UPDATE;
+
+    SELECT id, paciente_id, status, valor_final INTO fat FROM fin_faturamentos WHERE id = p_faturamento_id;
+    existe := FOUND;
+
+    IF existe THEN
+        SELECT
+            COUNT(*),
+            COALESCE(SUM(valor) FILTER (WHERE status = 'PAGO' AND COALESCE(descricao, '') NOT LIKE '%Taxa de Operadora%'), 0),
+            COALESCE(SUM(valor) FILTER (WHERE status = 'PENDENTE' AND COALESCE(descricao, '') NOT LIKE '%Taxa de Operadora%'), 0)
+        INTO v_qtd, v_pago, v_pendente
+        FROM fin_transacoes
+        WHERE faturamento_id = p_faturamento_id;
+
+        v_faturado := CASE WHEN v_qtd > 0 THEN v_pago + v_pendente ELSE COALESCE(fat.valor_final, 0) END;
+        v_ativo := fat.status IS DISTINCT FROM 'CANCELADO';
+
+        INSERT INTO fin_saldos_faturamento
+            (faturamento_id, paciente_id, qtd_transacoes, valor_pago, valor_pendente, valor_faturado, ativo, updated_at)
+        VALUES
+            (fat.id, fat.paciente_id, v_qtd, v_pago, v_pendente, v_faturado, v_ativo, timezone('utc'::text, now()))
+        ON CONFLICT (faturamento_id) DO UPDATE SET
+            paciente_id = EXCLUDED.paciente_id,
+            qtd_transacoes = EXCLUDED.qtd_transacoes,
+            valor_pago = EXCLUDED.valor_pago,
+            valor_pendente = EXCLUDED.valor_pendente,
+            valor_faturado = EXCLUDED.valor_faturado,
+            ativo = EXCLUDED.ativo,
+            updated_at = EXCLUDED.updated_at;
+    ELSE
+        DELETE FROM fin_saldos_faturamento WHERE faturamento_id = p_faturamento_id;
+    END IF;
+
+    -- Retira a contribuição antiga do paciente e soma a nova
+    IF antigo.faturamento_id IS NOT NULL AND antigo.ativo AND antigo.paciente_id IS NOT NULL THEN
+        UPDATE fin_saldos_paciente SET
+            total_faturado = total_faturado - antigo.valor_faturado,
+            total_pendente = total_pendente - antigo.valor_pendente,
+            qtd_faturamentos = qtd_faturamentos - 1,
+            updated_at = timezone('utc'::text, now())
+        WHERE paciente_id = antigo.paciente_id;
+    END IF;
+
+    IF existe AND v_ativo AND fat.paciente_id IS NOT NULL THEN
+        INSERT INTO fin_saldos_paciente (paciente_id, total_faturado, total_pendente, qtd_faturamentos)
+        VALUES (fat.paciente_id, v_faturado, v_pendente, 1)
+        ON CONFLICT (paciente_id) DO UPDATE SET
+            total_faturado = fin_saldos_paciente.total_faturado + EXCLUDED.total_faturado,
+            total_pendente = fin_saldos_paciente.total_pendente + EXCLUDED.total_pendente,
+            qtd_faturamentos = fin_saldos_paciente.qtd_faturamentos + 1,
+            updated_at = timezone('utc'::text, now());
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Triggers de instrução: um recálculo por faturamento tocado, e não por linha
+-- (inserir 12 parcelas recalcula o faturamento uma vez)
+CREATE OR REPLACE FUNCTION fin_saldos_trigger_transacoes()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM fin_saldos_recalcular_faturamento(f) FROM (SELECT DISTINCT faturamento_id AS f FROM novas WHERE faturamento_id IS NOT NULL) t;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM fin_saldos_recalcular_faturamento(f) FROM (
+            SELECT faturamento_id AS f FROM novas WHERE faturamento_id IS NOT NULL
+            UNION
+            SELECT faturamento_id FROM antigas WHERE faturamento_id IS NOT NULL
+        ) t;
+    ELSE
+        PERFORM fin_saldos_recalcular_faturamento(f) FROM (SELECT DISTINCT faturamento_id AS f FROM antigas WHERE faturamento_id IS NOT NULL) t;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION fin_saldos_trigger_faturamentos()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM fin_saldos_recalcular_faturamento(id) FROM novas;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM fin_saldos_recalcular_faturamento(id) FROM (SELECT id FROM novas UNION SELECT id FROM antigas) t;
+    ELSE
+        PERFORM fin_saldos_recalcular_faturamento(id) FROM antigas;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_fin_saldos_tx_insert ON fin_transacoes;
+DROP TRIGGER IF EXISTS trg_fin_saldos_tx_update ON fin_transacoes;
+DROP TRIGGER IF EXISTS trg_fin_saldos_tx_delete ON fin_transacoes;
+CREATE TRIGGER trg_fin_saldos_tx_insert AFTER INSERT ON fin_transacoes
+    REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION fin_saldos_trigger_transacoes();
+CREATE TRIGGER trg_fin_saldos_tx_update AFTER UPDATE ON fin_transacoes
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION fin_saldos_trigger_transacoes();
+CREATE TRIGGER trg_fin_saldos_tx_delete AFTER DELETE ON fin_transacoes
+    REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION fin_saldos_trigger_transacoes();
+
+DROP TRIGGER IF EXISTS trg_fin_saldos_fat_insert ON fin_faturamentos;
+DROP TRIGGER IF EXISTS trg_fin_saldos_fat_update ON fin_faturamentos;
+DROP TRIGGER IF EXISTS trg_fin_saldos_fat_delete ON fin_faturamentos;
+CREATE TRIGGER trg_fin_saldos_fat_insert AFTER INSERT ON fin_faturamentos
+    REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION fin_saldos_trigger_faturamentos();
+CREATE TRIGGER trg_fin_saldos_fat_update AFTER UPDATE ON fin_faturamentos
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION fin_saldos_trigger_faturamentos();
+CREATE TRIGGER trg_fin_saldos_fat_delete AFTER DELETE ON fin_faturamentos
+    REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION fin_saldos_trigger_faturamentos();
+
+
+-- Saldos esperados, calculados do zero a partir das tabelas de origem
+CREATE OR REPLACE VIEW fin_saldos_faturamento_esperado AS
+SELECT
+    f.id AS faturamento_id,
+    f.paciente_id,
+    COUNT(t.id)::INTEGER AS qtd_transacoes,
+    COALESCE(SUM(t.valor) FILTER (WHERE t.status = 'PAGO' AND COALESCE(t.descricao, '') NOT LIKE '%Taxa de Operadora%'), 0) AS valor_pago,
+    COALESCE(SUM(t.valor) FILTER (WHERE t.status = 'PENDENTE' AND COALESCE(t.descricao, '') NOT LIKE '%Taxa de Operadora%'), 0) AS valor_pendente,
+    CASE WHEN COUNT(t.id) > 0
+        THEN COALESCE(SUM(t.valor) FILTER (WHERE t.status IN ('PAGO', 'PENDENTE') AND COALESCE(t.descricao, '') NOT LIKE '%Taxa de Operadora%'), 0)
+        ELSE COALESCE(f.valor_final, 0)
+    END AS valor_faturado,
+    f.status IS DISTINCT FROM 'CANCELADO' AS ativo
+FROM fin_faturamentos f
+LEFT JOIN fin_transacoes t ON t.faturamento_id = f.id
+GROUP BY f.id;
+
+
+-- Reconstrói os dois livros do zero (bloqueia escritas financeiras enquanto roda)
+CREATE OR REPLACE FUNCTION fin_saldos_reconstruir()
+RETURNS JSONB AS $$
+DECLARE
+    qtd_fat INTEGER;
+    qtd_pac INTEGER;
+BEGIN
+    LOCK TABLE fin_faturamentos, fin_transacoes IN SHARE MODE;
+
+    DELETE FROM fin_saldos_paciente;
+    DELETE FROM fin_saldos_faturamento;
+
+    INSERT INTO fin_saldos_faturamento (faturamento_id, paciente_id, qtd_transacoes, valor_pago, valor_pendente, valor_faturado, ativo)
+    SELECT faturamento_id, paciente_id, qtd_transacoes, valor_pago, valor_pendente, valor_faturado, ativo
+    FROM fin_saldos_faturamento_esperado;
+    GET DIAGNOSTICS qtd_fat = ROW_COUNT;
+
+    INSERT INTO fin_saldos_paciente (paciente_id, total_faturado, total_pendente, qtd_faturamentos)
+    SELECT paciente_id, SUM(valor_faturado), SUM(valor_pendente), COUNT(*)
+    FROM fin_saldos_faturamento
+    WHERE ativo AND paciente_id IS NOT NULL
+    GROUP BY paciente_id;
+    GET DIAGNOSTICS qtd_pac = ROW_COUNT;
+
+    RETURN jsonb_build_object('faturamentos', qtd_fat, 'pacientes', qtd_pac);
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Lista as divergências entre o livro e o recálculo do zero (vazio = íntegro)
+CREATE OR REPLACE FUNCTION fin_saldos_verificar()
+RETURNS TABLE (nivel TEXT, id UUID, gravado JSONB, esperado JSONB) AS $$
+    WITH esperado_pac AS (
+        SELECT paciente_id, SUM(valor_faturado) AS total_faturado, SUM(valor_pendente) AS total_pendente, COUNT(*)::INTEGER AS qtd_faturamentos
+        FROM fin_saldos_faturamento_esperado
+        WHERE ativo AND paciente_id IS NOT NULL
+        GROUP BY paciente_id
+    )
+    SELECT 'faturamento', COALESCE(s.faturamento_id, e.faturamento_id),
+           to_jsonb(s) - 'updated_at', to_jsonb(e)
+    FROM fin_saldos_faturamento s
+    FULL JOIN fin_saldos_faturamento_esperado e ON e.faturamento_id = s.faturamento_id
+    WHERE s.faturamento_id IS NULL OR e.faturamento_id IS NULL
+       OR (s.paciente_id, s.qtd_transacoes, s.valor_pago, s.valor_pendente, s.valor_faturado, s.ativo)
+          IS DISTINCT FROM (e.paciente_id, e.qtd_transacoes, e.valor_pago, e.valor_pendente, e.valor_faturado, e.ativo)
+    UNION ALL
+    SELECT 'paciente', COALESCE(s.paciente_id, e.paciente_id),
+           to_jsonb(s) - 'updated_at', to_jsonb(e)
+    FROM (SELECT * FROM fin_saldos_paciente WHERE qtd_faturamentos <> 0 OR total_faturado <> 0 OR total_pendente <> 0) s
+    FULL JOIN esperado_pac e ON e.paciente_id = s.paciente_id
+    WHERE s.paciente_id IS NULL OR e.paciente_id IS NULL
+       OR (s.total_faturado, s.total_pendente, s.qtd_faturamentos)
+          IS DISTINCT FROM (e.total_faturado, e.total_pendente, e.qtd_faturamentos);
+$$ LANGUAGE sql STABLE;
+
+
+-- Carga inicial
+SELECT fin_saldos_reconstruir();
@@ -0,0 +1,98 @@
+import io
+from datetime import date
+
+import pytest
+
+from backend.services.conciliacao import (
+    IndiceCandidatos, Lancamento, detectar_encoding, detectar_formato, ler_csv, ler_extrato, ler_ofx, ler_valor,
+)
+
+OFX = """OFXHEADER:100
+CHARSET:1252
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260110120000[-3:BRT]<TRNAMT>150.00<FITID>A1<NAME>PIX RECEBIDO<MEMO>MARIA SILVA</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260112<TRNAMT>-9,90<FITID>A2<MEMO>Tarifa</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>"""
+
+ESPERADO_OFX = [
+    Lancamento(1, date(2026, 1, 10), 15000, "PIX RECEBIDO MARIA SILVA", "A1"),
+    Lancamento(2, date(2026, 1, 12), -990, "Tarifa", "A2"),
+]
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("1.234,56", 123456),
+    ("1,234.56", 123456),
+    ("-50,00", -5000),
+    ("R$ 80", 8000),
+    ("+0.1", 10),
+    ("", None),
+    ("abc", None),
+])
+def test_ler_valor(texto, esperado):
+    assert ler_valor(texto) == esperado
+
+
+def test_ler_ofx_inteiro():
+    assert list(ler_ofx([OFX])) == ESPERADO_OFX
+
+
+@pytest.mark.parametrize("tamanho", [1, 2, 3, 7, 64])
+def test_ler_ofx_com_tags_cortadas_entre_pedacos(tamanho):
+    pedacos = [OFX[i:i + tamanho] for i in range(0, len(OFX), tamanho)]
+    assert list(ler_ofx(pedacos)) == ESPERADO_OFX
+
+
+def test_ler_ofx_xml_com_fechamento():
+    xml = "<STMTTRN><DTPOSTED>20260105</DTPOSTED><TRNAMT>10.00</TRNAMT><MEMO>X</MEMO></STMTTRN>"
+    assert list(ler_ofx([xml])) == [Lancamento(1, date(2026, 1, 5), 1000, "X", None)]
+
+
+def test_ler_csv_ponto_e_virgula():
+    linhas = io.StringIO("Data;Histórico;Valor;Documento\n10/01/2026;PIX MARIA;1.150,00;D1\n\n;Saldo;;\n")
+    assert list(ler_csv(linhas)) == [
+        Lancamento(1, date(2026, 1, 10), 115000, "PIX MARIA", "D1"),
+        Lancamento(3, None, 0, "Saldo", None),
+    ]
+
+
+def test_ler_csv_virgula_e_aspas():
+    linhas = io.StringIO('"date","description","amount"\n2026-01-10,"Ana, Souza",80.5\n')
+    assert list(ler_csv(linhas)) == [Lancamento(1, date(2026, 1, 10), 8050, "Ana, Souza", None)]
+
+
+def test_ler_csv_sem_colunas_obrigatorias():
+    with pytest.raises(ValueError):
+        list(ler_csv(io.StringIO("a;b\n1;2\n")))
+
+
+def test_detectar_formato_e_encoding():
+    assert detectar_formato("extrato.QFX", b"") == "ofx"
+    assert detectar_formato("extrato", b"OFXHEADER:100") == "ofx"
+    assert detectar_formato("extrato.txt", b"Data;Valor") == "csv"
+    assert detectar_encoding(b"OFXHEADER:100\nCHARSET:1252") == "cp1252"
+    assert detectar_encoding("Histórico".encode("cp1252")) == "cp1252"
+    assert detectar_encoding("Histórico".encode()) == "utf-8-sig"
+    # Caractere de vários bytes cortado no fim do trecho lido
+    assert detectar_encoding("Históri ã".encode()[:-1]) == "utf-8-sig"
+
+
+def test_ler_extrato_separa_creditos():
+    binario = io.BytesIO(OFX.encode("cp1252"))
+    creditos, contagem = ler_extrato(binario, "ofx", "cp1252", pedaco=16)
+    assert creditos == ESPERADO_OFX[:1]
+    assert contagem == {"lancamentos": 2, "debitos": 1, "ilegiveis": 0}
+    assert not binario.closed
+
+
+def test_indice_candidatos_desempata_pela_descricao():
+    indice = IndiceCandidatos(janela_dias=3)
+    for id_, nome in (("t1", "Maria Silva"), ("t2", "Ana Souza")):
+        indice.adicionar({"id": id_, "valor": 150.0, "data_vencimento": "2026-01-10", "descricao": "Parcela 1/2",
+                          "fin_faturamentos": {"pacientes": {"nome": nome}}})
+    credito = Lancamento(1, date(2026, 1, 11), 15000, "PIX RECEBIDO MARIA")
+    parcela, candidatas = indice.casar(credito)
+    assert (parcela["id"], candidatas) == ("t1", [])
+    # Casada sai do índice: o mesmo crédito agora só tem a outra parcela
+    assert indice.casar(credito)[0]["id"] == "t2"
+    assert indice.casar(credito) == (None, [])
@@ -0,0 +1,37 @@
+import pytest
+
+from backend.services.dinheiro import centavos, distribuir_centavos, dividir_resto_na_ultima, percentual, reais, somar
+
+
+def test_centavos_arredonda_meio_centavo_para_cima():
+    assert centavos(10.1) == 1010
+    assert centavos("0.005") == 1
+    assert centavos(None) == 0
+    assert reais(centavos(0.1) + centavos(0.2)) == 0.3
+
+
+def test_somar_em_centavos():
+    assert somar([0.1, 0.2, "0.3"]) == 60
+
+
+def test_distribuir_centavos_sobra_nas_primeiras():
+    assert distribuir_centavos(10, 3) == [4, 3, 3]
+    assert sum(distribuir_centavos(100001, 7)) == 100001
+
+
+@pytest.mark.parametrize("qtd", [0, -1])
+def test_distribuir_centavos_sem_partes(qtd):
+    with pytest.raises(ValueError):
+        distribuir_centavos(10, qtd)
+
+
+def test_dividir_resto_na_ultima():
+    assert dividir_resto_na_ultima(10000, 3) == [3333, 3333, 3334]
+    with pytest.raises(ValueError):
+        dividir_resto_na_ultima(10000, 0)
+
+
+def test_percentual():
+    assert percentual(10000, 4.99) == 499
+    assert percentual(3333, 2.5) == 83  # 83,325 → 83
+    assert percentual(100, None) == 0
@@ -0,0 +1,73 @@
+import pytest
+from fastapi import HTTPException
+
+from backend.services.pagination import chave_ordem, decode_cursor, encode_cursor, filtro_keyset, paginar_lista, parse_sort
+
+ASC = [("data_pagamento", False), ("id", False)]
+DESC = [("data_pagamento", True), ("id", True)]
+
+
+def test_parse_sort():
+    assert parse_sort("-valor", {"valor"}, "nome") == [("valor", True), ("id", True)]
+    assert parse_sort(None, {"nome"}, "nome", desempate="paciente_id") == [("nome", False), ("paciente_id", False)]
+    with pytest.raises(HTTPException) as erro:
+        parse_sort("senha", {"nome"}, "nome")
+    assert erro.value.status_code == 400
+
+
+def test_filtro_keyset_crescente_inclui_os_nulls():
+    assert filtro_keyset(ASC, ["2026-01-10", "b"]) == (
+        'data_pagamento.gt."2026-01-10",data_pagamento.is.null,'
+        'and(data_pagamento.eq."2026-01-10",id.gt."b")'
+    )
+
+
+def test_filtro_keyset_decrescente():
+    assert filtro_keyset(DESC, [10.5, "b"]) == 'data_pagamento.lt."10.5",and(data_pagamento.eq."10.5",id.lt."b")'
+
+
+def test_filtro_keyset_cursor_em_null():
+    assert filtro_keyset(ASC, [None, "b"]) == "and(data_pagamento.is.null,id.gt.\"b\")"
+    assert filtro_keyset(DESC, [None, "b"]) == (
+        'data_pagamento.not.is.null,and(data_pagamento.is.null,id.lt."b")'
+    )
+
+
+def test_filtro_keyset_escapa_aspas():
+    assert filtro_keyset([("nome", False), ("id", False)], ['Ana "A"', 1]) == (
+        'nome.gt."Ana \\"A\\"",nome.is.null,and(nome.eq."Ana \\"A\\"",id.gt."1")'
+    )
+
+
+def test_cursor_ida_e_volta():
+    cursor = encode_cursor(ASC, {"data_pagamento": None, "id": "b", "valor": 3})
+    assert decode_cursor(cursor, ASC) == [None, "b"]
+
+
+@pytest.mark.parametrize("cursor", ["", "%%%", "bm9wZQ", encode_cursor(DESC, {"data_pagamento": "x", "id": 1})])
+def test_decode_cursor_invalido(cursor):
+    with pytest.raises(HTTPException) as erro:
+        decode_cursor(cursor, ASC)
+    assert erro.value.status_code == 400
+
+
+@pytest.mark.parametrize("ordem, esperado", [(ASC, [2, 0, 4, 5, 1, 3]), (DESC, [3, 1, 5, 4, 0, 2])])
+def test_paginar_lista_percorre_tudo_com_nulls(ordem, esperado):
+    linhas = [
+        {"id": i, "data_pagamento": d}
+        for i, d in enumerate(["2026-01-02", None, "2026-01-01", None, "2026-01-02", "2026-01-03"])
+    ]
+    vistas, cursor = [], None
+    while True:
+        pagina = paginar_lista(linhas, ordem, 2, cursor)
+        vistas += [l["id"] for l in pagina["items"]]
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            break
+    assert vistas == esperado
+
+
+def test_chave_ordem_null_depois_dos_valores():
+    valores = [3.5, None, 1.0, None]
+    assert sorted(valores, key=chave_ordem) == [1.0, 3.5, None, None]
+    assert sorted(["b", None, "a"], key=chave_ordem, reverse=True) == [None, "b", "a"]
@@ -0,0 +1,158 @@
+from datetime import date
+
+import pytest
+
+from backend.services.dinheiro import somar
+from backend.services.parcelamento import (
+    ConflitoPagamento, diferenca_cronograma, gerar_cronograma, redistribuir_residual, simular_planos, taxas_por_metodo,
+)
+
+HOJE = date(2026, 1, 15)
+
+
+def cronograma(**kwargs):
+    base = {"descricao": "Canal", "valor_final": 100.0, "metodo_pagamento": "PIX", "hoje": HOJE}
+    return gerar_cronograma(**{**base, **kwargs})
+
+
+def desejadas(c, fat="f1"):
+    linhas = [{**t, "categoria_id": 1, "faturamento_id": fat} for t in c["transacoes"]]
+    if c["taxa_entrada"]:
+        linhas.append({**c["taxa_entrada"], "categoria_id": 2, "faturamento_id": fat,
+                       "conta_origem": "CLINICA", "status": "PAGO"})
+    return linhas
+
+
+def gravar(c):
+    """Linhas como ficariam no banco depois do primeiro setup"""
+    return [{**linha, "id": f"t{i}"} for i, linha in enumerate(diferenca_cronograma([], desejadas(c))["gravar"])]
+
+
+def test_gerar_cronograma_entrada_e_parcelas_somam_o_valor_final():
+    c = cronograma(valor_entrada=10, numero_parcelas=3, data_vencimento_primeira="2026-01-31")
+    valores = [t["valor"] for t in c["transacoes"]]
+    assert valores == [10.0, 30.0, 30.0, 30.0]
+    assert somar(valores) == 10000
+    assert [t["data_vencimento"] for t in c["transacoes"][1:]] == ["2026-01-31", "2026-02-28", "2026-03-31"]
+    assert c["transacoes"][0]["status"] == "PAGO"
+    assert c["status"] == "PAGO_PARCIAL"
+    assert c["taxa_entrada"] is None
+
+
+def test_gerar_cronograma_resto_na_ultima_e_primeiro_vencimento():
+    c = cronograma(numero_parcelas=3)
+    assert [t["valor"] for t in c["transacoes"]] == [33.33, 33.33, 33.34]
+    assert c["transacoes"][0]["data_vencimento"] == "2026-02-15"
+    assert c["status"] == "ABERTO"
+    assert cronograma(numero_parcelas=1)["transacoes"][0]["data_vencimento"] == "2026-01-15"
+
+
+def test_gerar_cronograma_quitado_com_taxa_na_entrada():
+    c = cronograma(valor_entrada=100, numero_parcelas=3, taxa_valor_entrada=2.5)
+    assert len(c["transacoes"]) == 1
+    assert c["status"] == "QUITADO"
+    assert c["taxa_entrada"]["valor"] == 2.5
+    assert c["taxa_entrada"]["descricao"] == "Taxa de Operadora (PIX) — Entrada"
+
+
+def test_redistribuir_residual_sem_perder_centavo():
+    pendentes = [{"id": "a", "valor": 33.33}, {"id": "b", "valor": 33.33}, {"id": "c", "valor": 33.34}]
+    novas = redistribuir_residual(pendentes, 10)
+    assert [n["valor"] for n in novas] == [33.37, 33.36, 33.37]
+    assert somar(n["valor"] for n in novas) == 10010
+    assert [n["id"] for n in novas] == ["a", "b", "c"]
+
+
+def test_redistribuir_residual_sem_pendentes():
+    with pytest.raises(ValueError):
+        redistribuir_residual([], 10)
+
+
+FORMAS = [
+    {"nome": "Pix", "tipo": "PIX", "taxa_padrao_porcentagem": 0.0},
+    {"nome": "Visa Crédito", "tipo": "CREDITO", "taxa_padrao_porcentagem": 3.5},
+    {"nome": "Master Crédito", "tipo": "CREDITO", "taxa_padrao_porcentagem": 4.99},
+]
+
+
+def test_taxas_por_metodo_nome_prevalece_e_tipo_fica_com_a_maior():
+    assert taxas_por_metodo(FORMAS) == {"PIX": 0.0, "Pix": 0.0, "CREDITO": 4.99, "Visa Crédito": 3.5, "Master Crédito": 4.99}
+
+
+def test_simular_planos_mesmo_motor_do_cronograma():
+    planos = simular_planos(100.0, [
+        {"numero_parcelas": 3, "forma_pagamento": "CREDITO"},
+        {"numero_parcelas": 2, "valor_entrada": 20, "forma_entrada": "Pix", "forma_pagamento": "Visa Crédito"},
+    ], taxas_por_metodo(FORMAS), hoje=HOJE)
+    tres, dois = planos
+    assert [p["valor"] for p in tres["parcelas"]] == [t["valor"] for t in cronograma(numero_parcelas=3)["transacoes"]]
+    assert [p["taxa"] for p in tres["parcelas"]] == [1.66, 1.66, 1.66]
+    assert (tres["taxas"], tres["liquido"]) == (4.98, 95.02)
+    assert [p["data_vencimento"] for p in dois["parcelas"]] == ["2026-02-15", "2026-03-15"]
+    assert (dois["valor_entrada"], dois["taxa_entrada"], dois["taxas"]) == (20.0, 0.0, 2.8)
+
+
+@pytest.mark.parametrize("cenario", [
+    {"numero_parcelas": 2, "valor_entrada": 150},
+    {"numero_parcelas": 2, "forma_pagamento": "BOLETO"},
+])
+def test_simular_planos_cenario_invalido(cenario):
+    with pytest.raises(ValueError):
+        simular_planos(100.0, [cenario], taxas_por_metodo(FORMAS), hoje=HOJE)
+
+
+def test_diferenca_cronograma_mesmo_plano_nao_escreve():
+    c = cronograma(valor_entrada=10, numero_parcelas=3, taxa_valor_entrada=1)
+    existentes = gravar(c)
+    assert len(existentes) == 5
+    assert diferenca_cronograma(existentes, desejadas(c)) == {"gravar": [], "remover": [], "datas": []}
+
+
+def test_diferenca_cronograma_plano_menor_reaproveita_ids_e_remove_sobra():
+    existentes = gravar(cronograma(numero_parcelas=3))
+    d = diferenca_cronograma(existentes, desejadas(cronograma(numero_parcelas=2)))
+    assert [(g["id"], g["valor"]) for g in d["gravar"]] == [("t0", 50.0), ("t1", 50.0)]
+    assert d["remover"] == ["t2"]
+    assert "2026-04-15" in d["datas"]
+
+
+def test_diferenca_cronograma_parcela_paga_fica_e_abertas_dividem_o_saldo():
+    existentes = gravar(cronograma(numero_parcelas=3))
+    existentes[1].update(valor=50.0, status="PAGO", data_pagamento="2026-03-10", conta_destino="CLINICA")
+    d = diferenca_cronograma(existentes, desejadas(cronograma(numero_parcelas=3, valor_final=120.0)))
+    assert [(g["id"], g["valor"], g["status"]) for g in d["gravar"]] == [("t0", 35.0, "PENDENTE"), ("t2", 35.0, "PENDENTE")]
+    assert d["remover"] == []
+
+
+def test_diferenca_cronograma_parcelas_pagas_acima_do_novo_plano():
+    existentes = gravar(cronograma(numero_parcelas=2))
+    existentes[0].update(valor=90.0, status="PAGO", data_pagamento="2026-02-15")
+    with pytest.raises(ConflitoPagamento):
+        diferenca_cronograma(existentes, desejadas(cronograma(numero_parcelas=2, valor_final=80.0)))
+
+
+def test_diferenca_cronograma_nao_remove_parcela_paga():
+    existentes = gravar(cronograma(numero_parcelas=3))
+    existentes[2].update(status="PAGO", data_pagamento="2026-04-15")
+    with pytest.raises(ConflitoPagamento):
+        diferenca_cronograma(existentes, desejadas(cronograma(numero_parcelas=2)))
+
+
+def test_diferenca_cronograma_regrava_taxa_da_entrada():
+    existentes = gravar(cronograma(valor_entrada=10, numero_parcelas=2, taxa_valor_entrada=1))
+    # Taxa de uma baixa de parcela: fora do cronograma
+    existentes.append({"id": "tp", "descricao": "Taxa de Operadora (PIX) — Parcela 1/2 - Canal", "valor": 0.5,
+                       "status": "PAGO", "data_vencimento": "2026-02-15"})
+    novo = cronograma(valor_entrada=10, numero_parcelas=2, taxa_valor_entrada=1.5, metodo_pagamento="CREDITO",
+                      hoje=date(2026, 2, 1))
+    d = diferenca_cronograma(existentes, desejadas(novo))
+    taxa = next(g for g in d["gravar"] if g["descricao"].startswith("Taxa"))
+    entrada = next(g for g in d["gravar"] if g["descricao"].startswith("Entrada"))
+    assert (taxa["valor"], taxa["descricao"]) == (1.5, "Taxa de Operadora (CREDITO) — Entrada")
+    # Pagas no dia do primeiro setup, não no dia em que o plano foi salvo de novo
+    assert taxa["data_pagamento"] == entrada["data_pagamento"] == "2026-01-15"
+    assert entrada["metodo_pagamento"] == "CREDITO"
+    assert d["remover"] == []
+
+    sem_taxa = diferenca_cronograma(existentes, desejadas(cronograma(valor_entrada=10, numero_parcelas=2)))
+    assert sem_taxa["remover"] == [next(e["id"] for e in existentes if e["descricao"].endswith("— Entrada"))]